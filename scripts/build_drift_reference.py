@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+PCC Drift Reference Builder
+Profiles partitions that were reviewed as a good baseline (or the sample
+data) with the active model and stores the result as the drift reference
+(drift.reference_path, a local file or a gs:// object). Pipeline runs only
+compare against this reference; they do not create one unless
+drift.save_reference_if_missing is set.
+"""
+
+import argparse
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+from config.config import load_config
+from utils.batch_store import is_batch_store, load_batch
+from utils.embedding_batch import EmbeddingBatch
+from preprocessing.dedup import deduplicate_cases
+from preprocessing.embed_text import validate_embeddings
+from preprocessing.feature_projection import project_for_model
+from inference.classifier_interface import ensure_model_loaded
+from inference.predict_intent import predict_batch
+from monitoring.drift_detector import profile_run, save_reference_profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the drift reference profile from baseline partitions")
+    parser.add_argument("--mode", default="dev", choices=["dev", "prod", "test"],
+                       help="Runtime mode")
+    parser.add_argument("--partition-dates", nargs="+",
+                       help="Baseline BigQuery partitions (YYYYMMDD); sample data if omitted")
+    parser.add_argument("--output", help="Reference path, local or gs:// (default: drift.reference_path)")
+    parser.add_argument("--force", action="store_true",
+                       help="Replace an existing reference profile")
+
+    args = parser.parse_args()
+    config = load_config(args.mode)
+    embedding_dim = config["models"].get("embedding_dim")
+    model = ensure_model_loaded()
+
+    state = None
+    for partition_date in args.partition_dates or [None]:
+        if partition_date:
+            from ingestion.load_from_bq import load_partitioned_data
+            batch = load_partitioned_data(
+                partition_date, as_batch=True, expected_dim=embedding_dim,
+                precision=config["models"].get("precision", "float32"), use_cache=False
+            )
+            batch = validate_embeddings(batch, expected_dim=embedding_dim)
+        elif is_batch_store("tests/fixtures/sample_data"):
+            batch = validate_embeddings(load_batch("tests/fixtures/sample_data"))
+        else:
+            batch = validate_embeddings(EmbeddingBatch.from_frame(pd.read_json("tests/fixtures/sample_data.json")))
+
+        # The same cases and features a pipeline run profiles
+        batch = deduplicate_cases(project_for_model(batch, model))
+        if len(batch) == 0:
+            print(f"No valid cases in {partition_date or 'the sample data'}, skipped")
+            continue
+        df_preds = predict_batch(batch, chunk_size=2000, workers=config["runtime"].get("inference_workers", 1))
+        # Later partitions are binned on the first one's edges so the profiles merge
+        profile = profile_run(
+            batch.embeddings, df_preds["confidence"].to_numpy(dtype=float),
+            df_preds["predicted_label"].to_numpy(), reference=state
+        )
+        state = profile if state is None else state.merge(profile)
+        print(f"Profiled {len(batch)} cases from {partition_date or 'the sample data'}")
+
+    if state is None:
+        print("No cases to profile, no reference written")
+        sys.exit(1)
+    output = args.output or config.get("drift", {}).get("reference_path", "src/models/drift_reference.json")
+    if not save_reference_profile(state, output, overwrite=args.force):
+        print(f"A drift reference already exists at {output}; pass --force to replace it")
+        sys.exit(1)
+    print(f"Drift reference ({state.count} cases, model {model.version}) written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -36,7 +36,8 @@ CREATE TABLE IF NOT EXISTS `ales-sandbox-465911.PCC_EPs.pcc_monitoring_logs`
     notes STRING,
     ingestion_time TIMESTAMP NOT NULL,
     processing_duration_seconds FLOAT64 NOT NULL,
-    error_message STRING
+    error_message STRING,
+    run_metrics STRING
 )
 PARTITION BY DATE(ingestion_time)
 OPTIONS(
@@ -45,6 +46,11 @@ OPTIONS(
     description = "PCC pipeline monitoring logs with 7-day retention"
 );
 
+-- Migration for monitoring tables created before run_metrics existed.
+-- Safe to re-run: the column is only added when it is missing.
+ALTER TABLE `ales-sandbox-465911.PCC_EPs.pcc_monitoring_logs`
+ADD COLUMN IF NOT EXISTS run_metrics STRING;
+
 -- 3. Create indexes for better query performance (optional)
 -- Note: BigQuery automatically creates indexes, but you can optimize specific query patterns
 
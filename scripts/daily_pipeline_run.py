@@ -29,7 +29,8 @@ def setup_logging():
     
     return logger
 
-def run_daily_pipeline(partition_date: str = None, mode: str = "prod", force_latest: bool = True, use_sample: bool = False):
+def run_daily_pipeline(partition_date: str = None, mode: str = "prod", force_latest: bool = True, use_sample: bool = False,
+                       workers: int = None):
     """
     Run the daily pipeline with model ingestion.
     
@@ -38,6 +39,7 @@ def run_daily_pipeline(partition_date: str = None, mode: str = "prod", force_lat
         mode: Runtime mode (dev/prod)
         force_latest: Whether to force ingestion of latest model
         use_sample: Whether to use sample data instead of BigQuery
+        workers: Worker processes for batch inference (uses config if not provided)
     """
     logger = setup_logging()
     
@@ -103,7 +105,8 @@ def run_daily_pipeline(partition_date: str = None, mode: str = "prod", force_lat
                 partition_date=partition_date,
                 mode=mode,
                 force_latest=force_latest,
-                skip_ingestion=True  # Already ingested above
+                skip_ingestion=True,  # Already ingested above
+                workers=workers
             )
         else:
             # Run with sample data as fallback
@@ -153,6 +156,8 @@ def main():
                        help="Don't force latest model ingestion")
     parser.add_argument("--sample", action="store_true", default=False,
                        help="Run pipeline with sample data instead of BigQuery")
+    parser.add_argument("--workers", type=int,
+                       help="Worker processes for batch inference (default: runtime.inference_workers)")
     
     args = parser.parse_args()
     
@@ -164,7 +169,8 @@ def main():
             partition_date=args.partition,
             mode=args.mode,
             force_latest=force_latest,
-            use_sample=args.sample
+            use_sample=args.sample,
+            workers=args.workers
         )
         
         if success:
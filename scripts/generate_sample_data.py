@@ -3,6 +3,7 @@
 Generate synthetic sample data for PCC Pipeline testing
 """
 
+import argparse
 import numpy as np
 import pandas as pd
 import joblib
@@ -10,8 +11,20 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import LabelEncoder
 import json
 import os
+import sys
 from datetime import datetime
 
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.batch_store import create_embeddings_file, save_cases
+
+# Rows generated per step when writing the binary format
+CHUNK_ROWS = 50000
+
+# The dummy model is trained on at most this many rows
+MAX_TRAIN_ROWS = 10000
+
 def generate_sample_embeddings(n_samples=100, embedding_dim=584):
     """Generate synthetic embeddings"""
     np.random.seed(42)  # For reproducibility
@@ -37,6 +50,31 @@ def generate_sample_cases(n_samples=100):
         'timestamp': timestamps
     })
 
+def generate_sample_store(path, n_samples=100, embedding_dim=584):
+    """
+    Write synthetic cases in the batch store format (embeddings.npy,
+    case_ids.npy and timestamps.npy, see utils.batch_store), filling the
+    memory-mapped matrix in chunks so large datasets fit in memory. Case ids
+    are saved as a NumPy unicode array (astype(str)), sized to the longest id.
+    Draws the same values as generate_sample_cases for the same n_samples.
+    """
+    np.random.seed(42)
+    embeddings = create_embeddings_file(path, n_samples, embedding_dim)
+    for start in range(0, n_samples, CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, n_samples)
+        embeddings[start:stop] = np.random.randn(stop - start, embedding_dim)
+    embeddings.flush()
+
+    case_ids = np.array([f"CASE_{i:06d}" for i in range(n_samples)])
+    timestamps = pd.date_range(start=datetime(2025, 1, 1), periods=n_samples, freq='H')
+    save_cases(path, case_ids, timestamps)
+
+    return pd.DataFrame({
+        'case_id': case_ids[:MAX_TRAIN_ROWS],
+        'embedding_vector': list(np.asarray(embeddings[:MAX_TRAIN_ROWS], dtype=np.float64)),
+        'timestamp': timestamps[:MAX_TRAIN_ROWS]
+    })
+
 def train_dummy_model(df):
     """Train a dummy model with synthetic data"""
     # Extract embeddings
@@ -52,7 +90,7 @@ def train_dummy_model(df):
     
     return model, y
 
-def save_sample_data():
+def save_sample_data(n_samples=100, data_format="both"):
     """Generate and save all sample data"""
     print("Generating sample data...")
     
@@ -61,12 +99,16 @@ def save_sample_data():
     os.makedirs('src/models', exist_ok=True)
     
     # Generate sample cases
-    df = generate_sample_cases(100)
-    df.to_json('tests/fixtures/sample_data.json', orient='records', date_format='iso')
-    print(f"✓ Saved {len(df)} sample cases to tests/fixtures/sample_data.json")
+    if data_format in ("npy", "both"):
+        df = generate_sample_store('tests/fixtures/sample_data', n_samples)
+        print(f"✓ Saved {n_samples} sample cases to tests/fixtures/sample_data/")
+    if data_format in ("json", "both"):
+        df = generate_sample_cases(n_samples)
+        df.to_json('tests/fixtures/sample_data.json', orient='records', date_format='iso')
+        print(f"✓ Saved {len(df)} sample cases to tests/fixtures/sample_data.json")
     
     # Train and save dummy model
-    model, labels = train_dummy_model(df)
+    model, labels = train_dummy_model(df.iloc[:MAX_TRAIN_ROWS])
     joblib.dump(model, 'src/models/pcc_v0.1.1.pkl')
     print("✓ Saved dummy model to src/models/pcc_v0.1.1.pkl")
     
@@ -92,10 +134,16 @@ def save_sample_data():
     
     # Print summary
     print(f"\n📊 Summary:")
-    print(f"   - Generated {len(df)} sample cases")
+    print(f"   - Generated {n_samples} sample cases")
     print(f"   - Model trained with {len(set(labels))} classes")
     print(f"   - Embedding dimension: 584")
     print(f"   - Files created in tests/fixtures/ and src/models/")
 
 if __name__ == "__main__":
-    save_sample_data() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic sample data")
+    parser.add_argument("--n-samples", type=int, default=100,
+                       help="Number of sample cases")
+    parser.add_argument("--format", dest="data_format", default="both", choices=["json", "npy", "both"],
+                       help="json (sample_data.json), npy (memory-mappable sample_data/ directory) or both")
+    args = parser.parse_args()
+    save_sample_data(n_samples=args.n_samples, data_format=args.data_format)
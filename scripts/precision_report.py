@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+PCC Precision Parity Report
+Scores a partition (or the sample data) with embeddings stored at reduced
+precision and compares the predictions with float64 scoring, so a
+models.precision setting can be checked before it is rolled out.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+from config.config import load_config
+from utils.batch_store import is_batch_store, load_batch
+from utils.embedding_batch import EmbeddingBatch
+from utils.embedding_precision import PRECISION_MODES
+from preprocessing.embed_text import validate_embeddings
+from preprocessing.feature_projection import project_for_model
+from inference.classifier_interface import ensure_model_loaded, precision_parity_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reduced-precision predictions with float64")
+    parser.add_argument("--mode", default="dev", choices=["dev", "prod", "test"],
+                       help="Runtime mode")
+    parser.add_argument("--partition-date", help="BigQuery partition (YYYYMMDD); sample data if omitted")
+    parser.add_argument("--precisions", nargs="+", default=["float32", "float16", "int8"],
+                       choices=[p for p in PRECISION_MODES if p != "float64"],
+                       help="Precisions to compare against float64")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+
+    args = parser.parse_args()
+    config = load_config(args.mode)
+
+    if args.partition_date:
+        from ingestion.load_from_bq import load_partitioned_data
+        batch = load_partitioned_data(
+            args.partition_date, as_batch=True,
+            expected_dim=config["models"].get("embedding_dim"), precision="float64"
+        )
+    elif is_batch_store("tests/fixtures/sample_data"):
+        batch = load_batch("tests/fixtures/sample_data").with_precision("float64")
+    else:
+        df = pd.read_json("tests/fixtures/sample_data.json")
+        batch = EmbeddingBatch.from_frame(df, dtype="float64")
+
+    batch = project_for_model(validate_embeddings(batch), ensure_model_loaded())
+    report = precision_parity_report(batch.embeddings, args.precisions)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+PCC Backfill Runner
+Runs the BigQuery pipeline over a range of partition dates in one process:
+the model is loaded once, partitions run concurrently, and completion is
+checkpointed per partition so an interrupted backfill resumes where it stopped.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config.config import load_config
+from utils.logger import get_logger
+from utils.backfill import BackfillCheckpoint, partition_dates, run_backfill
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill PCC predictions over a date range")
+    parser.add_argument("--start", required=True, help="First partition date (YYYYMMDD)")
+    parser.add_argument("--end", required=True, help="Last partition date, inclusive (YYYYMMDD)")
+    parser.add_argument("--mode", default="prod", choices=["dev", "prod"],
+                       help="Runtime mode")
+    parser.add_argument("--parallel", type=int,
+                       help="Partitions processed concurrently (default: runtime.backfill_parallelism)")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Worker processes for batch inference within each partition (requires --parallel 1)")
+    parser.add_argument("--checkpoint",
+                       help="Checkpoint file (default: data/backfill/<model_version>_<start>_<end>.json)")
+    parser.add_argument("--force-latest", action="store_true",
+                       help="Ingest the latest model before the backfill")
+    parser.add_argument("--full", action="store_true",
+                       help="Score every case, including ones already in the output table")
+    parser.add_argument("--incremental", action="store_true",
+                       help="Only score cases the active model has not scored yet (default: runtime.incremental)")
+
+    args = parser.parse_args()
+    logger = get_logger()
+    config = load_config(args.mode)
+    dates = partition_dates(args.start, args.end)
+    parallel = args.parallel or config["runtime"].get("backfill_parallelism", 1)
+    if parallel > 1 and args.workers > 1:
+        # Inference workers are forked, and forking a process that is already
+        # running partition threads can deadlock the children on locks those
+        # threads held
+        parser.error(f"--workers {args.workers} cannot be combined with {parallel} concurrent partitions; "
+                     f"use --parallel 1 with --workers, or --workers 1")
+
+    from scripts.run_pipeline import check_and_ingest_model, log_pipeline_run, run_pipeline_with_bigquery
+    from inference.classifier_interface import ensure_model_loaded
+
+    # Load the model once; every partition scores with this version
+    if args.force_latest:
+        check_and_ingest_model(force_latest=True)
+    model_version = ensure_model_loaded().version
+
+    checkpoint_path = args.checkpoint or os.path.join(
+        "data", "backfill", f"{model_version}_{args.start}_{args.end}.json"
+    )
+    checkpoint = BackfillCheckpoint(checkpoint_path, model_version)
+    logger.info(
+        f"Backfilling {len(dates)} partitions {args.start}-{args.end} with model {model_version}, "
+        f"{parallel} at a time (checkpoint: {checkpoint_path})"
+    )
+
+    def run_partition(partition_date: str) -> int:
+        start_time = time.time()
+        try:
+            df = run_pipeline_with_bigquery(
+                partition_date, args.mode, skip_ingestion=True, workers=args.workers,
+                incremental=False if args.full else (True if args.incremental else None)
+            )
+        except Exception:
+            # run_pipeline_with_bigquery logs its own row on success; record the failure too
+            log_pipeline_run(config, partition_date, 0, 0, 0, start_time, status="failed",
+                             run_metrics={"backfill": {"start": args.start, "end": args.end}})
+            raise
+        return len(df)
+
+    outcome = run_backfill(dates, run_partition, checkpoint, max_parallel=parallel)
+    print(f"Backfill: {len(outcome['completed'])} completed, {len(outcome['failed'])} failed, "
+          f"{len(outcome['skipped'])} already done")
+    if outcome["failed"]:
+        print(f"Failed partitions (rerun to retry): {', '.join(outcome['failed'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
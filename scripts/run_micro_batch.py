@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+PCC Micro-batch Runner
+Scores only the cases whose request_time is past a persisted high-watermark,
+then advances the watermark once the predictions are written. Meant to be
+scheduled every few minutes: a run with nothing new exits early, a failed run
+leaves the watermark in place so the next run retries the same window, and
+with --incremental (or runtime.incremental) a rerun of a window skips
+already-scored cases.
+
+The watermark is on request_time. Cases whose rows land more than
+microbatch.lateness_minutes after their request_time are behind the watermark
+by then and are only scored by the daily run. Each run counts the unscored
+cases in the last microbatch.late_check_hours behind the watermark, logs
+them as a warning and records the count under late_arrivals in its
+monitoring row.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config.config import load_config
+from utils.logger import get_logger
+from utils.watermark import Watermark, next_window
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score PCC cases that arrived since the last micro-batch")
+    parser.add_argument("--mode", default="prod", choices=["dev", "prod"],
+                       help="Runtime mode")
+    parser.add_argument("--watermark",
+                       help="Watermark file, local or gs:// (default: microbatch.watermark_path)")
+    parser.add_argument("--workers", type=int,
+                       help="Worker processes for batch inference (default: runtime.inference_workers)")
+    parser.add_argument("--force-latest", action="store_true",
+                       help="Ingest the latest model before scoring")
+    parser.add_argument("--latest-model", action="store_true",
+                       help="Score with the latest model, downloading it only if it is not the cached one")
+    parser.add_argument("--full", action="store_true",
+                       help="Score every case in the window, including ones already in the output table")
+    parser.add_argument("--incremental", action="store_true",
+                       help="Only score cases the active model has not scored yet (default: runtime.incremental)")
+
+    args = parser.parse_args()
+    logger = get_logger()
+    config = load_config(args.mode)
+    settings = config.get("microbatch", {})
+
+    watermark = Watermark(args.watermark or settings.get("watermark_path", "data/watermark/request_time.json"))
+    window = next_window(
+        watermark.value,
+        datetime.now(timezone.utc),
+        lateness=timedelta(minutes=settings.get("lateness_minutes", 10)),
+        max_window=timedelta(hours=settings.get("max_window_hours", 6)),
+        initial_lookback=timedelta(hours=settings.get("initial_lookback_hours", 24))
+    )
+    if window is None:
+        logger.info(f"Watermark {watermark.value.isoformat()} is current, nothing to do")
+        return
+    start, end = window
+    partition_date = end.strftime("%Y%m%d")
+    logger.info(f"Micro-batch over request_time ({start.isoformat()}, {end.isoformat()}]")
+
+    from scripts.run_pipeline import check_and_ingest_model, log_pipeline_run, run_pipeline_with_bigquery
+    from inference.classifier_interface import ensure_model_loaded
+
+    if args.force_latest:
+        check_and_ingest_model(force_latest=True)
+    elif args.latest_model:
+        from ingestion.load_model_from_gcs import cached_model_folder, get_latest_model_folder
+
+        latest = get_latest_model_folder()
+        if latest is not None and latest == cached_model_folder():
+            logger.info(f"Latest model {latest} is already cached, not downloading it")
+        else:
+            check_and_ingest_model(force_latest=True)
+    model_version = ensure_model_loaded().version
+
+    # Unscored cases behind the watermark; counted by the run so the query cost lands in its metrics
+    first_window = watermark.value is None
+    late_check_hours = settings.get("late_check_hours", 24)
+    late_check = None
+    if late_check_hours and not first_window and not config["runtime"].get("dry_run", False):
+        late_check = (start - timedelta(hours=late_check_hours), start)
+
+    start_time = time.time()
+    try:
+        df = run_pipeline_with_bigquery(
+            partition_date, args.mode, skip_ingestion=True, workers=args.workers,
+            incremental=False if args.full else (True if args.incremental else None), window=window,
+            late_check=late_check
+        )
+    except Exception as e:
+        # The watermark stays put; the next run retries this window
+        logger.error(f"Micro-batch failed, watermark left at {start.isoformat()}: {e}")
+        log_pipeline_run(config, partition_date, 0, 0, 0, start_time, status="failed",
+                         run_metrics={"window": {"start": start.isoformat(), "end": end.isoformat()}})
+        sys.exit(1)
+
+    if config["runtime"].get("dry_run", False):
+        logger.info("Dry run, watermark not advanced")
+        return
+    watermark.advance(end, model_version=model_version, cases=len(df))
+    print(f"Micro-batch: {len(df)} cases scored up to {end.isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
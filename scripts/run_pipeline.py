@@ -87,17 +87,35 @@ def check_and_ingest_model(force_latest: bool = False, skip_ingestion: bool = Fa
         logger.warning("Continuing with existing model")
         return False
 
-def load_sample_data():
-    """Load synthetic sample data for demonstration"""
+SAMPLE_DATA_STORE = 'tests/fixtures/sample_data'
+SAMPLE_DATA_JSON = 'tests/fixtures/sample_data.json'
+
+def load_sample_data(path: str = None):
+    """
+    Load synthetic sample data for demonstration.
+
+    Returns an EmbeddingBatch over the memory-mapped binary store
+    (tests/fixtures/sample_data/) when there is one, otherwise a DataFrame
+    parsed from the JSON fixture.
+    """
+    from utils.batch_store import is_batch_store, load_batch
+
+    if path is None:
+        path = SAMPLE_DATA_STORE if is_batch_store(SAMPLE_DATA_STORE) else SAMPLE_DATA_JSON
+    if is_batch_store(path):
+        return load_batch(path)
     try:
-        with open('tests/fixtures/sample_data.json', 'r') as f:
+        with open(path, 'r') as f:
             data = json.load(f)
-        return pd.DataFrame(data)
+        df = pd.DataFrame(data)
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='raise')
+        return df
     except FileNotFoundError:
         print("❌ Sample data not found. Run 'python scripts/generate_sample_data.py' first.")
         sys.exit(1)
 
-def run_pipeline_with_sample_data(force_latest: bool = False, skip_ingestion: bool = False):
+def run_pipeline_with_sample_data(force_latest: bool = False, skip_ingestion: bool = False, sample_path: str = None):
     """Execute pipeline with synthetic data"""
     logger = get_logger()
     
@@ -118,51 +136,37 @@ def run_pipeline_with_sample_data(force_latest: bool = False, skip_ingestion: bo
     
     # Load sample data
     print("📊 Loading sample data...")
-    df_raw = load_sample_data()
-    if 'timestamp' in df_raw.columns:
-        df_raw['timestamp'] = pd.to_datetime(df_raw['timestamp'], errors='raise')
-    print(f"   ✓ Loaded {len(df_raw)} sample cases")
+    from utils.embedding_batch import EmbeddingBatch
+    sample = load_sample_data(sample_path)
+    print(f"   ✓ Loaded {len(sample)} sample cases")
     
-    # Validate input schema
-    print("🔍 Validating input schema...")
-    validate_schema(df_raw, schema_path="schemas/input_schema.json")
-    print("   ✓ Input schema validated")
+    # Validate input schema (the binary store is checked when it is loaded)
+    if isinstance(sample, pd.DataFrame):
+        print("🔍 Validating input schema...")
+        validate_schema(sample, schema_path="schemas/input_schema.json")
+        print("   ✓ Input schema validated")
+        sample = EmbeddingBatch.from_frame(sample)
     
     # Preprocessing
     print("⚙️  Preprocessing embeddings...")
-    from preprocessing.embed_text import validate_embeddings, truncate_embeddings_to_model_dimensions
-    
-    # For sample data, use 584 dimensions (model expects 584)
-    # For BigQuery data, use 588 dimensions and then truncate
-    df_valid = validate_embeddings(df_raw, expected_dim=584)
-    print(f"   ✓ Validated {len(df_valid)} embeddings")
-    
-    # Only truncate if we have embeddings with more than 584 dimensions
-    if len(df_valid) > 0:
-        sample_embedding = df_valid.iloc[0]['embedding_vector']
-        if len(sample_embedding) > 584:
-            print("🔧 Fixing feature mismatch...")
-            df_valid = truncate_embeddings_to_model_dimensions(df_valid, target_dim=584)
-            print(f"   ✓ Truncated embeddings to 584 dimensions")
-        else:
-            print("   ✓ Embeddings already match model dimensions")
-    else:
+    from preprocessing.embed_text import validate_embeddings
+    from preprocessing.feature_projection import project_for_model
+    from inference.classifier_interface import ensure_model_loaded
+    
+    batch = validate_embeddings(sample)
+    print(f"   ✓ Validated {len(batch)} embeddings")
+    if len(batch) == 0:
         print("   ⚠️  No valid embeddings found")
     
+    # Select the features the model was trained on
+    batch = project_for_model(batch, ensure_model_loaded())
+    print(f"   ✓ Projected embeddings to {batch.n_features} model features")
+    
     # Inference
     print("🤖 Running inference...")
-    from inference.classifier_interface import predict
-    
-    predictions = []
-    for _, row in df_valid.iterrows():
-        embedding = np.array(row['embedding_vector'])
-        pred = predict(embedding)
-        predictions.append({
-            'case_id': row['case_id'],
-            **pred
-        })
-    
-    df_preds = pd.DataFrame(predictions)
+    from inference.predict_intent import predict_batch
+    
+    df_preds = predict_batch(batch, chunk_size=2000)
     print(f"   ✓ Generated {len(df_preds)} predictions")
     
     # Postprocessing
@@ -182,12 +186,12 @@ def run_pipeline_with_sample_data(force_latest: bool = False, skip_ingestion: bo
         display_results(df_formatted, config)
     else:
         print("📤 Writing to BigQuery...")
-        from output.write_to_bq import write_to_bigquery, verify_bigquery_write
-        success = write_to_bigquery(df_formatted)
-        if success:
+        from output.write_to_bq import write_to_bigquery, verify_write_receipts
+        receipt = write_to_bigquery(df_formatted)
+        if receipt is not None:
             print("   ✓ Successfully wrote to BigQuery")
-            # Verify the write operation
-            verify_success = verify_bigquery_write(df_formatted)
+            # Verify the write from the load job's receipt
+            verify_success = verify_write_receipts([receipt], len(df_formatted))
             if verify_success:
                 print("   ✓ BigQuery write verified")
             else:
@@ -203,17 +207,68 @@ def run_pipeline_with_sample_data(force_latest: bool = False, skip_ingestion: bo
     partition_date = str(partition_date)
     if len(partition_date) == 8 and partition_date.isdigit():
         partition_date = f"{partition_date[:4]}-{partition_date[4:6]}-{partition_date[6:]}"
-    log_pipeline_run(config, partition_date, len(df_raw), len(df_valid), len(df_formatted), time.time())
+    log_pipeline_run(config, partition_date, batch.total_cases, len(batch), len(df_formatted), time.time(),
+                     run_metrics={"validation_drops": batch.drop_counts})
     
     return df_formatted
 
-def run_pipeline_with_bigquery(partition_date: str, mode: str = "dev", force_latest: bool = False, skip_ingestion: bool = False):
-    """Execute pipeline with BigQuery data"""
+def log_late_arrivals(late_window: tuple, logger) -> dict:
+    """
+    Warn about cases behind the micro-batch watermark that no run has scored.
+
+    Args:
+        late_window: (start, end] request_time range already passed by the watermark
+        logger: Logger of the run
+
+    Returns:
+        dict: Window and count of unscored cases, for run_metrics
+    """
+    from ingestion.load_from_bq import count_late_arrivals
+
+    start, end = late_window
+    metrics = {"start": start.isoformat(), "end": end.isoformat()}
+    try:
+        metrics["cases"] = count_late_arrivals(late_window)
+    except Exception as e:
+        logger.warning(f"Could not count late arrivals: {e}")
+        metrics["error"] = str(e)
+        return metrics
+    if metrics["cases"]:
+        hours = (end - start).total_seconds() / 3600
+        logger.warning(
+            f"{metrics['cases']} cases with request_time in the {hours:g}h before the watermark "
+            f"{end.isoformat()} have no prediction; they arrived late and are left to the daily run"
+        )
+    return metrics
+
+
+def run_pipeline_with_bigquery(partition_date: str, mode: str = "dev", force_latest: bool = False, skip_ingestion: bool = False,
+                               workers: int = None, use_cache: bool = None, incremental: bool = None,
+                               window: tuple = None, late_check: tuple = None):
+    """
+    Execute pipeline with BigQuery data.
+    With window=(start, end), only the cases with request_time in (start, end]
+    are processed (micro-batch mode, see scripts/run_micro_batch.py).
+    With late_check=(start, end), the unscored cases with request_time in that
+    range are counted once the run has written its predictions; the count and
+    its query cost are part of the run's metrics.
+    Raises if the predictions cannot be written, so callers never record a
+    failed write as done. If a streamed write fails after some chunks were
+    committed, the partition (or window start) is recorded under
+    bq.partial_writes_path and its next run scores only the cases not in the
+    output table yet, unless incremental=False is passed explicitly.
+    """
     import time
     
     logger = get_logger()
     config = load_config(mode)
     start_time = time.time()
+    if workers is None:
+        workers = config["runtime"].get("inference_workers", 1)
+
+    # Bytes, slot time and cache hits of every BigQuery job of this run
+    from monitoring.query_costs import track_query_costs
+    query_costs = track_query_costs()
 
     logger.info("Starting PCC pipeline with BigQuery data")
     logger.info(f"Partition date: {partition_date}")
@@ -226,50 +281,214 @@ def run_pipeline_with_bigquery(partition_date: str, mode: str = "dev", force_lat
     else:
         logger.warning("Model ingestion failed, continuing with existing model")
 
-    # Ingestion
+    # Ingestion (incremental: only cases the active model has not scored yet)
     from ingestion.load_from_bq import load_partitioned_data
-    df_raw = load_partitioned_data(partition_date)
-    validate_schema(df_raw, schema_path="schemas/input_schema.json")
-    logger.info(f"Loaded {len(df_raw)} rows from BigQuery snapshot")
+    from inference.classifier_interface import ensure_model_loaded
+    # Only an explicit incremental=False (--full) rescores cases a partial write committed
+    full_rescore = incremental is False
+    if incremental is None:
+        incremental = config["runtime"].get("incremental", False)
+    # One model for the whole run, even if a reload lands while it scores
+    model = ensure_model_loaded()
+    model_version = model.version
+
+    # A previous run that failed after committing some chunks: skip what it wrote
+    from utils.partial_writes import PartialWrites
+    partial_writes = PartialWrites(config["bq"].get("partial_writes_path", "data/partial_writes"))
+    partial_key = f"window_{window[0].strftime('%Y%m%dT%H%M%S')}" if window else partition_date
+    partial = partial_writes.get(partial_key)
+    if partial is not None:
+        if full_rescore:
+            logger.warning(
+                f"A previous run of {partial_key} committed {partial['committed_rows']} rows before failing; "
+                "they are written again because this run scores every case"
+            )
+        else:
+            logger.warning(
+                f"A previous run of {partial_key} committed {partial['committed_rows']} rows before failing; "
+                "scoring only the cases not in the output table yet"
+            )
+            incremental = True
+    embedding_dim = config["models"].get("embedding_dim")
+    batch = load_partitioned_data(
+        partition_date, as_batch=True, expected_dim=embedding_dim,
+        precision=config["models"].get("precision", "float32"), use_cache=use_cache,
+        skip_scored_version=model_version if incremental else None, window=window
+    )
+    logger.info(f"Loaded {batch.total_cases} rows from BigQuery snapshot")
+    if incremental:
+        logger.warning(
+            f"Incremental run: cases already scored by {model_version} in the output table were excluded, "
+            f"{batch.total_cases} unscored cases loaded for partition {partition_date}; rerun with --full to rescore them"
+        )
+    window_metrics = {"start": window[0].isoformat(), "end": window[1].isoformat()} if window else None
+    if (incremental or window) and batch.total_cases == 0:
+        logger.info(f"No new cases for {model_version} in partition {partition_date}, nothing to do")
+        empty_metrics = {"incremental": {"model_version": model_version, "new_cases": 0}} if incremental else {}
+        if window_metrics:
+            empty_metrics["window"] = window_metrics
+        if late_check:
+            empty_metrics["late_arrivals"] = log_late_arrivals(late_check, logger)
+        empty_metrics["query_costs"] = query_costs.summary()
+        log_pipeline_run(config, partition_date, 0, 0, 0, start_time, run_metrics=empty_metrics)
+        if partial is not None and not config["runtime"].get("dry_run", False):
+            partial_writes.clear(partial_key)
+        with open("schemas/output_schema.json", "r") as f:
+            return pd.DataFrame(columns=list(json.load(f)))
 
     # Preprocessing
-    from preprocessing.embed_text import validate_embeddings, truncate_embeddings_to_model_dimensions
-    df_valid = validate_embeddings(df_raw)
-    logger.info(f"Validated {len(df_valid)} embeddings")
-    
-    # Fix feature mismatch by truncating to model dimensions
-    df_valid = truncate_embeddings_to_model_dimensions(df_valid, target_dim=584)
-    logger.info(f"Truncated embeddings to 584 dimensions")
+    from preprocessing.embed_text import validate_embeddings
+    from preprocessing.feature_projection import project_for_model
+    batch = validate_embeddings(batch, expected_dim=embedding_dim)
+    logger.info(f"Validated {len(batch)} embeddings")
+    # Counted before dedup; duplicate cases are reported under run_metrics["dedup"] only
+    passed_validation = len(batch)
+    validation_drops = dict(batch.drop_counts)
+    
+    # Select the features the model was trained on (model metadata, not a fixed prefix)
+    batch = project_for_model(batch, model)
+    logger.info(f"Projected embeddings to {batch.n_features} model features")
+
+    # Score each distinct case and embedding once; results are fanned back out below
+    from preprocessing.dedup import deduplicate_cases, unique_embeddings, fan_out_predictions, dedup_metrics
+    batch = deduplicate_cases(batch)
+    unique, inverse = unique_embeddings(batch)
 
     # Inference
     from inference.predict_intent import predict_batch
-    df_preds = predict_batch(df_valid, chunk_size=2000)
-    logger.info(f"Predicted {len(df_preds)} cases")
+    run_metrics = {"validation_drops": validation_drops, "dedup": dedup_metrics(batch, unique)}
+    if incremental:
+        run_metrics["incremental"] = {"model_version": model_version, "new_cases": batch.total_cases}
+    if window_metrics:
+        run_metrics["window"] = window_metrics
 
-    # Postprocessing
+    # Streaming output: each scored chunk is formatted and appended while later chunks score
     from postprocessing.format_output import format_predictions
-    df_formatted = format_predictions(df_preds, schema_path="schemas/output_schema.json")
-    validate_schema(df_formatted, schema_path="schemas/output_schema.json")
-    logger.info("Output schema validated")
+    writer, on_chunk, formatted_chunks = None, None, []
+    if config["bq"].get("streaming_write", False) and not config["runtime"].get("dry_run", False):
+        from output.write_to_bq import StreamingWriter
+        from preprocessing.dedup import representative_rows
+        writer = StreamingWriter(
+            chunk_rows=int(config["bq"].get("write_chunk_rows", 50000)),
+            max_in_flight=int(config["bq"].get("write_parallelism", 2))
+        )
+        order, offsets = representative_rows(inverse, len(unique))
+
+        def on_chunk(start: int, end: int, preds: pd.DataFrame) -> None:
+            cases = fan_out_predictions(preds, unique, batch, inverse, rows=order[offsets[start]:offsets[end]])
+            formatted_chunks.append(format_predictions(cases.copy(), schema_path="schemas/output_schema.json"))
+            writer.write(formatted_chunks[-1])
+
+    challenger_configs = config.get("shadow", {}).get("challengers") or []
+    if challenger_configs:
+        # Champion/challenger: score every configured model in the same pass
+        from inference.classifier_interface import load_challengers
+        from inference.predict_intent import predict_batch_shadow, summarize_challengers
+        from output.write_shadow_output import write_shadow_predictions
+        challengers = load_challengers(challenger_configs)
+        df_preds, df_shadow = predict_batch_shadow(
+            unique, challengers, chunk_size=2000, workers=workers, on_chunk=on_chunk, model=model
+        )
+        df_preds = fan_out_predictions(df_preds, unique, batch, inverse)
+        df_shadow = fan_out_predictions(df_shadow, unique, batch, inverse)
+        run_metrics["challengers"] = summarize_challengers(df_shadow)
+        for version, summary in run_metrics["challengers"].items():
+            logger.info(f"Challenger {version}: {summary}")
+        if len(df_shadow) > 0:
+            # Shadow output is a side channel; its failure never stops the champion write
+            try:
+                path = write_shadow_predictions(
+                    df_shadow, partition_date, config["shadow"].get("output_dir", "data/shadow")
+                )
+                run_metrics["shadow"] = {"path": path, "rows": len(df_shadow)}
+            except Exception as e:
+                logger.error(f"Failed to write shadow predictions: {e}")
+                run_metrics["shadow"] = {"error": str(e), "rows": len(df_shadow)}
+    else:
+        df_preds = fan_out_predictions(
+            predict_batch(unique, chunk_size=2000, workers=workers, on_chunk=on_chunk, model=model),
+            unique, batch, inverse
+        )
+    logger.info(f"Predicted {len(df_preds)} cases")
+
+    # Drift against the reference profile, in one pass over the validated matrix
+    drift_config = config.get("drift", {})
+    if drift_config.get("enabled", False):
+        from monitoring.drift_detector import check_drift
+        try:
+            run_metrics["drift"] = check_drift(
+                batch.embeddings,
+                df_preds["confidence"].to_numpy(dtype=float),
+                df_preds["predicted_label"].to_numpy(),
+                drift_config.get("reference_path", "src/models/drift_reference.json"),
+                save_reference_if_missing=drift_config.get("save_reference_if_missing", False)
+            )
+        except Exception as e:
+            logger.warning(f"Drift check failed: {e}")
+
+    # Postprocessing (already done chunk by chunk when streaming)
+    if writer is not None:
+        # Each chunk was validated by the writer before its load was submitted
+        df_formatted = pd.concat(formatted_chunks, ignore_index=True) if formatted_chunks else format_predictions(
+            df_preds, schema_path="schemas/output_schema.json"
+        )
+    else:
+        df_formatted = format_predictions(df_preds, schema_path="schemas/output_schema.json")
+        validate_schema(df_formatted, schema_path="schemas/output_schema.json")
+        logger.info("Output schema validated")
 
     # Output
     if config["runtime"].get("dry_run", False):
         display_results(df_formatted, config)
     else:
-        from output.write_to_bq import write_to_bigquery, verify_bigquery_write
-        success = write_to_bigquery(df_formatted)
+        from output.write_to_bq import write_to_bigquery, verify_write_receipts
+        if writer is not None:
+            # Wait for the chunks still loading; failed loads were retried per chunk
+            success = writer.close()
+            run_metrics["write"] = writer.summary()
+        else:
+            receipt = write_to_bigquery(df_formatted)
+            success = receipt is not None
+            run_metrics["write"] = {"receipts": [receipt] if success else []}
         if success:
             logger.info("Predictions written to BigQuery successfully")
-            # Verify the write operation
-            verify_success = verify_bigquery_write(df_formatted)
-            if not verify_success:
+            # Verify the write from the load jobs' receipts, kept in the monitoring record
+            run_metrics["write"]["verified"] = verify_write_receipts(run_metrics["write"]["receipts"], len(df_formatted))
+            if not run_metrics["write"]["verified"]:
                 logger.warning("BigQuery write verification failed")
         else:
             logger.error("Failed to write predictions to BigQuery")
-            status = "failed"
+            committed = run_metrics["write"].get("committed", 0)
+            if committed:
+                # Committed chunks stay in the output table; the retry must not append them again
+                try:
+                    partial_writes.record(
+                        partial_key, partition_date=partition_date, model_version=model_version,
+                        chunks=run_metrics["write"]["chunks"], committed_chunks=committed,
+                        committed_rows=run_metrics["write"]["committed_rows"]
+                    )
+                except Exception as e:
+                    logger.error(f"Could not record the partial write of {partial_key}: {e}")
+                raise RuntimeError(
+                    f"Failed to write predictions for partition {partition_date} to BigQuery after "
+                    f"{committed} of {run_metrics['write']['chunks']} chunks "
+                    f"({run_metrics['write']['committed_rows']} rows) were committed; the next run of "
+                    f"{partial_key} scores only the remaining cases, or rerun it with --incremental"
+                )
+            raise RuntimeError(f"Failed to write predictions for partition {partition_date} to BigQuery")
+        if partial is not None:
+            partial_writes.clear(partial_key)
+    if late_check:
+        run_metrics["late_arrivals"] = log_late_arrivals(late_check, logger)
     
     # Monitoring
-    log_pipeline_run(config, partition_date, len(df_raw), len(df_valid), len(df_formatted), start_time)
+    run_metrics["query_costs"] = query_costs.summary()
+    logger.info(
+        f"BigQuery jobs: {run_metrics['query_costs']['jobs']}, "
+        f"{run_metrics['query_costs']['bytes_billed'] / 10**9:.3f} GB billed"
+    )
+    log_pipeline_run(config, partition_date, batch.total_cases, passed_validation, len(df_formatted), start_time,
+                     run_metrics=run_metrics)
     
     return df_formatted
 
@@ -302,15 +521,16 @@ def display_results(df: pd.DataFrame, config: dict):
         print("💡 This was a dry run. Set DRY_RUN=true to prevent writing to BigQuery.")
 
 def log_pipeline_run(config: dict, partition_date: str, total_cases: int, 
-                    passed_validation: int, output_cases: int, start_time=None, status="success"):
+                    passed_validation: int, output_cases: int, start_time=None, status="success",
+                    run_metrics: dict = None):
     """Log pipeline execution to monitoring system"""
     try:
-        from monitoring.log_inference_run import log_inference_run, verify_monitoring_log
+        from monitoring.log_inference_run import log_inference_run
         import time
         
         if status == "success" and output_cases > 0:
             run_status = "success"
-        elif output_cases == 0:
+        elif status == "success" and output_cases == 0:
             run_status = "empty"
         else:
             run_status = status
@@ -326,7 +546,8 @@ def log_pipeline_run(config: dict, partition_date: str, total_cases: int,
             dropped_cases=total_cases - passed_validation,
             status=run_status,
             notes=f"Pipeline run with status: {run_status}",
-            processing_duration_seconds=processing_duration
+            processing_duration_seconds=processing_duration,
+            run_metrics=run_metrics
         )
         
         if success:
@@ -406,14 +627,27 @@ def main():
                        help="Get the latest model regardless of date")
     parser.add_argument("--skip-ingestion", action="store_true",
                        help="Skip model ingestion and use existing model")
+    parser.add_argument("--sample-path",
+                       help="Sample data: a binary store directory or a JSON file (default: tests/fixtures/sample_data/ if present)")
+    parser.add_argument("--full", action="store_true",
+                       help="Score every case in the partition, including ones already in the output table")
+    parser.add_argument("--incremental", action="store_true",
+                       help="Only score cases the active model has not scored yet (default: runtime.incremental)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Query BigQuery even if the partition is in the local cache")
+    parser.add_argument("--workers", type=int,
+                       help="Worker processes for batch inference (default: runtime.inference_workers)")
     
     args = parser.parse_args()
     
     try:
         if args.sample or not args.partition:
-            run_pipeline_with_sample_data(force_latest=args.force_latest, skip_ingestion=args.skip_ingestion)
+            run_pipeline_with_sample_data(force_latest=args.force_latest, skip_ingestion=args.skip_ingestion,
+                                          sample_path=args.sample_path)
         else:
-            run_pipeline_with_bigquery(args.partition, args.mode, force_latest=args.force_latest, skip_ingestion=args.skip_ingestion)
+            run_pipeline_with_bigquery(args.partition, args.mode, force_latest=args.force_latest, skip_ingestion=args.skip_ingestion,
+                                       workers=args.workers, use_cache=False if args.no_cache else None,
+                                       incremental=False if args.full else (True if args.incremental else None))
     except Exception as e:
         print(f"❌ Error running pipeline: {e}")
         sys.exit(1)
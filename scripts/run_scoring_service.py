@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+PCC Online Scoring Service
+Serves the classifier over HTTP, micro-batching concurrent requests into
+single predict_many calls.
+
+Endpoints:
+    POST /predict   {"case_id": ..., "embedding_vector": [...]}
+                    or {"instances": [{"case_id": ..., "embedding_vector": [...]}, ...]}
+    GET  /stats     Request counts, p50/p95/p99 latency and batch-size stats
+    GET  /healthz   Liveness check
+    POST /reload    Load the model on disk in the background and swap it in
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.config import load_config
+from inference.scoring_service import ScoringService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the PCC online scoring service")
+    parser.add_argument("--mode", default="dev", choices=["dev", "prod"],
+                       help="Runtime mode")
+    parser.add_argument("--host", help="Bind address (default: serving.host)")
+    parser.add_argument("--port", type=int, help="Bind port (default: serving.port)")
+    parser.add_argument("--max-batch-size", type=int,
+                       help="Flush a batch once this many requests are queued (default: serving.max_batch_size)")
+    parser.add_argument("--max-wait-ms", type=float,
+                       help="Flush a batch this long after its first request (default: serving.max_wait_ms)")
+
+    args = parser.parse_args()
+
+    serving = load_config(args.mode).get("serving", {})
+    service = ScoringService(
+        host=args.host or serving.get("host", "0.0.0.0"),
+        port=args.port or serving.get("port", 8080),
+        max_batch_size=args.max_batch_size or serving.get("max_batch_size", 256),
+        max_wait_ms=args.max_wait_ms or serving.get("max_wait_ms", 10)
+    )
+
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("Scoring service stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,12 @@ def load_config(mode="dev"):
     config["bq"]["output_table"] = os.getenv(
         "BQ_OUTPUT_TABLE", config["bq"]["output_table"]
     )
+    config["bq"]["read_shards"] = int(os.getenv(
+        "BQ_READ_SHARDS", config["bq"].get("read_shards", 1)
+    ))
+    
+    gcp = config.setdefault("gcp", {})
+    gcp["project"] = os.getenv("BQ_PROJECT_ID", gcp.get("project"))
     
     config["models"]["model_version"] = os.getenv(
         "MODEL_VERSION", config["models"].get("model_version", "v0.1")
@@ -34,9 +40,18 @@ def load_config(mode="dev"):
     config["models"]["embedding_model"] = os.getenv(
         "EMBEDDING_MODEL", config["models"]["embedding_model"]
     )
+    config["models"]["scoring_engine"] = os.getenv(
+        "SCORING_ENGINE", config["models"].get("scoring_engine", "sklearn")
+    )
+    config["models"]["precision"] = os.getenv(
+        "EMBEDDING_PRECISION", config["models"].get("precision", "float32")
+    )
     
     config["runtime"]["partition_date"] = os.getenv(
         "PARTITION_DATE", config["runtime"]["partition_date"]
     )
+    config["runtime"]["inference_workers"] = int(os.getenv(
+        "INFERENCE_WORKERS", config["runtime"].get("inference_workers", 1)
+    ))
     
     return config
\ No newline at end of file
@@ -2,66 +2,87 @@
 
 import numpy as np
 import pandas as pd
-import joblib
-import json
-import os
-from config.config import load_config
-from typing import Optional, Dict
+from concurrent.futures import Future
+from typing import Optional, Dict, List, Sequence, Tuple
+from utils.embedding_precision import to_precision
 from utils.logger import get_logger
+from .linear_kernel import stacked_predict_proba
+from .model_registry import ModelHandle, ModelRegistry
 
 logger = get_logger()
 
-# Global variables to cache model and metadata
-# These are intentionally unused at module level - they're used within functions
-_classifier = None  # noqa: F824
-_metadata = None  # noqa: F824
-_model_version = None  # noqa: F824
-_embedding_model = None  # noqa: F824
+# Process-wide registry holding the loaded model versions
+_registry = ModelRegistry()
 
 
-def _load_model_artifacts():
-    """Load model artifacts and cache them globally."""
-    global _classifier, _metadata, _model_version, _embedding_model
-    
-    config = load_config()
-    
-    # Load model path from config
-    classifier_path = config["models"]["classifier_path"]
-    
-    # Check if model file exists
-    if not os.path.exists(classifier_path):
-        raise FileNotFoundError(f"Model file not found: {classifier_path}")
-    
-    # Load the classifier
-    try:
-        _classifier = joblib.load(classifier_path)
-        logger.info(f"Loaded classifier from {classifier_path}")
-    except Exception as e:
-        logger.error(f"Failed to load classifier from {classifier_path}: {e}")
-        raise
-    
-    # Load metadata if available
-    metadata_path = "src/models/metadata.json"
-    if os.path.exists(metadata_path):
-        try:
-            with open(metadata_path, 'r') as f:
-                _metadata = json.load(f)
-            logger.info("Loaded model metadata")
-        except Exception as e:
-            logger.warning(f"Failed to load metadata: {e}")
-            _metadata = {}
-    else:
-        logger.warning("No metadata file found")
-        _metadata = {}
-    
-    # Get model version and embedding model from config or metadata
-    _model_version = config["models"].get("model_version", "unknown")
-    _embedding_model = config["models"].get("embedding_model", "unknown")
-    
-    # Override with metadata if available
-    if _metadata:
-        _model_version = _metadata.get("model_version", _model_version)
-        _embedding_model = _metadata.get("embedding_model", _embedding_model)
+def get_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    return _registry
+
+
+def ensure_model_loaded() -> ModelHandle:
+    """Load the configured model if nothing is active yet and return the active model."""
+    return _registry.ensure_active()
+
+
+def _labels_and_confidence(model: ModelHandle, probabilities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the argmax label and its probability for every row."""
+    best = probabilities.argmax(axis=1)
+    labels = model.scorer.classes_[best].astype(str)
+    confidence = probabilities[np.arange(len(best)), best].astype(float)
+    return labels, confidence
+
+
+def _score(model: ModelHandle, matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Score a 2D embedding matrix with a single probability pass."""
+    return _labels_and_confidence(model, model.scorer.predict_proba(matrix))
+
+
+def _stacked_probabilities(models: Sequence[ModelHandle], matrix: np.ndarray) -> List[np.ndarray]:
+    """
+    Class probabilities for several models over the same matrix. Models with a
+    NumPy kernel share one stacked matmul; the rest are scored by sklearn.
+    """
+    probabilities = [None] * len(models)
+    kernel_indices = [i for i, model in enumerate(models) if model.kernel is not None]
+    if kernel_indices:
+        stacked = stacked_predict_proba([models[i].kernel for i in kernel_indices], matrix)
+        for i, proba in zip(kernel_indices, stacked):
+            probabilities[i] = proba
+    for i, model in enumerate(models):
+        if probabilities[i] is None:
+            probabilities[i] = model.classifier.predict_proba(matrix)
+    return probabilities
+
+
+def _check_batch(matrix: np.ndarray, case_ids: Sequence) -> np.ndarray:
+    """Validate a 2D embedding matrix against its case ids."""
+    matrix = np.asarray(matrix)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2D embedding matrix, got shape {matrix.shape}")
+    if len(case_ids) != matrix.shape[0]:
+        raise ValueError(
+            f"Got {len(case_ids)} case ids for {matrix.shape[0]} embeddings"
+        )
+    return matrix
+
+
+def _predictions_frame(model: ModelHandle, case_ids: Sequence, probabilities: np.ndarray) -> pd.DataFrame:
+    """Columnar predict() output for a scored batch."""
+    labels, confidence = _labels_and_confidence(model, probabilities)
+
+    # Scalars are broadcast over the batch; one timestamp per scoring pass
+    return pd.DataFrame({
+        "case_id": np.asarray(case_ids),
+        "predicted_label": labels,
+        "subtype_label": pd.Series(pd.NA, index=range(len(labels)), dtype="string"),
+        "confidence": confidence,
+        "model_version": model.version,
+        "embedding_model": model.embedding_model,
+        "inference_timestamp": pd.Timestamp.utcnow(),
+        "prediction_notes": f"{model.classifier_type} model",
+        "trained_on": model.trained_on
+    })
 
 
 def predict(embedding: np.ndarray, metadata: Optional[Dict] = None) -> dict:
@@ -69,39 +90,226 @@ def predict(embedding: np.ndarray, metadata: Optional[Dict] = None) -> dict:
     Predict the privacy case label given an embedding.
     Returns structured output with metadata and confidence.
     """
-    global _classifier, _metadata, _model_version, _embedding_model  # noqa: F824,E501
-    
     # Load model if not already loaded
-    if _classifier is None:
-        _load_model_artifacts()
+    model = ensure_model_loaded()
     
     # Ensure input is 2D
     embedding = np.array(embedding).reshape(1, -1)
 
-    predicted_label = str(_classifier.predict(embedding)[0])
-    confidence = _classifier.predict_proba(embedding).max()
-
-    # Get additional info from metadata
-    classifier_type = _metadata.get("classifier", "LogisticRegression") if _metadata else "LogisticRegression"
-    trained_on = _metadata.get("trained_on", "") if _metadata else ""
+    labels, confidence = _score(model, embedding)
     
     return {
-        "predicted_label": predicted_label,
-        "confidence": float(confidence),
-        "model_version": _model_version,
-        "embedding_model": _embedding_model,
+        "predicted_label": str(labels[0]),
+        "confidence": float(confidence[0]),
+        "model_version": model.version,
+        "embedding_model": model.embedding_model,
         "inference_timestamp": pd.Timestamp.utcnow(),
-        "prediction_notes": f"{classifier_type} model",
+        "prediction_notes": f"{model.classifier_type} model",
         "subtype_label": pd.NA,  # Not used in MVP - use pandas NA for nullable string
-        "trained_on": trained_on
+        "trained_on": model.trained_on
+    }
+
+
+def predict_many(matrix: np.ndarray, case_ids: Sequence, model: Optional[ModelHandle] = None) -> pd.DataFrame:
+    """
+    Predict privacy case labels for a 2D matrix of embeddings (one row per case).
+    Scores the whole matrix in one pass and returns columnar output with the
+    same fields as predict(), one row per case_id.
+
+    Args:
+        matrix: 2D embedding matrix
+        case_ids: One case id per matrix row
+        model: Model to score with; defaults to the active model. Callers
+            scoring a batch in several calls pass the handle they took once,
+            so a concurrent swap cannot split the batch across versions.
+    """
+    model = model or ensure_model_loaded()
+    matrix = _check_batch(matrix, case_ids)
+    return _predictions_frame(model, case_ids, model.scorer.predict_proba(matrix))
+
+
+def predict_many_shadow(
+    matrix: np.ndarray,
+    case_ids: Sequence,
+    challengers: Sequence[ModelHandle],
+    model: Optional[ModelHandle] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Score a batch with the active model (or `model`, see predict_many) and one
+    or more challenger versions in a single stacked pass. If the stacked pass fails, the champion is scored
+    on its own and each challenger separately, so a failing challenger only
+    loses its shadow rows, never the champion's predictions.
+
+    Returns:
+        (champion predictions as from predict_many,
+         challenger predictions: one row per case and challenger, alongside
+         the champion's label and confidence for the same case)
+    """
+    model = model or ensure_model_loaded()
+    matrix = _check_batch(matrix, case_ids)
+
+    try:
+        probabilities = _stacked_probabilities([model, *challengers], matrix)
+    except Exception as e:
+        logger.warning(f"Stacked champion/challenger scoring failed, scoring models separately: {e}")
+        probabilities = [model.scorer.predict_proba(matrix)]
+        for challenger in challengers:
+            try:
+                probabilities.append(challenger.scorer.predict_proba(matrix))
+            except Exception as e:
+                logger.error(f"Challenger {challenger.version} failed to score: {e}")
+                probabilities.append(None)
+    champion = _predictions_frame(model, case_ids, probabilities[0])
+
+    shadow = []
+    for challenger, proba in zip(challengers, probabilities[1:]):
+        if proba is None:
+            continue
+        labels, confidence = _labels_and_confidence(challenger, proba)
+        shadow.append(pd.DataFrame({
+            "case_id": champion["case_id"],
+            "model_version": challenger.version,
+            "predicted_label": labels,
+            "confidence": confidence,
+            "champion_version": model.version,
+            "champion_label": champion["predicted_label"],
+            "champion_confidence": champion["confidence"]
+        }))
+    if not shadow:
+        return champion, pd.DataFrame(columns=[
+            "case_id", "model_version", "predicted_label", "confidence",
+            "champion_version", "champion_label", "champion_confidence"
+        ])
+    return champion, pd.concat(shadow, ignore_index=True)
+
+
+def _compatible_challenger(champion: ModelHandle, challenger: ModelHandle) -> Optional[ModelHandle]:
+    """
+    The challenger as it can be scored next to the champion: same features
+    and classes, kernel in the champion's kernel dtype (cast if needed).
+    Returns None if the challenger cannot be compared with the champion.
+    """
+    if champion.n_features is not None and challenger.n_features != champion.n_features:
+        logger.error(
+            f"Challenger {challenger.version} expects {challenger.n_features} features, "
+            f"the champion {champion.n_features}; skipping it"
+        )
+        return None
+    if list(challenger.scorer.classes_) != list(champion.scorer.classes_):
+        logger.error(
+            f"Challenger {challenger.version} predicts classes {list(challenger.scorer.classes_)}, "
+            f"the champion {list(champion.scorer.classes_)}; skipping it"
+        )
+        return None
+    if (
+        champion.kernel is not None and challenger.kernel is not None
+        and challenger.kernel.dtype != champion.kernel.dtype
+    ):
+        logger.info(f"Casting challenger {challenger.version} kernel to {champion.kernel.dtype}")
+        return ModelHandle(
+            challenger.version, challenger.embedding_model, challenger.classifier,
+            challenger.kernel.astype(champion.kernel.dtype), challenger.metadata
+        )
+    return challenger
+
+
+def load_challengers(challenger_configs: Sequence[dict]) -> List[ModelHandle]:
+    """
+    Load challenger model versions into the registry without activating them.
+    Each entry is a `models`-style config section (classifier_path,
+    model_version or metadata_path, ...); challengers never read the
+    champion's default metadata file. Challengers default to the NumPy kernel
+    at the champion's precision so they can be stacked with the champion.
+    Versions that fail to load, have no version, share the champion's version,
+    or whose features or classes differ from the champion's, are skipped.
+    """
+    base = _registry.models_config()
+    champion = ensure_model_loaded()
+    handles = []
+    for challenger in challenger_configs:
+        if not challenger.get("model_version") and not challenger.get("metadata_path"):
+            logger.error(f"Challenger {challenger.get('classifier_path')} has no model_version or metadata_path; skipping it")
+            continue
+        models_config = {
+            "scoring_engine": "numpy",
+            "embedding_model": base.get("embedding_model", "unknown"),
+            "precision": base.get("precision", "float32"),
+            "metadata_path": None,
+            **challenger
+        }
+        try:
+            handle = _registry.load(models_config, reject_active=True)
+        except Exception as e:
+            logger.error(f"Failed to load challenger model {challenger.get('classifier_path')}: {e}")
+            continue
+        handle = _compatible_challenger(champion, handle)
+        if handle is None:
+            continue
+        handles.append(handle)
+        logger.info(f"Loaded challenger model version {handle.version}")
+    return handles
+
+
+def precision_parity_report(
+    matrix: np.ndarray,
+    precisions: Sequence[str] = ("float32", "float16", "int8")
+) -> dict:
+    """
+    Compare active-model predictions for embeddings stored at reduced
+    precision with float64 predictions for the same embeddings.
+
+    Args:
+        matrix: 2D embedding matrix with the model's features
+        precisions: Storage precisions to compare (see embedding_precision)
+
+    Returns:
+        Per precision: bytes_per_case, label_agreement (share of cases with the
+        float64 label), max_abs_confidence_delta and mean_abs_confidence_delta
+    """
+    model = ensure_model_loaded()
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim != 2 or len(matrix) == 0:
+        raise ValueError(f"Expected a non-empty 2D embedding matrix, got shape {matrix.shape}")
+
+    # float64 reference: sklearn when the classifier is loaded, else the kernel in float64
+    reference_scorer = model.classifier if model.classifier is not None else model.kernel.astype(np.float64)
+    reference_labels, reference_confidence = _labels_and_confidence(model, reference_scorer.predict_proba(matrix))
+
+    report = {
+        "model_version": model.version,
+        "cases": int(len(matrix)),
+        "reference": f"float64 {type(reference_scorer).__name__}",
+        "precisions": {}
     }
+    for precision in precisions:
+        stored = to_precision(matrix, precision)
+        labels, confidence = _score(model, np.asarray(stored))
+        delta = np.abs(confidence - reference_confidence)
+        report["precisions"][precision] = {
+            "bytes_per_case": round(stored.nbytes / len(matrix), 1),
+            "label_agreement": round(float((labels == reference_labels).mean()), 6),
+            "max_abs_confidence_delta": round(float(delta.max()), 6),
+            "mean_abs_confidence_delta": round(float(delta.mean()), 6)
+        }
+    return report
 
 
-def reload_model():
-    """Force reload of the model artifacts."""
-    global _classifier, _metadata, _model_version, _embedding_model  # noqa: F824,E501
-    _classifier = None
-    _metadata = None
-    _model_version = None
-    _embedding_model = None
-    logger.info("Model cache cleared, will reload on next prediction")
+def reload_model(background: bool = False) -> Optional[Future]:
+    """
+    Re-read config and reload the model artifacts, then swap the new version in
+    atomically. Predictions keep using the current model until the swap, and
+    batches already scoring finish on it.
+
+    Args:
+        background: Load on a background thread and return its Future instead
+            of blocking until the new model is active
+    """
+    _registry.refresh_config()
+    if background:
+        logger.info("Reloading model in the background")
+        return _registry.load_async(activate=True)
+
+    handle = _registry.load()
+    _registry.activate(handle.version)
+    logger.info(f"Model reloaded, active version: {handle.version}")
+    return None
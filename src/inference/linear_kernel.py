@@ -0,0 +1,234 @@
+# src/inference/linear_kernel.py
+
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+import sklearn
+from typing import List, Optional, Sequence, Tuple
+
+# Memory-mappable artifact layout: raw float arrays plus JSON metadata
+KERNEL_METADATA_FILE = "kernel.json"
+KERNEL_WEIGHTS_FILE = "weights.npy"
+KERNEL_INTERCEPT_FILE = "intercept.npy"
+KERNEL_FORMAT_VERSION = 1
+
+
+def _sklearn_version() -> Tuple[int, int]:
+    """Return the installed sklearn (major, minor) version."""
+    major, minor = sklearn.__version__.split(".")[:2]
+    return int(major), int(minor)
+
+
+def _file_fingerprint(path: str) -> dict:
+    """Size and modification time of a file, used to detect stale exports."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class LinearKernel:
+    """
+    NumPy scoring kernel for a fitted LogisticRegression.
+    Reproduces predict_proba with one float32 matmul plus sigmoid/softmax,
+    skipping sklearn's per-call input validation and dispatch.
+    """
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        intercept: np.ndarray,
+        classes: np.ndarray,
+        multinomial: bool = False,
+        dtype: type = np.float32,
+        source: Optional[dict] = None
+    ):
+        self.dtype = np.dtype(dtype)
+        # (d, k) layout so scoring is a single (n, d) @ (d, k) product.
+        # Memory-mapped float32 arrays pass through without a copy.
+        self.weights = np.ascontiguousarray(np.asarray(weights, dtype=self.dtype))
+        self.intercept = np.asarray(intercept, dtype=self.dtype)
+        self.classes_ = np.asarray(classes)
+        self.multinomial = multinomial
+        self.n_features = self.weights.shape[0]
+        self.source = source or {}
+
+    @classmethod
+    def from_estimator(cls, classifier, dtype: type = np.float32) -> Optional["LinearKernel"]:
+        """
+        Build a kernel from a fitted classifier.
+        Returns None for anything that is not a LogisticRegression, or if the
+        kernel does not reproduce sklearn's probabilities, so callers can fall
+        back to sklearn.
+        """
+        if not isinstance(classifier, LogisticRegression):
+            return None
+        if not all(hasattr(classifier, attr) for attr in ("coef_", "intercept_", "classes_")):
+            return None
+
+        # Mirror LogisticRegression.predict_proba: liblinear and binary
+        # problems are one-vs-rest, everything else is softmax. Models pickled
+        # by newer sklearn carry multi_class="deprecated", which older
+        # releases treat as multinomial.
+        multi_class = getattr(classifier, "multi_class", "auto")
+        auto_values = {"auto", "deprecated"} if _sklearn_version() >= (1, 5) else {"auto"}
+        ovr = multi_class in ("ovr", "warn") or (
+            multi_class in auto_values
+            and (len(classifier.classes_) <= 2 or classifier.solver == "liblinear")
+        )
+
+        kernel = cls(
+            np.asarray(classifier.coef_).T,
+            classifier.intercept_,
+            classifier.classes_,
+            multinomial=not ovr,
+            dtype=dtype
+        )
+
+        # Parity guard: never swap in a kernel that disagrees with sklearn
+        probe = np.random.default_rng(0).normal(size=(16, kernel.n_features))
+        if not np.allclose(
+            kernel.predict_proba(probe), classifier.predict_proba(probe),
+            rtol=1e-3, atol=1e-4
+        ):
+            return None
+        return kernel
+
+    def save(self, directory: str, source_path: Optional[str] = None) -> None:
+        """
+        Write the kernel as raw .npy arrays plus JSON metadata.
+        The directory is replaced atomically so concurrent readers never see
+        a partial artifact. source_path records the file it was exported from
+        so loaders can detect a stale export.
+        """
+        metadata = {
+            "format_version": KERNEL_FORMAT_VERSION,
+            "dtype": self.dtype.name,
+            "n_features": int(self.n_features),
+            "classes": self.classes_.tolist(),
+            "multinomial": bool(self.multinomial),
+            "source": _file_fingerprint(source_path) if source_path else {}
+        }
+
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, prefix=".kernel-")
+        try:
+            np.save(os.path.join(staging, KERNEL_WEIGHTS_FILE), self.weights)
+            np.save(os.path.join(staging, KERNEL_INTERCEPT_FILE), self.intercept)
+            with open(os.path.join(staging, KERNEL_METADATA_FILE), "w") as f:
+                json.dump(metadata, f, indent=2)
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+            os.rename(staging, directory)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "LinearKernel":
+        """
+        Load a kernel written by save(). With mmap_mode the weight arrays are
+        mapped rather than read, so load time does not grow with model size
+        and every process on a node shares one physical copy.
+        """
+        with open(os.path.join(directory, KERNEL_METADATA_FILE), "r") as f:
+            metadata = json.load(f)
+        if metadata.get("format_version") != KERNEL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported kernel format version: {metadata.get('format_version')}")
+
+        weights = np.load(os.path.join(directory, KERNEL_WEIGHTS_FILE), mmap_mode=mmap_mode)
+        intercept = np.load(os.path.join(directory, KERNEL_INTERCEPT_FILE), mmap_mode=mmap_mode)
+        if weights.shape != (metadata["n_features"], len(intercept)):
+            raise ValueError(f"Kernel weights have unexpected shape {weights.shape}")
+
+        return cls(
+            weights,
+            intercept,
+            metadata["classes"],
+            multinomial=metadata["multinomial"],
+            dtype=np.dtype(metadata["dtype"]),
+            source=metadata.get("source")
+        )
+
+    def astype(self, dtype: type) -> "LinearKernel":
+        """The same kernel computing in another float precision."""
+        return LinearKernel(
+            self.weights, self.intercept, self.classes_,
+            multinomial=self.multinomial, dtype=dtype, source=self.source
+        )
+
+    def is_exported_from(self, source_path: str) -> bool:
+        """Check the kernel was exported from the current version of source_path."""
+        return bool(self.source) and self.source == _file_fingerprint(source_path)
+
+    def decision_function(self, matrix: np.ndarray) -> np.ndarray:
+        """Return the raw (n, k) linear scores for a 2D embedding matrix."""
+        matrix = np.asarray(matrix, dtype=self.dtype)
+        if matrix.ndim != 2 or matrix.shape[1] != self.n_features:
+            raise ValueError(
+                f"Expected embeddings with {self.n_features} features, got shape {matrix.shape}"
+            )
+        return matrix @ self.weights + self.intercept
+
+    def predict_proba(self, matrix: np.ndarray) -> np.ndarray:
+        """Return class probabilities in the same layout as sklearn."""
+        return self.proba_from_scores(self.decision_function(matrix))
+
+    def proba_from_scores(self, scores: np.ndarray) -> np.ndarray:
+        """Turn (n, k) linear scores into probabilities. Overwrites scores."""
+        if scores.shape[1] == 1:
+            # Binary: a single column of logits for the positive class.
+            # Softmax over [-z, z] is a sigmoid of 2z.
+            logits = scores[:, 0] * 2.0 if self.multinomial else scores[:, 0]
+            positive = 1.0 / (1.0 + np.exp(-logits))
+            return np.column_stack([1.0 - positive, positive])
+
+        if self.multinomial:
+            scores -= scores.max(axis=1, keepdims=True)
+            np.exp(scores, out=scores)
+        else:
+            # One-vs-rest: independent sigmoids, renormalised per row
+            np.negative(scores, out=scores)
+            np.exp(scores, out=scores)
+            scores += 1.0
+            np.reciprocal(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+
+def stacked_predict_proba(kernels: Sequence[LinearKernel], matrix: np.ndarray) -> List[np.ndarray]:
+    """
+    Score several kernels against the same matrix with one matmul over their
+    concatenated weights, then split the scores back per kernel.
+    Returns one probability array per kernel, in order.
+    """
+    if len(kernels) == 1:
+        return [kernels[0].predict_proba(matrix)]
+
+    first = kernels[0]
+    for kernel in kernels[1:]:
+        if kernel.n_features != first.n_features or kernel.dtype != first.dtype:
+            raise ValueError(
+                f"Cannot stack kernels with {kernel.n_features} {kernel.dtype} features "
+                f"and {first.n_features} {first.dtype} features"
+            )
+
+    matrix = np.asarray(matrix, dtype=first.dtype)
+    if matrix.ndim != 2 or matrix.shape[1] != first.n_features:
+        raise ValueError(
+            f"Expected embeddings with {first.n_features} features, got shape {matrix.shape}"
+        )
+
+    weights = np.concatenate([kernel.weights for kernel in kernels], axis=1)
+    intercept = np.concatenate([kernel.intercept for kernel in kernels])
+    scores = matrix @ weights + intercept
+
+    probabilities = []
+    offset = 0
+    for kernel in kernels:
+        width = kernel.weights.shape[1]
+        probabilities.append(kernel.proba_from_scores(scores[:, offset:offset + width]))
+        offset += width
+    return probabilities
@@ -0,0 +1,271 @@
+# src/inference/model_registry.py
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+import joblib
+import numpy as np
+from config.config import load_config
+from utils.logger import get_logger
+from .linear_kernel import LinearKernel, KERNEL_METADATA_FILE
+
+logger = get_logger()
+
+DEFAULT_KERNEL_PATH = "src/models/model_kernel"
+DEFAULT_METADATA_PATH = "src/models/metadata.json"
+
+
+class ModelHandle:
+    """
+    One loaded model version: classifier and/or kernel plus its metadata.
+    Handles are never mutated after loading. Callers take the active handle
+    once per batch, so a swap never changes the model under a running batch.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        embedding_model: str,
+        classifier=None,
+        kernel: Optional[LinearKernel] = None,
+        metadata: Optional[dict] = None
+    ):
+        self.version = version
+        self.embedding_model = embedding_model
+        self.classifier = classifier
+        self.kernel = kernel
+        self.metadata = metadata or {}
+
+    @property
+    def scorer(self):
+        """The object that provides predict_proba and classes_."""
+        return self.kernel if self.kernel is not None else self.classifier
+
+    @property
+    def classifier_type(self) -> str:
+        return self.metadata.get("classifier", "LogisticRegression")
+
+    @property
+    def trained_on(self) -> str:
+        return self.metadata.get("trained_on", "")
+
+    @property
+    def n_features(self) -> Optional[int]:
+        """Number of input features the model expects, if known."""
+        if self.kernel is not None:
+            return self.kernel.n_features
+        n_features = getattr(self.classifier, "n_features_in_", None)
+        return int(n_features) if n_features is not None else None
+
+
+def _load_mmap_kernel(kernel_path: str, classifier_path: str) -> Optional[LinearKernel]:
+    """Map the exported kernel, or return None if it is missing or stale."""
+    if not os.path.exists(os.path.join(kernel_path, KERNEL_METADATA_FILE)):
+        logger.warning(f"No memory-mapped kernel found at {kernel_path}, loading {classifier_path}")
+        return None
+
+    try:
+        kernel = LinearKernel.load(kernel_path, mmap_mode="r")
+    except Exception as e:
+        logger.warning(f"Failed to load memory-mapped kernel from {kernel_path}: {e}")
+        return None
+
+    if os.path.exists(classifier_path) and not kernel.is_exported_from(classifier_path):
+        logger.warning(f"Memory-mapped kernel at {kernel_path} is stale, reloading {classifier_path}")
+        return None
+
+    logger.info(f"Loaded memory-mapped kernel from {kernel_path}")
+    return kernel
+
+
+def _export_mmap_kernel(kernel: LinearKernel, kernel_path: str, classifier_path: str):
+    """Export the kernel so later loads can skip unpickling."""
+    try:
+        kernel.save(kernel_path, source_path=classifier_path)
+        logger.info(f"Exported memory-mapped kernel to {kernel_path}")
+    except Exception as e:
+        logger.warning(f"Failed to export memory-mapped kernel to {kernel_path}: {e}")
+
+
+def load_model_handle(models_config: dict) -> ModelHandle:
+    """
+    Load one model version described by a `models` config section.
+    A model_version set in the section wins over the metadata file's; with
+    metadata_path set to None, no metadata file is read.
+    Raises FileNotFoundError if neither a usable kernel nor the classifier exist.
+    """
+    classifier_path = models_config["classifier_path"]
+    artifact_format = models_config.get("artifact_format", "joblib")
+    kernel_path = models_config.get("kernel_path", DEFAULT_KERNEL_PATH)
+    metadata_path = models_config.get("metadata_path", DEFAULT_METADATA_PATH)
+
+    classifier = None
+    kernel = None
+
+    # Memory-mapped kernel: no unpickling, weights shared across processes
+    if artifact_format == "mmap":
+        kernel = _load_mmap_kernel(kernel_path, classifier_path)
+
+    if kernel is None:
+        # Check if model file exists
+        if not os.path.exists(classifier_path):
+            raise FileNotFoundError(f"Model file not found: {classifier_path}")
+
+        # Load the classifier
+        try:
+            classifier = joblib.load(classifier_path)
+            logger.info(f"Loaded classifier from {classifier_path}")
+        except Exception as e:
+            logger.error(f"Failed to load classifier from {classifier_path}: {e}")
+            raise
+
+        # Optionally score with the NumPy kernel instead of sklearn
+        scoring_engine = models_config.get("scoring_engine", "sklearn")
+        if scoring_engine == "numpy" or artifact_format == "mmap":
+            # float64 embeddings get a float64 kernel; reduced precisions compute in float32
+            dtype = np.float64 if models_config.get("precision") == "float64" else np.float32
+            kernel = LinearKernel.from_estimator(classifier, dtype=dtype)
+            if kernel is None:
+                logger.warning(
+                    f"NumPy scoring engine does not support {type(classifier).__name__}, "
+                    "falling back to sklearn"
+                )
+            else:
+                logger.info("Using NumPy scoring engine")
+                if artifact_format == "mmap":
+                    _export_mmap_kernel(kernel, kernel_path, classifier_path)
+
+    # Load metadata if available
+    metadata = {}
+    if metadata_path is not None and os.path.exists(metadata_path):
+        try:
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+            logger.info("Loaded model metadata")
+        except Exception as e:
+            logger.warning(f"Failed to load metadata: {e}")
+    elif metadata_path is not None:
+        logger.warning("No metadata file found")
+
+    # Model version from config if set, else from metadata; embedding model from metadata, else config
+    version = models_config.get("model_version") or metadata.get("model_version", "unknown")
+    embedding_model = metadata.get("embedding_model", models_config.get("embedding_model", "unknown"))
+
+    return ModelHandle(version, embedding_model, classifier=classifier, kernel=kernel, metadata=metadata)
+
+
+class ModelRegistry:
+    """
+    Thread-safe cache of loaded model versions with one active version.
+
+    Loads are serialized, so concurrent callers never trigger duplicate loads,
+    and can run on a background thread. Activation swaps a single reference,
+    so readers see either the old or the new model and never a mix.
+    """
+
+    def __init__(self, max_versions: int = 3):
+        self.max_versions = max_versions
+        self._models: "OrderedDict[str, ModelHandle]" = OrderedDict()
+        self._active: Optional[ModelHandle] = None
+        self._models_config: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def models_config(self) -> dict:
+        """The `models` config section, read once and cached."""
+        if self._models_config is None:
+            self._models_config = load_config()["models"]
+        return self._models_config
+
+    def refresh_config(self) -> None:
+        """Drop the cached config so the next load re-reads it (e.g. after ingestion)."""
+        self._models_config = None
+
+    @property
+    def active_version(self) -> Optional[str]:
+        active = self._active
+        return active.version if active is not None else None
+
+    def active(self) -> Optional[ModelHandle]:
+        """The active model, or None if nothing is loaded yet."""
+        return self._active
+
+    def get(self, version: str) -> Optional[ModelHandle]:
+        with self._lock:
+            return self._models.get(version)
+
+    def versions(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def ensure_active(self) -> ModelHandle:
+        """Return the active model, loading and activating the configured one if needed."""
+        active = self._active
+        if active is not None:
+            return active
+        with self._load_lock:
+            if self._active is None:
+                handle = self._load_locked(self.models_config())
+                self.activate(handle.version)
+            return self._active
+
+    def load(self, models_config: Optional[dict] = None, reject_active: bool = False) -> ModelHandle:
+        """
+        Load a model version and register it without activating it. With
+        reject_active, a model with the active version raises ValueError
+        instead of replacing the active version's registry entry.
+        """
+        with self._load_lock:
+            return self._load_locked(models_config or self.models_config(), reject_active)
+
+    def load_async(self, models_config: Optional[dict] = None, activate: bool = True) -> Future:
+        """Load a model version on a background thread, then optionally activate it."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+            executor = self._executor
+
+        def task() -> ModelHandle:
+            handle = self.load(models_config)
+            if activate:
+                self.activate(handle.version)
+            return handle
+
+        return executor.submit(task)
+
+    def activate(self, version: str) -> ModelHandle:
+        """Atomically make a registered version the active one."""
+        with self._lock:
+            if version not in self._models:
+                raise KeyError(f"Model version not loaded: {version}")
+            previous = self._active
+            self._active = self._models[version]
+            self._evict()
+        if previous is None or previous.version != version:
+            logger.info(f"Active model version: {version}")
+        return self._active
+
+    def _load_locked(self, models_config: dict, reject_active: bool = False) -> ModelHandle:
+        handle = load_model_handle(models_config)
+        with self._lock:
+            if reject_active and self._active is not None and handle.version == self._active.version:
+                raise ValueError(f"Model version {handle.version} is the active version")
+            # Reloading a version replaces it; in-flight batches keep the old handle
+            self._models[handle.version] = handle
+            self._models.move_to_end(handle.version)
+            self._evict(keep=handle.version)
+        return handle
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Drop the oldest inactive versions beyond max_versions. Caller holds _lock."""
+        for version in list(self._models):
+            if len(self._models) <= self.max_versions:
+                break
+            if version != keep and (self._active is None or version != self._active.version):
+                del self._models[version]
+                logger.info(f"Evicted model version {version} from registry")
@@ -1,50 +1,240 @@
 # src/inference/predict_intent.py
 
+import multiprocessing
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from utils.embedding_batch import EmbeddingBatch
 from utils.logger import get_logger
-from .classifier_interface import predict
+from .classifier_interface import ensure_model_loaded, predict_many, predict_many_shadow
+from .model_registry import ModelHandle
 
 logger = get_logger()
 
+OUTPUT_COLUMNS = [
+    "case_id", "predicted_label", "subtype_label", "confidence",
+    "model_version", "embedding_model", "inference_timestamp",
+    "prediction_notes", "timestamp"
+]
 
-def predict_batch(df: pd.DataFrame, chunk_size: int = 100) -> pd.DataFrame:
+SHADOW_COLUMNS = [
+    "case_id", "model_version", "predicted_label", "confidence",
+    "champion_version", "champion_label", "champion_confidence", "timestamp"
+]
+
+# Batch of a forked worker process, set by _init_worker from the Pool's
+# initargs. Forked children inherit it copy-on-write, so only shard bounds
+# and results cross the process boundary. It is never set in the parent, so
+# concurrent _run_batch calls (e.g. backfill partitions on several threads)
+# each score their own batch.
+_worker_batch = None
+
+# Called with (start, end, predictions) for every scored shard, in input order
+ChunkCallback = Callable[[int, int, pd.DataFrame], None]
+
+
+def _score_shard(
+    model: ModelHandle,
+    matrix,
+    case_ids: np.ndarray,
+    challengers: Sequence[ModelHandle],
+    bounds: Tuple[int, int]
+) -> Tuple[int, Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[str]]:
+    """Score one shard of a batch. Returns (start, predictions, shadow predictions, error)."""
+    start, end = bounds
+    try:
+        if challengers:
+            preds, shadow = predict_many_shadow(matrix[start:end], case_ids[start:end], challengers, model=model)
+            return start, preds, shadow, None
+        preds = predict_many(matrix[start:end], case_ids[start:end], model=model)
+        return start, preds, None, None
+    except Exception as e:
+        return start, None, None, f"{type(e).__name__}: {e}"
+
+
+def _init_worker(model: ModelHandle, matrix, case_ids: np.ndarray, challengers: Sequence[ModelHandle]) -> None:
+    global _worker_batch
+    _worker_batch = (model, matrix, case_ids, challengers)
+
+
+def _predict_shard(
+    bounds: Tuple[int, int]
+) -> Tuple[int, Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[str]]:
+    """Score one shard of the worker's batch (see _init_worker)."""
+    return _score_shard(*_worker_batch, bounds)
+
+
+def _shard_bounds(n_rows: int, shard_size: int) -> List[Tuple[int, int]]:
+    """Split n_rows into contiguous [start, end) shards."""
+    return [(start, min(start + shard_size, n_rows)) for start in range(0, n_rows, shard_size)]
+
+
+def _run_batch(
+    data: Union[pd.DataFrame, EmbeddingBatch],
+    chunk_size: int,
+    workers: int,
+    challengers: Optional[Sequence[ModelHandle]] = None,
+    on_chunk: Optional[ChunkCallback] = None,
+    model: Optional[ModelHandle] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Score data in shards, in-process or across forked workers. Returns
+    (predictions, shadow predictions). Each shard's predictions are passed to
+    on_chunk as soon as they are in, while later shards are still scoring.
+    The model is resolved once and every shard is scored with it, so a model
+    reload that lands mid-batch cannot split the batch across versions.
+    """
+    if len(data) == 0:
+        logger.info("Prediction complete: 0 successful, 0 failed.")
+        return pd.DataFrame(columns=OUTPUT_COLUMNS), pd.DataFrame(columns=SHADOW_COLUMNS)
+
+    if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+        logger.warning("Process forking is not available on this platform, predicting in a single process")
+        workers = 1
+
+    # Take the model once, before forking, so workers share the parent's copy
+    model = model or ensure_model_loaded()
+
+    if isinstance(data, EmbeddingBatch):
+        matrix = data.embeddings
+        case_ids = data.case_ids
+        timestamps = data.timestamps
+    else:
+        matrix = np.vstack(data["embedding_vector"].to_numpy())
+        case_ids = data["case_id"].to_numpy()
+        timestamps = data["timestamp"].to_numpy() if "timestamp" in data.columns else None
+    n_rows = len(case_ids)
+    challengers = list(challengers or [])
+
+    if workers > 1:
+        # Keep every worker busy even when the batch is smaller than workers * chunk_size
+        chunk_size = max(1, min(chunk_size, -(-n_rows // workers)))
+    shards = _shard_bounds(n_rows, chunk_size)
+
+    results = []
+    shadow_results = []
+    failed = 0
+
+    def collect(bounds: Tuple[int, int], outcome) -> None:
+        nonlocal failed
+        start, end = bounds
+        _, preds, shadow, error = outcome
+        if error is not None:
+            logger.error(
+                f"Prediction failed for chunk of {end - start} cases starting at row {start}: {error}"
+            )
+            failed += end - start
+            return
+        if timestamps is not None:
+            preds["timestamp"] = timestamps[start:end]
+        else:
+            preds["timestamp"] = pd.Timestamp.now()
+        results.append(preds[OUTPUT_COLUMNS])
+        if shadow is not None:
+            # Shadow rows are per challenger, each block in case order
+            shadow["timestamp"] = np.tile(preds["timestamp"].to_numpy(), len(shadow) // max(len(preds), 1))
+            shadow_results.append(shadow[SHADOW_COLUMNS])
+        if on_chunk is not None:
+            on_chunk(start, end, results[-1])
+
+    if workers > 1:
+        logger.info(f"Predicting {n_rows} cases in {len(shards)} shards across {workers} workers")
+        # With fork, the initargs are inherited by the workers, not pickled
+        with multiprocessing.get_context("fork").Pool(
+            processes=workers, initializer=_init_worker, initargs=(model, matrix, case_ids, challengers)
+        ) as pool:
+            # imap yields in submission order, so output order is deterministic
+            outcomes = tqdm(
+                pool.imap(_predict_shard, shards), total=len(shards),
+                desc="Predicting", unit="chunk"
+            )
+            for bounds, outcome in zip(shards, outcomes):
+                collect(bounds, outcome)
+    else:
+        for bounds in tqdm(shards, desc="Predicting", unit="chunk"):
+            collect(bounds, _score_shard(model, matrix, case_ids, challengers, bounds))
+
+    df_preds = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    df_shadow = (
+        pd.concat(shadow_results, ignore_index=True) if shadow_results
+        else pd.DataFrame(columns=SHADOW_COLUMNS)
+    )
+    logger.info(f"Prediction complete: {len(df_preds)} successful, {failed} failed.")
+    return df_preds, df_shadow
+
+
+def predict_batch(
+    data: Union[pd.DataFrame, EmbeddingBatch],
+    chunk_size: int = 100,
+    workers: int = 1,
+    on_chunk: Optional[ChunkCallback] = None,
+    model: Optional[ModelHandle] = None
+) -> pd.DataFrame:
     """
     Predict intent for a batch of cases using the loaded model.
-    
+    The embeddings are stacked into one 2D matrix and scored in chunks, either
+    in-process or across a pool of forked worker processes.
+
     Args:
-        df: DataFrame with embedding vectors
+        data: EmbeddingBatch, or DataFrame with embedding vectors
         chunk_size: Number of cases to process in each chunk
-        
+        workers: Number of worker processes (1 scores in the current process)
+        on_chunk: Called with (start, end, predictions) as each chunk is
+            scored, e.g. to write it out while scoring continues
+        model: Model to score every chunk with (defaults to the model active
+            when the batch starts)
+
     Returns:
-        DataFrame with predictions added
+        DataFrame with predictions added, in input order
     """
-    results = []
-    failed = 0
+    df_preds, _ = _run_batch(data, chunk_size, workers, on_chunk=on_chunk, model=model)
+    return df_preds
+
+
+def predict_batch_shadow(
+    data: Union[pd.DataFrame, EmbeddingBatch],
+    challengers: Sequence[ModelHandle],
+    chunk_size: int = 100,
+    workers: int = 1,
+    on_chunk: Optional[ChunkCallback] = None,
+    model: Optional[ModelHandle] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Predict intent with the active model and score the same cases with
+    challenger versions in the same pass. Challengers reuse the stacked
+    embedding matrix and, when they have NumPy kernels, the champion's matmul.
 
-    for start in tqdm(range(0, len(df), chunk_size), desc="Predicting", unit="chunk"):
-        chunk = df.iloc[start:start + chunk_size]
-        
-        for _, row in chunk.iterrows():
-            try:
-                prediction = predict(
-                    row["embedding_vector"], 
-                    metadata={"case_id": row["case_id"]}
-                )
-                results.append({
-                    "case_id": row["case_id"],
-                    "predicted_label": prediction["predicted_label"],
-                    "subtype_label": prediction["subtype_label"],
-                    "confidence": prediction["confidence"],
-                    "model_version": prediction["model_version"],
-                    "embedding_model": prediction["embedding_model"],
-                    "inference_timestamp": prediction["inference_timestamp"],
-                    "prediction_notes": prediction["prediction_notes"],
-                    "timestamp": row.get("timestamp", pd.Timestamp.now())
-                })
-            except Exception as e:
-                logger.error(f"Prediction failed for case_id {row['case_id']}: {e}")
-                failed += 1
-
-    logger.info(f"Prediction complete: {len(results)} successful, {failed} failed.")
-    return pd.DataFrame(results)
+    Args:
+        data: EmbeddingBatch, or DataFrame with embedding vectors
+        challengers: Loaded challenger models (see load_challengers)
+        chunk_size: Number of cases to process in each chunk
+        workers: Number of worker processes (1 scores in the current process)
+        on_chunk: Called with each chunk's champion predictions (see predict_batch)
+        model: Champion model (see predict_batch)
+
+    Returns:
+        (champion predictions as from predict_batch,
+         challenger predictions with the champion's label alongside)
+    """
+    return _run_batch(data, chunk_size, workers, challengers=challengers, on_chunk=on_chunk, model=model)
+
+
+def summarize_challengers(df_shadow: pd.DataFrame) -> Dict[str, dict]:
+    """
+    Compare each challenger with the champion over the cases both scored.
+
+    Returns:
+        Per challenger version: cases, label_agreement (share of cases with the
+        champion's label), mean_confidence_delta and mean_abs_confidence_delta
+    """
+    summary = {}
+    for version, group in df_shadow.groupby("model_version", sort=False):
+        delta = group["confidence"].astype(float) - group["champion_confidence"].astype(float)
+        summary[str(version)] = {
+            "cases": int(len(group)),
+            "label_agreement": round(float((group["predicted_label"] == group["champion_label"]).mean()), 4),
+            "mean_confidence_delta": round(float(delta.mean()), 4),
+            "mean_abs_confidence_delta": round(float(delta.abs().mean()), 4)
+        }
+    return summary
@@ -0,0 +1,260 @@
+# src/inference/scoring_service.py
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from utils.logger import get_logger
+from .classifier_interface import ensure_model_loaded, get_registry, predict_many, reload_model
+
+logger = get_logger()
+
+RESPONSE_FIELDS = [
+    "case_id", "predicted_label", "confidence", "model_version",
+    "embedding_model", "inference_timestamp", "prediction_notes"
+]
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class ServiceStats:
+    """Rolling request latency and batch-size statistics."""
+
+    def __init__(self, window: int = 10000):
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.batch_sizes: Deque[int] = deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+        self.batches = 0
+
+    def record_batch(self, latencies_ms: List[float], failures: int) -> None:
+        self.latencies_ms.extend(latencies_ms)
+        self.batch_sizes.append(len(latencies_ms))
+        self.requests += len(latencies_ms)
+        self.failures += failures
+        self.batches += 1
+
+    def snapshot(self) -> dict:
+        """Return counters plus p50/p95/p99 latency and batch-size percentiles."""
+        def percentiles(values) -> dict:
+            if not values:
+                return {"p50": None, "p95": None, "p99": None}
+            p50, p95, p99 = np.percentile(np.fromiter(values, dtype=float), [50, 95, 99])
+            return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)}
+
+        batch_sizes = percentiles(self.batch_sizes)
+        batch_sizes["mean"] = round(float(np.mean(self.batch_sizes)), 3) if self.batch_sizes else None
+        batch_sizes["max"] = max(self.batch_sizes) if self.batch_sizes else None
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "batches": self.batches,
+            "latency_ms": percentiles(self.latencies_ms),
+            "batch_size": batch_sizes
+        }
+
+
+def _score_batch(case_ids: List[str], embeddings: List[np.ndarray]) -> list:
+    """
+    Score queued embeddings with one predict_many call.
+    Returns one response dict or Exception per input, in order.
+    """
+    try:
+        preds = predict_many(np.vstack(embeddings), case_ids)
+    except Exception as e:
+        if len(case_ids) == 1:
+            return [e]
+        # Isolate malformed inputs so they do not fail the rest of the batch
+        return [_score_batch([case_id], [embedding])[0] for case_id, embedding in zip(case_ids, embeddings)]
+
+    preds = preds[RESPONSE_FIELDS]
+    preds["inference_timestamp"] = preds["inference_timestamp"].map(pd.Timestamp.isoformat)
+    return preds.to_dict(orient="records")
+
+
+class MicroBatcher:
+    """
+    Queues single-case requests and scores them together.
+    A batch is flushed once max_batch_size requests are queued or max_wait_ms
+    has passed since the first one arrived, whichever comes first.
+    """
+
+    def __init__(self, max_batch_size: int = 256, max_wait_ms: float = 10.0,
+                 stats: Optional[ServiceStats] = None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = stats or ServiceStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, case_id: str, embedding) -> dict:
+        """Queue one embedding and wait for its prediction."""
+        vector = np.asarray(embedding, dtype=float)
+        if vector.ndim != 1 or vector.size == 0:
+            raise ValueError(f"embedding_vector must be a flat list of floats, got shape {vector.shape}")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((case_id, vector, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[Tuple]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            case_ids = [item[0] for item in batch]
+            embeddings = [item[1] for item in batch]
+
+            # Score off the event loop so new requests keep queueing meanwhile
+            try:
+                outcomes = await loop.run_in_executor(None, _score_batch, case_ids, embeddings)
+            except Exception as e:
+                outcomes = [e] * len(batch)
+
+            finished = time.perf_counter()
+            latencies_ms = []
+            failures = 0
+            for (_, _, future, enqueued), outcome in zip(batch, outcomes):
+                latencies_ms.append((finished - enqueued) * 1000.0)
+                if isinstance(outcome, Exception):
+                    failures += 1
+                    if not future.done():
+                        future.set_exception(outcome)
+                elif not future.done():
+                    future.set_result(outcome)
+            self.stats.record_batch(latencies_ms, failures)
+
+
+class ScoringService:
+    """Minimal asyncio HTTP/1.1 front end for the micro-batcher."""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8080,
+                 max_batch_size: int = 256, max_wait_ms: float = 10.0):
+        self.host = host
+        self.port = port
+        self.batcher = MicroBatcher(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        # Load the model up front so the first request does not pay for it
+        ensure_model_loaded()
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(
+            f"Scoring service listening on {self.host}:{self.port} "
+            f"(max_batch_size={self.batcher.max_batch_size}, "
+            f"max_wait_ms={self.batcher.max_wait * 1000:g})"
+        )
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, object]:
+        if method == "GET" and path == "/healthz":
+            return 200, {"status": "ok", "model_version": get_registry().active_version}
+        if method == "GET" and path == "/stats":
+            stats = self.batcher.stats.snapshot()
+            stats["queue_depth"] = self.batcher.queue_depth
+            stats["model_version"] = get_registry().active_version
+            return 200, stats
+        if method == "POST" and path == "/reload":
+            # Load in the background; requests keep scoring on the current model until the swap
+            reload_model(background=True)
+            return 200, {"status": "reloading", "model_version": get_registry().active_version}
+        if method == "POST" and path == "/predict":
+            payload = json.loads(body or b"{}")
+            instances = payload["instances"] if "instances" in payload else [payload]
+            results = await asyncio.gather(*(
+                self.batcher.submit(str(instance["case_id"]), instance["embedding_vector"])
+                for instance in instances
+            ))
+            return 200, {"predictions": results} if "instances" in payload else results[0]
+        return 404, {"error": f"No route for {method} {path}"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Keep-alive: serve requests on this connection until the client closes it
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                try:
+                    status, payload = await self._route(method, path, body)
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = 400, {"error": str(e)}
+                except Exception as e:
+                    logger.error(f"Scoring request failed: {e}")
+                    status, payload = 500, {"error": str(e)}
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
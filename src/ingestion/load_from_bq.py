@@ -1,51 +1,474 @@
 # src/ingestion/load_from_bq.py
 
+import contextvars
+import math
+import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from google.cloud import bigquery
+from typing import Iterator, Optional, Tuple, Union
+from utils.embedding_batch import EmbeddingBatch
+from utils.gcp_clients import bigquery_client, bigquery_read_client
+from ingestion.partition_cache import PartitionCache, cache_key, table_versions
+from monitoring.query_costs import run_query
 from utils.logger import get_bq_logger
+from utils.schema_validator import validate_arrow_schema, validate_schema
 from config.config import load_config
 
 logger = get_bq_logger()
 config = load_config()
 
+# Row cap of the REST (to_dataframe) path; the Storage Read API path is capped by bq.storage_read_max_rows
+REST_ROW_LIMIT = 6000
 
-def load_partitioned_data(partition_date: str) -> pd.DataFrame:
-    """
-    Load the partitioned case snapshot and join with precomputed embeddings for the same day.
-    Validates the resulting schema.
-    """
-    try:
-        case_table = config["bq"]["source_table"]
-        embedding_table = config["bq"]["embedding_table"]
+# Packs an ARRAY<FLOAT64> embedding as little-endian float32 BYTES (returned base64-encoded from JS)
+PACK_FLOAT32_UDF = r"""
+            CREATE TEMP FUNCTION pack_float32(v ARRAY<FLOAT64>)
+            RETURNS BYTES
+            LANGUAGE js AS r'''
+              if (v === null) return null;
+              const view = new DataView(new ArrayBuffer(v.length * 4));
+              v.forEach((x, i) => view.setFloat32(i * 4, x, true));
+              const bytes = new Uint8Array(view.buffer);
+              const chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+              let out = "";
+              for (let i = 0; i < bytes.length; i += 3) {
+                const n = (bytes[i] << 16) | ((bytes[i + 1] || 0) << 8) | (bytes[i + 2] || 0);
+                out += chars[n >> 18] + chars[(n >> 12) & 63]
+                  + (i + 1 < bytes.length ? chars[(n >> 6) & 63] : "=")
+                  + (i + 2 < bytes.length ? chars[n & 63] : "=");
+              }
+              return out;
+            ''';
+"""
 
-        # Validate configuration
-        if not case_table or case_table == "your-project.your-dataset.source_table":
-            raise ValueError("BigQuery source_table is not properly configured. Please update config.yaml with your actual table name.")
-        
-        if not embedding_table or embedding_table == "your-project.your-dataset.embedding_table":
-            raise ValueError("BigQuery embedding_table is not properly configured. Please update config.yaml with your actual table name.")
 
-        query = f"""
+def _source_tables():
+    """Configured case and embedding tables, checked for placeholder values."""
+    case_table = config["bq"]["source_table"]
+    embedding_table = config["bq"]["embedding_table"]
+
+    if not case_table or case_table == "your-project.your-dataset.source_table":
+        raise ValueError("BigQuery source_table is not properly configured. Please update config.yaml with your actual table name.")
+
+    if not embedding_table or embedding_table == "your-project.your-dataset.embedding_table":
+        raise ValueError("BigQuery embedding_table is not properly configured. Please update config.yaml with your actual table name.")
+    return case_table, embedding_table
+
+
+def _timestamp_literal(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f+00")
+
+
+def _window_clause(window: Tuple[datetime, datetime]) -> Tuple[str, str]:
+    """First day and WHERE clause of a (start, end] request_time window."""
+    start, end = window
+    day = start.astimezone(timezone.utc).strftime("%Y-%m-%d")
+    return day, (
+        f'DATE(c.core.request_time) BETWEEN "{day}" AND "{end.astimezone(timezone.utc):%Y-%m-%d}"\n'
+        f'            AND c.core.request_time > TIMESTAMP("{_timestamp_literal(start)}")\n'
+        f'            AND c.core.request_time <= TIMESTAMP("{_timestamp_literal(end)}")'
+    )
+
+
+def partition_query(
+    case_table: str,
+    embedding_table: str,
+    partition_date: str,
+    limit: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    exclude_scored: Optional[Tuple[str, str]] = None,
+    packed: bool = False,
+    window: Optional[Tuple[datetime, datetime]] = None
+) -> str:
+    """
+    Join of one day's case snapshot with its precomputed embeddings.
+    With shard=(index, count), only the cases whose case_number hashes
+    (FARM_FINGERPRINT) to that shard; the shards of a day are disjoint.
+    With exclude_scored=(output_table, model_version), only the cases that
+    have no output row for that model version yet (anti-join in the query).
+    With packed, each embedding is returned as one BYTES value of
+    little-endian float32s (half the transfer of FLOAT64 lists, decoded with
+    np.frombuffer) instead of a repeated FLOAT64 column.
+    With window=(start, end), the cases whose request_time is in (start, end]
+    instead of the whole day (micro-batches; the day filter still prunes partitions).
+    """
+    day = f"{partition_date[:4]}-{partition_date[4:6]}-{partition_date[6:]}"
+    time_clause = f'DATE(c.core.request_time) = "{day}"'
+    if window is not None:
+        day, time_clause = _window_clause(window)
+    shard_clause = ""
+    if shard is not None:
+        index, count = shard
+        shard_clause = f"AND ABS(MOD(FARM_FINGERPRINT(CAST(c.core.case_number AS STRING)), {count})) = {index}"
+    scored_clause = ""
+    if exclude_scored is not None:
+        output_table, model_version = exclude_scored
+        # Cases are scored on or after their day; the date filter also prunes output partitions
+        scored_clause = f"""AND NOT EXISTS (
+                SELECT 1 FROM `{output_table}` AS o
+                WHERE DATE(o.ingestion_time) >= "{day}"
+                AND o.model_version = "{model_version}"
+                AND o.case_id = CAST(c.core.case_number AS STRING)
+            )"""
+    limit_clause = f"LIMIT {limit}" if limit else ""
+    # NULL embeddings stay NULL and are dropped as not_array by validation, as on the unpacked path
+    embedding = (
+        "IF(e.embeddings_allminilm IS NULL, NULL, pack_float32(e.embeddings_allminilm))"
+        if packed else "e.embeddings_allminilm"
+    )
+    return (PACK_FLOAT32_UDF if packed else "") + f"""
             SELECT
                 c.core.case_number AS case_id,
-                e.embeddings_allminilm AS embedding_vector,  # Combined MiniLM + TF-IDF embeddings (584 dimensions)
+                {embedding} AS embedding_vector,  # Combined MiniLM + TF-IDF embeddings (584 dimensions)
                 c.core.request_time AS timestamp
             FROM `{case_table}` AS c
             JOIN `{embedding_table}` AS e
             ON c.core.case_number = e.case_number
-            WHERE DATE(c.core.request_time) = "{partition_date[:4]}-{partition_date[4:6]}-{partition_date[6:]}"
-            LIMIT 6000
+            WHERE {time_clause}
+            {shard_clause}
+            {scored_clause}
+            {limit_clause}
         """  # 5/20 added a limit to test pipeline 5/21: added where clause to ingestion query
 
+
+def count_late_arrivals(window: Tuple[datetime, datetime], client: Optional[bigquery.Client] = None) -> int:
+    """
+    Cases with request_time in a window the micro-batch watermark has already
+    passed that have no output row under any model version. Their case or
+    embedding row landed more than microbatch.lateness_minutes after their
+    request_time, after the micro-batch covering it had run, so only a full
+    or incremental daily run scores them.
+
+    Args:
+        window: (start, end] request_time range to check
+        client: BigQuery client to run the query with
+
+    Returns:
+        int: Number of unscored cases in the window
+    """
+    case_table, embedding_table = _source_tables()
+    day, time_clause = _window_clause(window)
+    query = f"""
+            SELECT COUNT(*) AS late_rows
+            FROM `{case_table}` AS c
+            JOIN `{embedding_table}` AS e
+            ON c.core.case_number = e.case_number
+            WHERE {time_clause}
+            AND NOT EXISTS (
+                SELECT 1 FROM `{config["bq"]["output_table"]}` AS o
+                WHERE DATE(o.ingestion_time) >= "{day}"
+                AND o.case_id = CAST(c.core.case_number AS STRING)
+            )
+        """
+    return next(run_query(client or bigquery_client(), query, "late_arrivals").result()).late_rows
+
+
+def _storage_read_client():
+    """Shared BigQuery Storage Read API client, or None (REST pages) if the library is not installed."""
+    try:
+        return bigquery_read_client()
+    except ImportError:
+        logger.warning("google-cloud-bigquery-storage is not installed, streaming result pages over REST")
+        return None
+
+
+def stream_partitioned_data(
+    partition_date: str,
+    expected_dim: Optional[int] = None,
+    dtype: type = np.float32,
+    client: Optional[bigquery.Client] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    exclude_scored: Optional[Tuple[str, str]] = None,
+    packed: bool = False,
+    window: Optional[Tuple[datetime, datetime]] = None,
+    limit: Optional[int] = None
+) -> Iterator[EmbeddingBatch]:
+    """
+    Run the partition query and yield the result as it arrives: one
+    EmbeddingBatch per Arrow record batch read through the BigQuery Storage
+    Read API. Each record batch is converted straight from its Arrow buffers,
+    without a DataFrame round trip.
+
+    Args:
+        partition_date: Partition to load (YYYYMMDD)
+        expected_dim: Embedding dimension (defaults to the most common one in the first record batch)
+        dtype: dtype of the embedding matrices
+        client: BigQuery client to run the query with
+        shard: (index, count) to read one hash shard of the partition (see partition_query)
+        exclude_scored: (output_table, model_version) to skip already-scored cases (see partition_query)
+        packed: Transfer embeddings as packed float32 BYTES (see partition_query)
+        window: (start, end] request_time range to read instead of the whole day (see partition_query)
+        limit: Maximum number of rows to read (None reads them all)
+    """
+    case_table, embedding_table = _source_tables()
+    client = client or bigquery_client()
+    query = partition_query(
+        case_table, embedding_table, partition_date, limit=limit, shard=shard, exclude_scored=exclude_scored,
+        packed=packed, window=window
+    )
+
+    shard_note = f" (shard {shard[0] + 1}/{shard[1]})" if shard else ""
+    logger.info(f"Streaming partition {partition_date}{shard_note} through the BigQuery Storage Read API...")
+    rows = run_query(client, query, "load_partition").result()
+    validated = False
+    for record_batch in rows.to_arrow_iterable(bqstorage_client=_storage_read_client()):
+        if not validated:
+            # Same input schema check as the DataFrame path, on the Arrow types (one schema per stream)
+            validate_arrow_schema(
+                record_batch.schema, schema_path="schemas/input_schema.json",
+                packed_columns=("embedding_vector",) if packed else ()
+            )
+            validated = True
+        batch = EmbeddingBatch.from_arrow(record_batch, expected_dim=expected_dim, dtype=dtype)
+        if expected_dim is None and batch.n_features:
+            expected_dim = batch.n_features
+        yield batch
+
+
+def _empty_batch(expected_dim: Optional[int], dtype: type) -> EmbeddingBatch:
+    return EmbeddingBatch(np.array([], dtype=str), np.empty((0, expected_dim or 0), dtype=dtype))
+
+
+def _read_shard(
+    partition_date: str,
+    shard: Optional[Tuple[int, int]],
+    expected_dim: Optional[int],
+    dtype: type,
+    client: bigquery.Client,
+    storage_read: bool,
+    exclude_scored: Optional[Tuple[str, str]] = None,
+    packed: bool = False,
+    window: Optional[Tuple[datetime, datetime]] = None,
+    max_rows: Optional[int] = None
+) -> EmbeddingBatch:
+    """
+    Read one shard (or the whole partition) into a batch sorted by case id.
+    On the Storage Read API path, a shard with more rows than its share of
+    max_rows raises RuntimeError: the LIMIT has no ORDER BY, so a truncated
+    read would be an arbitrary subset of the partition.
+    """
+    start = time.perf_counter()
+    max_rows = max_rows if storage_read else REST_ROW_LIMIT
+    limit = (math.ceil(max_rows / shard[1]) if shard else max_rows) if max_rows else None
+    if storage_read:
+        # The record batches are collected, then copied into one matrix: peak
+        # memory is about twice the shard's matrix while they are concatenated.
+        # One row past the cap tells a shard at the cap from a truncated one.
+        chunks = list(stream_partitioned_data(
+            partition_date, expected_dim, dtype, client=client, shard=shard,
+            exclude_scored=exclude_scored, packed=packed, window=window, limit=limit + 1 if limit else None
+        ))
+        batch = EmbeddingBatch.concat(chunks) if chunks else _empty_batch(expected_dim, dtype)
+        del chunks
+    else:
+        case_table, embedding_table = _source_tables()
+        query = partition_query(
+            case_table, embedding_table, partition_date, limit=limit, shard=shard,
+            exclude_scored=exclude_scored, packed=packed, window=window
+        )
+        df = run_query(client, query, "load_partition").to_dataframe()
+        validate_schema(df, schema_path="schemas/input_schema.json")
+        batch = EmbeddingBatch.from_frame(df, expected_dim=expected_dim, dtype=dtype)
+        del df
+
+    shard_note = f"shard {shard[0] + 1}/{shard[1]} of " if shard else ""
+    if storage_read and limit and batch.total_cases > limit:
+        raise RuntimeError(
+            f"{shard_note.capitalize()}partition {partition_date} has more than {limit} rows, its share of "
+            f"bq.storage_read_max_rows ({max_rows}); raise the cap to read the partition whole"
+        )
+    if not storage_read and limit and batch.total_cases >= limit:
+        logger.warning(f"Read {limit} rows, the REST row cap, from {shard_note}partition {partition_date}; it may be truncated")
+
+    # Result order within a query is not stable; case id order is
+    order = np.argsort(batch.case_ids, kind="stable")
+    if not (order == np.arange(len(order))).all():
+        batch = batch.take(order)
+    if shard is not None:
+        logger.info(
+            f"Shard {shard[0] + 1}/{shard[1]}: {batch.total_cases} rows in {time.perf_counter() - start:.2f}s"
+        )
+    return batch
+
+
+def read_partition_batch(
+    partition_date: str,
+    expected_dim: Optional[int] = None,
+    dtype: type = np.float32,
+    client: Optional[bigquery.Client] = None,
+    storage_read: bool = True,
+    n_shards: int = 1,
+    exclude_scored: Optional[Tuple[str, str]] = None,
+    packed: bool = False,
+    window: Optional[Tuple[datetime, datetime]] = None,
+    max_rows: Optional[int] = None
+) -> EmbeddingBatch:
+    """
+    Read a partition into one in-memory batch, as n_shards disjoint hash
+    shards fetched concurrently (one thread per shard). Shards are sorted by
+    case id and reassembled in shard order, so the result order is deterministic.
+    Every shard query scans the full partition and only filters its output,
+    so bytes billed grow about n_shards times.
+
+    Args:
+        partition_date: Partition to load (YYYYMMDD)
+        expected_dim: Embedding dimension (defaults to the most common one)
+        dtype: dtype of the embedding matrix
+        client: BigQuery client shared by the shard readers
+        storage_read: Stream through the Storage Read API instead of REST queries
+        n_shards: Number of shards read in parallel
+        exclude_scored: (output_table, model_version) to skip already-scored cases (see partition_query)
+        packed: Transfer embeddings as packed float32 BYTES (see partition_query)
+        window: (start, end] request_time range to read instead of the whole day (see partition_query)
+        max_rows: Row cap of the Storage Read API path, split over the shards
+            (the REST path is capped at REST_ROW_LIMIT)
+    """
+    client = client or bigquery_client()
+    shards = [(index, n_shards) for index in range(n_shards)] if n_shards > 1 else [None]
+
+    start = time.perf_counter()
+    # Each shard thread runs in a copy of this context, so its query costs count towards this run
+    contexts = [contextvars.copy_context() for _ in shards]
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        batches = list(pool.map(
+            lambda context, shard: context.run(
+                _read_shard,
+                partition_date, shard, expected_dim, dtype, client, storage_read, exclude_scored, packed, window,
+                max_rows
+            ),
+            contexts, shards
+        ))
+    batch = EmbeddingBatch.concat(batches)
+    del batches
+    logger.info(
+        f"Read {batch.total_cases} rows for partition {partition_date} from {len(shards)} "
+        f"shard(s) in {time.perf_counter() - start:.2f}s"
+    )
+    return batch
+
+
+def _cache_put(cache: PartitionCache, key: str, batch: EmbeddingBatch, partition_date: str) -> None:
+    try:
+        cache.put(key, batch, partition_date=partition_date)
+    except OSError as e:
+        logger.warning(f"Could not write partition {partition_date} to the local cache: {e}")
+
+
+def load_partitioned_data(
+    partition_date: str,
+    as_batch: bool = False,
+    expected_dim: Optional[int] = None,
+    precision: str = "float32",
+    use_cache: Optional[bool] = None,
+    skip_scored_version: Optional[str] = None,
+    window: Optional[Tuple[datetime, datetime]] = None
+) -> Union[pd.DataFrame, EmbeddingBatch]:
+    """
+    Load the partitioned case snapshot and join with precomputed embeddings for the same day.
+    Validates the resulting schema.
+
+    Args:
+        partition_date: Partition to load (YYYYMMDD)
+        as_batch: Return an EmbeddingBatch instead of a DataFrame; the query
+            result is validated and converted once, then released
+        expected_dim: Embedding dimension for as_batch (defaults to the most common one)
+        precision: Storage precision of the batch matrix (float64, float32, float16 or int8)
+        use_cache: Reuse a locally cached copy of the partition (as_batch only) when
+            the query and the source tables are unchanged; defaults to cache.enabled
+        skip_scored_version: Incremental mode; only load cases with no row for
+            this model version in the output table yet
+        window: Micro-batch mode; only load cases with request_time in
+            (start, end] (see partition_query). Windows are never cached.
+
+    With as_batch and bq.storage_read_api set, the partition is read as Arrow
+    record batches through the Storage Read API (see stream_partitioned_data)
+    and decoded without a DataFrame (a partition over bq.storage_read_max_rows
+    rows raises instead of being truncated), instead of a REST query capped
+    at REST_ROW_LIMIT rows. Either way the
+    partition is held in memory as one batch. With as_batch, the partition is
+    read as bq.read_shards hash shards in parallel (see read_partition_batch).
+    With as_batch and bq.packed_embeddings set, embeddings are transferred as
+    packed float32 BYTES, except when the batch precision is float64.
+    """
+    try:
+        case_table, embedding_table = _source_tables()
+
+        # The Storage Read API path decodes Arrow record batches into the batch
+        storage_read = as_batch and config["bq"].get("storage_read_api", False)
+        max_rows = config["bq"].get("storage_read_max_rows") if storage_read else None
+        max_rows = int(max_rows) if max_rows else None
+        n_shards = max(1, int(config["bq"].get("read_shards", 1))) if as_batch else 1
+        exclude_scored = None
+        if skip_scored_version:
+            exclude_scored = (config["bq"]["output_table"], skip_scored_version)
+            logger.info(f"Incremental load: skipping cases already scored by {skip_scored_version}")
+        dtype = np.float64 if precision == "float64" else np.float32
+        # Packed rows are float32, so a float64 batch keeps the FLOAT64 lists
+        packed = as_batch and dtype == np.float32 and config["bq"].get("packed_embeddings", False)
+        query = partition_query(
+            case_table, embedding_table, partition_date,
+            limit=max_rows if storage_read else REST_ROW_LIMIT, exclude_scored=exclude_scored,
+            packed=packed, window=window
+        )
+
         logger.info(f"Loading data for partition {partition_date}")
+        if window is not None:
+            logger.info(f"Micro-batch window: request_time in ({window[0].isoformat()}, {window[1].isoformat()}]")
         logger.info(f"Using source table: {case_table}")
         logger.info(f"Using embedding table: {embedding_table}")
-        logger.info(f"Running query for partition {partition_date}...")
         
-        client = bigquery.Client(location="EU")
-        df = client.query(query).to_dataframe()
+        client = bigquery_client()
+
+        cache_settings = config.get("cache", {})
+        if use_cache is None:
+            use_cache = cache_settings.get("enabled", False) and window is None
+        cache, key = None, None
+        if as_batch and use_cache:
+            cache = PartitionCache(
+                cache_settings.get("directory", "data/cache/partitions"),
+                int(cache_settings.get("max_size_mb", 2048)) * 2**20
+            )
+            try:
+                # The anti-join result also changes when the output table does
+                tables = [case_table, embedding_table] + ([exclude_scored[0]] if exclude_scored else [])
+                versions = table_versions(client, tables)
+                key = cache_key(
+                    query, versions, expected_dim=expected_dim, dtype=np.dtype(dtype).name, shards=n_shards
+                )
+            except Exception as e:
+                logger.warning(f"Partition cache disabled for this run, cannot read table metadata: {e}")
+                cache = None
+
+        batch = cache.get(key) if cache is not None else None
+        if batch is not None:
+            logger.info(f"Loaded {batch.total_cases} rows for partition {partition_date} from the local cache")
+        elif as_batch:
+            if not storage_read and n_shards == 1:
+                logger.info(f"Running query for partition {partition_date}...")
+            batch = read_partition_batch(
+                partition_date, expected_dim, dtype, client=client, storage_read=storage_read,
+                n_shards=n_shards, exclude_scored=exclude_scored, packed=packed, window=window,
+                max_rows=max_rows
+            )
+            logger.info(f"Loaded {batch.total_cases} rows from BigQuery")
+            if cache is not None:
+                _cache_put(cache, key, batch, partition_date)
+        else:
+            logger.info(f"Running query for partition {partition_date}...")
+            df = run_query(client, query, "load_partition").to_dataframe()
+            logger.info(f"Loaded {len(df)} rows from BigQuery")
 
-        logger.info(f"Loaded {len(df)} rows from BigQuery")
+        if as_batch:
+            if precision not in ("float64", "float32"):
+                batch = batch.with_precision(precision)
+            logger.info(
+                f"Converted {len(batch)} rows to a {batch.embeddings.shape} {precision} embedding matrix "
+                f"({batch.nbytes / 2**20:.1f} MiB)"
+            )
+            return batch
         return df
         
     except Exception as e:
@@ -4,18 +4,22 @@ import os
 import sys
 import joblib
 import yaml
-from google.cloud import storage
 from typing import Optional, Tuple
 
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from utils.logger import get_logger
+from utils.gcp_clients import storage_client
 from config.config import load_config
+from inference.linear_kernel import LinearKernel
 
 logger = get_logger()
 config = load_config()
 
+# Written next to a downloaded model: the GCS folder it came from
+SOURCE_FOLDER_FILE = "gcs_folder.txt"
+
 
 def get_latest_model_folder(
     bucket_name: str = "pcc-datasets",
@@ -25,7 +29,7 @@ def get_latest_model_folder(
     Find the latest model folder in GCS based on the vYYYYMMDD_timestamp naming convention.
     Returns the folder name if found, None otherwise.
     """
-    client = storage.Client()
+    client = storage_client()
     bucket = client.bucket(bucket_name)
     
     # List all blobs with the prefix to find model files
@@ -73,7 +77,7 @@ def check_today_model_exists(
     today = date.today()
     today_date_str = today.strftime('%Y%m%d')
     
-    client = storage.Client()
+    client = storage_client()
     bucket = client.bucket(bucket_name)
     
     # List all blobs with the prefix and find today's folders
@@ -114,7 +118,7 @@ def download_model_from_gcs(
     Download model files from GCS to local directory.
     Returns (success, local_path).
     """
-    client = storage.Client()
+    client = storage_client()
     bucket = client.bucket(bucket_name)
     
     # Create local directory if it doesn't exist
@@ -149,16 +153,53 @@ def download_model_from_gcs(
     if os.path.exists(model_temp_path):
         try:
             # Test load the model
-            joblib.load(model_temp_path)
+            classifier = joblib.load(model_temp_path)
             logger.info("Model loaded successfully for verification")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             return False, ""
+        
+        # Reuse the verification load to export the memory-mappable kernel,
+        # so inference processes never have to unpickle the model
+        export_model_kernel(classifier, model_temp_path, os.path.join(local_models_dir, "model_kernel"))
     
+    with open(os.path.join(local_models_dir, SOURCE_FOLDER_FILE), "w") as f:
+        f.write(folder_name)
     logger.info(f"Successfully downloaded {len(downloaded_files)} files")
     return True, local_models_dir
 
 
+def cached_model_folder(local_models_dir: str = "src/models") -> Optional[str]:
+    """
+    GCS folder of the model last downloaded to local_models_dir, or None if
+    it holds no downloaded model.
+    """
+    path = os.path.join(local_models_dir, SOURCE_FOLDER_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return f.read().strip() or None
+
+
+def export_model_kernel(classifier, source_path: str, kernel_dir: str) -> bool:
+    """
+    Export a linear classifier as raw .npy arrays plus JSON metadata that
+    inference can memory-map. Returns False if the model cannot be exported.
+    """
+    kernel = LinearKernel.from_estimator(classifier)
+    if kernel is None:
+        logger.info(f"{type(classifier).__name__} has no linear kernel, skipping memory-mapped export")
+        return False
+    
+    try:
+        kernel.save(kernel_dir, source_path=source_path)
+        logger.info(f"Exported memory-mapped model kernel to {kernel_dir}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to export model kernel: {e}")
+        return False
+
+
 def update_config_with_model_info(
     folder_name: str,
     config_path: str = "src/config/config.yaml"
@@ -0,0 +1,112 @@
+# src/ingestion/partition_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Iterable, Optional
+from utils.batch_store import is_batch_store, load_batch, save_batch
+from utils.embedding_batch import EmbeddingBatch
+from utils.logger import get_bq_logger
+
+logger = get_bq_logger()
+
+# Written last into every entry, so a half-written entry is never read back
+ENTRY_FILE = "entry.json"
+
+
+def table_versions(client, tables: Iterable[str]) -> Dict[str, str]:
+    """
+    Last-modified time of each source table, from table metadata
+    (a free API call; no query is run).
+    """
+    versions = {}
+    for table in tables:
+        modified = client.get_table(table).modified
+        versions[table] = modified.isoformat() if modified is not None else ""
+    return versions
+
+
+def cache_key(query: str, versions: Dict[str, str], **params) -> str:
+    """
+    Key for one loaded partition: the query text, the source tables'
+    last-modified times and the load parameters (dimension, dtype).
+    A change to any of them is a cache miss.
+    """
+    payload = json.dumps({"query": query, "tables": versions, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _dir_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+class PartitionCache:
+    """
+    Size-bounded LRU cache of loaded partitions on local disk.
+
+    Each entry is a batch store directory (memory-mapped when read back) named
+    after its cache key. The entry file's mtime records the last access; when
+    the cache grows past max_bytes, least recently used entries are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            self._path(name) for name in os.listdir(self.directory)
+            if os.path.isfile(os.path.join(self._path(name), ENTRY_FILE))
+        ]
+
+    def get(self, key: str) -> Optional[EmbeddingBatch]:
+        """Cached batch for key (memory-mapped), or None on a miss."""
+        path = self._path(key)
+        entry = os.path.join(path, ENTRY_FILE)
+        if not os.path.isfile(entry) or not is_batch_store(path):
+            return None
+        try:
+            batch = load_batch(path)
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        os.utime(entry)
+        logger.info(f"Partition cache hit: {key} ({len(batch)} rows)")
+        return batch
+
+    def put(self, key: str, batch: EmbeddingBatch, **info) -> None:
+        """Store a batch under key, then evict down to max_bytes."""
+        path = self._path(key)
+        shutil.rmtree(path, ignore_errors=True)
+        save_batch(batch, path)
+        with open(os.path.join(path, ENTRY_FILE), "w") as f:
+            json.dump({"key": key, "rows": len(batch), "created": time.time(), **info}, f, sort_keys=True, default=str)
+        logger.info(f"Partition cache stored: {key} ({len(batch)} rows)")
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda p: os.path.getmtime(os.path.join(p, ENTRY_FILE)))
+        sizes = {path: _dir_size(path) for path in entries}
+        total = sum(sizes.values())
+        evicted = 0
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[path]
+            evicted += 1
+            logger.info(f"Partition cache evicted {os.path.basename(path)}")
+        return evicted
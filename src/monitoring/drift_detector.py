@@ -0,0 +1,320 @@
+# src/monitoring/drift_detector.py
+
+import json
+import os
+import threading
+import numpy as np
+from typing import Optional
+from utils.logger import get_logger
+
+logger = get_logger()
+
+CONFIDENCE_EDGES = np.linspace(0.0, 1.0, 21)
+
+# PSI above this marks a dimension as shifted (common rule of thumb)
+PSI_SHIFT_THRESHOLD = 0.2
+
+# Rows per vectorized histogram step; bounds the (rows, d, bins) comparison
+_HISTOGRAM_ROWS = 2048
+
+
+class DriftState:
+    """
+    Mergeable embedding and prediction statistics for one run.
+
+    Holds per-dimension count/mean/M2 (Welford), per-dimension histogram
+    counts over fixed bin edges, and the confidence and label distributions.
+    States built over separate chunks (or workers) combine with merge(), so a
+    run is profiled in one pass without keeping the matrix around.
+    """
+
+    def __init__(self, edges: np.ndarray):
+        # (d, bins + 1) bin edges per dimension; the outer edges are open
+        self.edges = np.asarray(edges, dtype=np.float64)
+        n_features, n_edges = self.edges.shape
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.histogram = np.zeros((n_features, n_edges - 1), dtype=np.int64)
+        self.confidence_histogram = np.zeros(len(CONFIDENCE_EDGES) - 1, dtype=np.int64)
+        self.label_counts = {}
+
+    @classmethod
+    def with_quantile_edges(cls, matrix: np.ndarray, bins: int = 10) -> "DriftState":
+        """Empty state with per-dimension quantile bin edges taken from matrix."""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        edges = np.quantile(matrix, np.linspace(0.0, 1.0, bins + 1), axis=0).T
+        return cls(edges)
+
+    @property
+    def n_features(self) -> int:
+        return self.edges.shape[0]
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / self.count if self.count else np.zeros(self.n_features)
+
+    def update(self, matrix: np.ndarray) -> "DriftState":
+        """Add a chunk of embeddings (n, d)."""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.ndim != 2 or matrix.shape[1] != self.n_features:
+            raise ValueError(f"Expected embeddings with {self.n_features} features, got shape {matrix.shape}")
+        if len(matrix) == 0:
+            return self
+
+        # Chan et al. parallel update of count, mean and M2
+        n = len(matrix)
+        chunk_mean = matrix.mean(axis=0)
+        chunk_m2 = ((matrix - chunk_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + chunk_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        # Bin index per value, then one bincount over (dimension, bin) pairs
+        inner = self.edges[:, 1:-1]
+        n_bins = self.histogram.shape[1]
+        offsets = np.arange(self.n_features) * n_bins
+        for start in range(0, n, _HISTOGRAM_ROWS):
+            rows = matrix[start:start + _HISTOGRAM_ROWS]
+            bins = (rows[:, :, None] >= inner[None, :, :]).sum(axis=2)
+            self.histogram += np.bincount(
+                (bins + offsets).ravel(), minlength=self.histogram.size
+            ).reshape(self.histogram.shape)
+        return self
+
+    def update_predictions(self, confidence: np.ndarray, labels: Optional[np.ndarray] = None) -> "DriftState":
+        """Add a chunk of prediction confidences and labels."""
+        confidence = np.clip(np.asarray(confidence, dtype=np.float64), 0.0, 1.0)
+        self.confidence_histogram += np.histogram(confidence, bins=CONFIDENCE_EDGES)[0]
+        if labels is not None:
+            values, counts = np.unique(np.asarray(labels).astype(str), return_counts=True)
+            for value, count in zip(values, counts):
+                self.label_counts[value] = self.label_counts.get(value, 0) + int(count)
+        return self
+
+    def merge(self, other: "DriftState") -> "DriftState":
+        """Combine another state over the same bin edges into this one."""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge drift states with different bin edges")
+        total = self.count + other.count
+        if total:
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * other.count / total
+            self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / total
+        self.count = total
+        self.histogram += other.histogram
+        self.confidence_histogram += other.confidence_histogram
+        for label, count in other.label_counts.items():
+            self.label_counts[label] = self.label_counts.get(label, 0) + count
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "edges": self.edges.tolist(),
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+            "histogram": self.histogram.tolist(),
+            "confidence_histogram": self.confidence_histogram.tolist(),
+            "label_counts": self.label_counts
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DriftState":
+        state = cls(np.asarray(data["edges"]))
+        state.count = int(data["count"])
+        state.mean = np.asarray(data["mean"], dtype=np.float64)
+        state.m2 = np.asarray(data["m2"], dtype=np.float64)
+        state.histogram = np.asarray(data["histogram"], dtype=np.int64)
+        state.confidence_histogram = np.asarray(data["confidence_histogram"], dtype=np.int64)
+        state.label_counts = {str(k): int(v) for k, v in data.get("label_counts", {}).items()}
+        return state
+
+
+def _proportions(counts: np.ndarray, eps: float) -> np.ndarray:
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.maximum(counts / np.maximum(totals, 1.0), eps)
+
+
+def psi(expected: np.ndarray, actual: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    """Population Stability Index over the last axis of two count arrays."""
+    e, a = _proportions(expected, eps), _proportions(actual, eps)
+    return ((a - e) * np.log(a / e)).sum(axis=-1)
+
+
+def kl_divergence(expected: np.ndarray, actual: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    """KL(actual || expected) over the last axis of two count arrays."""
+    e, a = _proportions(expected, eps), _proportions(actual, eps)
+    return (a * np.log(a / e)).sum(axis=-1)
+
+
+def compare_to_reference(state: DriftState, reference: DriftState, top_k: int = 5) -> dict:
+    """
+    Summarize drift of a run against a reference profile.
+
+    Returns:
+        Per-dimension PSI/KL summaries, the most shifted dimensions, the mean
+        shift in reference standard deviations, and confidence/label PSI
+    """
+    if state.n_features != reference.n_features:
+        raise ValueError(f"Run has {state.n_features} features, reference has {reference.n_features}")
+
+    dim_psi = psi(reference.histogram, state.histogram)
+    dim_kl = kl_divergence(reference.histogram, state.histogram)
+    reference_std = np.sqrt(np.maximum(reference.variance, 1e-12))
+    mean_shift = np.abs(state.mean - reference.mean) / reference_std
+    top = np.argsort(dim_psi)[::-1][:top_k]
+
+    labels = sorted(set(reference.label_counts) | set(state.label_counts))
+    label_psi = None
+    if labels and sum(reference.label_counts.values()) and sum(state.label_counts.values()):
+        label_psi = round(float(psi(
+            [reference.label_counts.get(label, 0) for label in labels],
+            [state.label_counts.get(label, 0) for label in labels]
+        )), 6)
+
+    confidence_psi = None
+    if reference.confidence_histogram.sum() and state.confidence_histogram.sum():
+        confidence_psi = round(float(psi(reference.confidence_histogram, state.confidence_histogram)), 6)
+
+    return {
+        "cases": int(state.count),
+        "reference_cases": int(reference.count),
+        "psi_mean": round(float(dim_psi.mean()), 6),
+        "psi_max": round(float(dim_psi.max()), 6),
+        "kl_mean": round(float(dim_kl.mean()), 6),
+        "dims_shifted": int((dim_psi > PSI_SHIFT_THRESHOLD).sum()),
+        "top_dims": {int(i): round(float(dim_psi[i]), 6) for i in top},
+        "mean_shift_std_max": round(float(mean_shift.max()), 6),
+        "confidence_psi": confidence_psi,
+        "label_psi": label_psi
+    }
+
+
+def load_reference_profile(path: str) -> Optional[DriftState]:
+    """Load a stored reference profile (local file or gs:// path), or None if there is none."""
+    if path.startswith("gs://"):
+        from utils.gcp_clients import parse_gcs_path, storage_client
+        bucket, name = parse_gcs_path(path)
+        blob = storage_client().bucket(bucket).get_blob(name)
+        return DriftState.from_dict(json.loads(blob.download_as_bytes())) if blob is not None else None
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return DriftState.from_dict(json.load(f))
+
+
+def save_reference_profile(state: DriftState, path: str, overwrite: bool = True) -> bool:
+    """
+    Store a profile as the reference for later runs, in a local file or at a
+    gs:// path. The write is atomic: readers see the old profile or the new
+    one, never a partial file.
+
+    Args:
+        state: Profile to store (see profile_run)
+        path: Local path or gs://bucket/object
+        overwrite: Replace an existing reference; if False, the profile is
+            only stored when there is no reference yet, so concurrent runs
+            cannot replace each other's
+
+    Returns:
+        False if overwrite is False and a reference already exists
+    """
+    payload = json.dumps(state.to_dict())
+    if path.startswith("gs://"):
+        from google.api_core.exceptions import PreconditionFailed
+        from utils.gcp_clients import parse_gcs_path, storage_client
+        bucket, name = parse_gcs_path(path)
+        blob = storage_client().bucket(bucket).blob(name)
+        try:
+            # Generation 0 matches only a missing object
+            blob.upload_from_string(
+                payload, content_type="application/json", if_generation_match=None if overwrite else 0
+            )
+        except PreconditionFailed:
+            logger.warning(f"Drift reference profile {path} already exists, not replaced")
+            return False
+    else:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        try:
+            if overwrite:
+                os.replace(tmp_path, path)
+            else:
+                # link() fails if the reference exists, unlike replace()
+                os.link(tmp_path, path)
+        except FileExistsError:
+            logger.warning(f"Drift reference profile {path} already exists, not replaced")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    logger.info(f"Saved drift reference profile ({state.count} cases) to {path}")
+    return True
+
+
+def profile_run(
+    matrix: np.ndarray,
+    confidence: Optional[np.ndarray] = None,
+    labels: Optional[np.ndarray] = None,
+    reference: Optional[DriftState] = None,
+    chunk_size: int = 10000,
+    bins: int = 10
+) -> DriftState:
+    """
+    Profile a run's validated embedding matrix (and predictions) in one pass.
+    Uses the reference profile's bin edges so the histograms are comparable;
+    without a reference, edges are the quantiles of the first chunk.
+    """
+    if reference is not None:
+        state = DriftState(reference.edges)
+    else:
+        state = DriftState.with_quantile_edges(matrix[:chunk_size], bins=bins)
+
+    for start in range(0, len(matrix), chunk_size):
+        state.update(matrix[start:start + chunk_size])
+    if confidence is not None:
+        state.update_predictions(confidence, labels)
+    return state
+
+
+def check_drift(
+    matrix: np.ndarray,
+    confidence: Optional[np.ndarray],
+    labels: Optional[np.ndarray],
+    reference_path: str,
+    save_reference_if_missing: bool = False
+) -> dict:
+    """
+    Profile a run and compare it with the stored reference profile (local
+    file or gs:// path, built with scripts/build_drift_reference.py). With
+    save_reference_if_missing, a run with no reference yet becomes the
+    reference, unless a concurrent run stored one first.
+
+    Returns:
+        Drift summary for the run log (see compare_to_reference), or a note
+        that no comparison was made
+    """
+    if len(matrix) == 0:
+        return {"status": "skipped", "reason": "no cases"}
+
+    reference = load_reference_profile(reference_path)
+    state = profile_run(matrix, confidence, labels, reference=reference)
+    if reference is None:
+        logger.warning(f"No drift reference profile at {reference_path}")
+        if save_reference_if_missing and save_reference_profile(state, reference_path, overwrite=False):
+            return {"status": "reference_created", "cases": int(state.count)}
+        return {"status": "skipped", "reason": "no reference profile"}
+
+    summary = compare_to_reference(state, reference)
+    summary["status"] = "compared"
+    logger.info(
+        f"Drift vs reference: PSI mean {summary['psi_mean']}, max {summary['psi_max']}, "
+        f"{summary['dims_shifted']} dims shifted, confidence PSI {summary['confidence_psi']}"
+    )
+    return summary
@@ -1,18 +1,25 @@
 # src/monitoring/log_inference_run.py
 # 5/21: added inference_log_schema.json and the funct
 
+import json
 import uuid
 import pandas as pd
 from google.cloud import bigquery
 from utils.logger import get_bq_logger
 from utils.schema_validator import validate_schema
+from utils.gcp_clients import bigquery_client
+from monitoring.query_costs import run_query
 from config.config import load_config
 import time
+import warnings
 from typing import Optional
 
 logger = get_bq_logger()
 config = load_config()
 
+# Column names per monitoring table, read once per process
+_table_columns = {}
+
 
 def _prepare_log_row(
     partition_date: str,
@@ -26,7 +33,8 @@ def _prepare_log_row(
     processing_duration_seconds: float,
     error_message: str | None,
     run_id: str,
-    runtime_ts: pd.Timestamp
+    runtime_ts: pd.Timestamp,
+    run_metrics: Optional[dict] = None
 ) -> dict:
     """Prepare the log row data structure."""
     return {
@@ -42,10 +50,37 @@ def _prepare_log_row(
         "notes": notes,
         "ingestion_time": runtime_ts,
         "processing_duration_seconds": processing_duration_seconds,
-        "error_message": error_message
+        "error_message": error_message,
+        "run_metrics": json.dumps(run_metrics, sort_keys=True) if run_metrics else None
     }
 
 
+def _monitoring_columns(client: bigquery.Client, table: str) -> Optional[set]:
+    """Column names of the monitoring table, or None if the schema can't be read."""
+    if table not in _table_columns:
+        try:
+            _table_columns[table] = {field.name for field in client.get_table(table).schema}
+        except Exception as e:
+            logger.warning(f"Could not read the schema of {table}: {e}")
+            return None
+    return _table_columns[table]
+
+
+def _drop_missing_columns(client: bigquery.Client, table: str, row: dict) -> None:
+    """
+    Drop run_metrics from the row when the monitoring table predates the
+    column, so the insert doesn't fail with "no such field". The migration
+    is the ALTER TABLE in scripts/create_bigquery_tables.sql.
+    """
+    columns = _monitoring_columns(client, table)
+    if columns is not None and "run_metrics" in row and "run_metrics" not in columns:
+        logger.warning(
+            f"{table} has no run_metrics column, logging the run without it; "
+            "run scripts/create_bigquery_tables.sql to add the column"
+        )
+        row.pop("run_metrics")
+
+
 def _validate_and_prepare_data(row: dict, df_row: pd.DataFrame) -> bool:
     """Validate schema and prepare data for BigQuery."""
     try:
@@ -72,10 +107,14 @@ def _insert_with_retry(
     row: dict,
     max_retries: int
 ) -> bool:
-    """Insert row to BigQuery with retry logic."""
+    """
+    Insert row to BigQuery with retry logic. The run_id is the insert id, so
+    BigQuery drops a retried row it already has, and an empty error list is
+    the receipt that the row was accepted; no query is needed to verify it.
+    """
     for attempt in range(max_retries):
         try:
-            errors = client.insert_rows_json(table, [row])
+            errors = client.insert_rows_json(table, [row], row_ids=[row["run_id"]])
             if errors:
                 logger.error(
                     f"Failed to log inference run (attempt {attempt + 1}): {errors}"
@@ -116,7 +155,8 @@ def log_inference_run(
     processing_duration_seconds: float = 0.0,
     error_message: str | None = None,
     table: Optional[str] = None,
-    max_retries: int = 3
+    max_retries: int = 3,
+    run_metrics: Optional[dict] = None
 ) -> bool:
     """
     Logs a single inference run to BigQuery monitoring table.
@@ -134,6 +174,7 @@ def log_inference_run(
         error_message: Error message if any
         table: BigQuery table name (uses config if not provided)
         max_retries: Maximum number of retry attempts
+        run_metrics: Structured per-run metrics, stored as a JSON string
 
     Returns:
         bool: True if logging successful, False otherwise
@@ -158,14 +199,15 @@ def log_inference_run(
         )
         return True
 
-    client = bigquery.Client(location="EU")
+    client = bigquery_client()
     run_id = str(uuid.uuid4())
     runtime_ts = pd.Timestamp.utcnow()
 
     row = _prepare_log_row(
         partition_date, model_version, embedding_model, total_cases,
         passed_validation, dropped_cases, status, notes,
-        processing_duration_seconds, error_message, run_id, runtime_ts
+        processing_duration_seconds, error_message, run_id, runtime_ts,
+        run_metrics=run_metrics
     )
 
     df_row = pd.DataFrame([row])
@@ -174,6 +216,7 @@ def log_inference_run(
     if not _validate_and_prepare_data(row, df_row):
         return False
 
+    _drop_missing_columns(client, table, row)
     logger.debug(f"Logging inference run: {row}")
 
     # Insert with retry logic
@@ -186,7 +229,12 @@ def log_inference_run(
 
 def verify_monitoring_log(run_id: str, table: Optional[str] = None) -> bool:
     """
-    Verify that a monitoring log entry was written to BigQuery.
+    Deprecated: log_inference_run already confirms the row. It is inserted
+    with its run_id as the insert id, and an insert without errors means
+    the row was accepted.
+
+    Counts the monitoring rows with this run_id, which scans the last
+    two days of the monitoring table.
 
     Args:
         run_id: The run ID to verify
@@ -195,43 +243,31 @@ def verify_monitoring_log(run_id: str, table: Optional[str] = None) -> bool:
     Returns:
         bool: True if verification successful
     """
+    warnings.warn(
+        "verify_monitoring_log is deprecated, the insert in log_inference_run is its own receipt",
+        DeprecationWarning, stacklevel=2
+    )
     if table is None:
         table = config.get("bq", {}).get(
             "monitoring_table",
             "ales-sandbox-465911.PCC_EPs.pcc_monitoring_logs"
         )
 
-    # Ensure table is not None for BigQuery operations
-    if table is None:
-        logger.error("No monitoring table configured")
-        return False
-
-    dry_run = config["runtime"].get("dry_run", False)
-    if dry_run:
+    if config["runtime"].get("dry_run", False):
         logger.info("[DRY RUN] Skipping monitoring log verification")
         return True
 
     try:
-        client = bigquery.Client(location="EU")
-
         query = f"""
         SELECT COUNT(*) as log_count
         FROM `{table}`
-        WHERE run_id = '{run_id}'
+        WHERE DATE(ingestion_time) >= DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)
+        AND run_id = '{run_id}'
         """
-
-        result = client.query(query).result()
-        log_count = next(result).log_count
-
-        if log_count > 0:
-            logger.info(
-                f"Monitoring log verification successful for run_id: {run_id}"
-            )
-            return True
-        else:
+        log_count = next(run_query(bigquery_client(), query, "verify_monitoring_log").result()).log_count
+        if log_count == 0:
             logger.warning(f"No monitoring log found for run_id: {run_id}")
-            return False
-
+        return log_count > 0
     except Exception as e:
         logger.error(f"Monitoring log verification failed: {e}")
         return False
@@ -0,0 +1,141 @@
+# src/monitoring/query_costs.py
+
+import contextvars
+import threading
+from typing import Any, Dict, List, Optional
+from google.cloud import bigquery
+from utils.logger import get_bq_logger
+from config.config import load_config
+
+logger = get_bq_logger()
+config = load_config()
+
+GB = 10**9
+
+# Stats of one BigQuery job as recorded in the monitoring log
+JOB_STATS = ("bytes_processed", "bytes_billed", "slot_ms", "output_bytes", "output_rows")
+
+
+class QueryCosts:
+    """
+    Stats of the BigQuery jobs of one pipeline run: bytes processed and
+    billed, slot-ms and cache hits per job, summed per label. Thread-safe,
+    so the shard readers of a run can record into it concurrently.
+    """
+
+    def __init__(self):
+        self.jobs: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, label: str, job_id: Optional[str], **stats) -> None:
+        with self._lock:
+            self.jobs.append({"label": label, "job_id": job_id, **stats})
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals over every job and per label, for the run's run_metrics."""
+        with self._lock:
+            jobs = list(self.jobs)
+
+        def totals(selected):
+            out = {"jobs": len(selected), "cache_hits": sum(1 for j in selected if j.get("cache_hit"))}
+            for stat in JOB_STATS:
+                out[stat] = sum(j.get(stat) or 0 for j in selected)
+            return out
+
+        labels = sorted({j["label"] for j in jobs})
+        return {**totals(jobs), "by_label": {label: totals([j for j in jobs if j["label"] == label]) for label in labels}}
+
+
+_current: contextvars.ContextVar[Optional[QueryCosts]] = contextvars.ContextVar("query_costs", default=None)
+
+
+def track_query_costs() -> QueryCosts:
+    """
+    Start collecting the stats of the BigQuery jobs run from the current
+    context; threads started with a copy of it (contextvars.copy_context)
+    record into the same QueryCosts.
+    """
+    costs = QueryCosts()
+    _current.set(costs)
+    return costs
+
+
+def _stat(job, name: str) -> Optional[int]:
+    value = getattr(job, name, None)
+    return int(value) if isinstance(value, (int, float)) else None
+
+
+def record_job(job, label: str) -> Dict[str, Any]:
+    """
+    Record a finished query or load job in the current run's QueryCosts, if any.
+
+    Returns:
+        The job's stats (JOB_STATS and cache_hit; None where not reported)
+    """
+    costs = _current.get()
+    stats = {
+        "bytes_processed": _stat(job, "total_bytes_processed"),
+        "bytes_billed": _stat(job, "total_bytes_billed"),
+        "slot_ms": _stat(job, "slot_millis"),
+        "cache_hit": getattr(job, "cache_hit", None) is True,
+        "output_bytes": _stat(job, "output_bytes"),
+        "output_rows": _stat(job, "output_rows")
+    }
+    properties = getattr(job, "_properties", None)
+    if stats["slot_ms"] is None and isinstance(properties, dict):
+        # Load jobs report slot time only in the raw job statistics
+        slot_ms = properties.get("statistics", {}).get("totalSlotMs")
+        stats["slot_ms"] = int(slot_ms) if slot_ms is not None else None
+    logger.info(
+        f"{label} job {getattr(job, 'job_id', None)}: {stats['bytes_processed'] or 0} bytes processed, "
+        f"{stats['bytes_billed'] or 0} billed, {stats['slot_ms'] or 0} slot-ms"
+        f"{' (cached)' if stats['cache_hit'] else ''}"
+    )
+    if costs is not None:
+        costs.add(label, getattr(job, "job_id", None), **stats)
+    return stats
+
+
+def check_query_budget(client: bigquery.Client, query: str, label: str) -> Optional[int]:
+    """
+    Estimate the bytes a query would scan with a dry run and compare them to
+    query_budget.max_bytes_gb. Over budget, warn or (action: refuse) raise.
+
+    Returns:
+        The estimated bytes, or None if estimates are disabled
+    """
+    settings = config.get("query_budget", {})
+    if not settings.get("enabled", False):
+        return None
+    job = client.query(query, job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False))
+    estimate = _stat(job, "total_bytes_processed") or 0
+    budget = float(settings.get("max_bytes_gb", 100)) * GB
+    if estimate > budget:
+        message = f"{label} query would process {estimate / GB:.2f} GB, over the {budget / GB:.2f} GB budget"
+        if settings.get("action", "warn") == "refuse":
+            raise RuntimeError(f"Refusing to run: {message}")
+        logger.warning(message)
+    else:
+        logger.info(f"{label} query estimate: {estimate / GB:.3f} GB")
+    return estimate
+
+
+def run_query(client: bigquery.Client, query: str, label: str):
+    """
+    Run a query after the budget check and wait for it; its stats are
+    recorded in the current run's QueryCosts. With action: refuse, BigQuery
+    also enforces the budget through maximum_bytes_billed.
+
+    Returns:
+        The finished QueryJob (call result() / to_dataframe() on it)
+    """
+    check_query_budget(client, query, label)
+    settings = config.get("query_budget", {})
+    if settings.get("enabled", False) and settings.get("action", "warn") == "refuse":
+        job_config = bigquery.QueryJobConfig(maximum_bytes_billed=int(float(settings.get("max_bytes_gb", 100)) * GB))
+        job = client.query(query, job_config=job_config)
+    else:
+        job = client.query(query)
+    job.result()
+    record_job(job, label)
+    return job
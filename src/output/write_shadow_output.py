@@ -0,0 +1,43 @@
+# src/output/write_shadow_output.py
+
+import io
+import os
+import pandas as pd
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def write_shadow_predictions(df: pd.DataFrame, partition_date: str, output_dir: str = "data/shadow") -> str:
+    """
+    Write challenger (shadow) predictions for one run to Parquet, in a local
+    directory or under a gs:// prefix. Shadow predictions never reach the
+    output table; they are kept next to the run so challengers can be
+    compared offline. Each run writes its own file, so the micro-batches of
+    a partition do not replace each other's predictions.
+
+    Args:
+        df: Shadow predictions from predict_batch_shadow
+        partition_date: Partition the predictions belong to
+        output_dir: Directory or gs://bucket/prefix for shadow prediction files
+
+    Returns:
+        str: Path of the written file
+    """
+    run_ts = pd.Timestamp.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    filename = f"shadow_predictions_{partition_date}_{run_ts}.parquet"
+    if output_dir.startswith("gs://"):
+        from utils.gcp_clients import parse_gcs_path, storage_client
+        path = f"{output_dir.rstrip('/')}/{filename}"
+        bucket, name = parse_gcs_path(path)
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        storage_client().bucket(bucket).blob(name).upload_from_string(
+            buffer.getvalue(), content_type="application/octet-stream"
+        )
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, filename)
+        df.to_parquet(path, index=False)
+    logger.info(f"Wrote {len(df)} shadow predictions to {path}")
+    return path
@@ -1,18 +1,55 @@
 # src/output/write_to_bq.py
 
 from google.cloud import bigquery
+import contextvars
 import pandas as pd
 from utils.logger import get_bq_logger
 from utils.schema_validator import validate_schema
+from utils.gcp_clients import bigquery_client
+from monitoring.query_costs import record_job, run_query
 from config.config import load_config
 import time
-from typing import Optional
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 logger = get_bq_logger()
 config = load_config()
 
 
-def write_to_bigquery(df: pd.DataFrame, max_retries: int = 3) -> bool:
+def _load_job_config() -> bigquery.LoadJobConfig:
+    return bigquery.LoadJobConfig(
+        write_disposition="WRITE_APPEND",
+        source_format=bigquery.SourceFormat.PARQUET,
+        autodetect=False,
+        ignore_unknown_values=False,
+        max_bad_records=0  # Fail on any bad records
+    )
+
+
+def _write_receipt(job, table_id: str, df: pd.DataFrame) -> Dict:
+    """
+    Receipt of a finished load job, built from the job's own statistics:
+    job id, destination table and partitions, rows sent, and the rows and
+    bytes BigQuery reports as written. Recording the job also counts it
+    towards the run's query costs.
+    """
+    stats = record_job(job, "write_output")
+    partitions = []
+    if "ingestion_time" in df.columns and len(df) > 0:
+        # The output table is partitioned by DATE(ingestion_time)
+        partitions = sorted(pd.to_datetime(df["ingestion_time"]).dt.strftime("%Y%m%d").unique().tolist())
+    return {
+        "job_id": getattr(job, "job_id", None),
+        "table": table_id,
+        "partitions": partitions,
+        "rows_sent": len(df),
+        "output_rows": stats["output_rows"],
+        "output_bytes": stats["output_bytes"]
+    }
+
+
+def write_to_bigquery(df: pd.DataFrame, max_retries: int = 3) -> Optional[Dict]:
     """
     Write final predictions to BigQuery output table.
     Uses schema from config.yaml and respects dry_run mode.
@@ -22,7 +59,7 @@ def write_to_bigquery(df: pd.DataFrame, max_retries: int = 3) -> bool:
         max_retries: Maximum number of retry attempts
         
     Returns:
-        bool: True if successful, False otherwise
+        The write receipt (see _write_receipt) if successful, None otherwise
     """
     table_id = config["bq"]["output_table"]
     dry_run = config["runtime"].get("dry_run", False)  # Default to False for wet runs
@@ -31,7 +68,8 @@ def write_to_bigquery(df: pd.DataFrame, max_retries: int = 3) -> bool:
         logger.info(f"[DRY RUN] Would write {len(df)} rows to {table_id}")
         logger.info(f"[DRY RUN] Sample data preview:")
         logger.info(df.head().to_string())
-        return True
+        return {"job_id": None, "table": table_id, "partitions": [], "rows_sent": len(df),
+                "output_rows": None, "output_bytes": None, "dry_run": True}
 
     # Validate schema before writing
     try:
@@ -39,17 +77,10 @@ def write_to_bigquery(df: pd.DataFrame, max_retries: int = 3) -> bool:
         logger.info("Output schema validated successfully")
     except Exception as e:
         logger.error(f"Schema validation failed: {e}")
-        return False
+        return None
 
-    client = bigquery.Client()
-
-    job_config = bigquery.LoadJobConfig(
-        write_disposition="WRITE_APPEND",
-        source_format=bigquery.SourceFormat.PARQUET,
-        autodetect=False,
-        ignore_unknown_values=False,
-        max_bad_records=0  # Fail on any bad records
-    )
+    client = bigquery_client()
+    job_config = _load_job_config()
 
     for attempt in range(max_retries):
         try:
@@ -57,12 +88,12 @@ def write_to_bigquery(df: pd.DataFrame, max_retries: int = 3) -> bool:
             
             job = client.load_table_from_dataframe(df, table_id, job_config=job_config)
             job.result()  # Wait for the job to complete
-            
-            # Verify the write operation
-            table = client.get_table(table_id)
-            logger.info(f"Successfully wrote {len(df)} rows to BigQuery table: {table_id}")
-            logger.info(f"Table now contains {table.num_rows} total rows")
-            return True
+            receipt = _write_receipt(job, table_id, df)
+            logger.info(
+                f"Successfully wrote {len(df)} rows to BigQuery table: {table_id} "
+                f"(job {receipt['job_id']}, {receipt['output_rows']} rows reported)"
+            )
+            return receipt
             
         except Exception as e:
             logger.error(f"Attempt {attempt + 1} failed: {e}")
@@ -72,53 +103,194 @@ def write_to_bigquery(df: pd.DataFrame, max_retries: int = 3) -> bool:
                 time.sleep(wait_time)
             else:
                 logger.error(f"All {max_retries} attempts failed. Data not written to BigQuery.")
-                return False
+                return None
     
-    return False
+    return None
+
+
+class StreamingWriter:
+    """
+    Appends prediction chunks to the output table while scoring continues.
+    Rows are buffered up to chunk_rows, and every full chunk is appended by
+    its own load job on a background thread. Each chunk's commit status is
+    tracked, and a failed load is retried for that chunk alone, so committed
+    chunks are never written twice within a run. If chunks still fail, the
+    run records the partial write and its retry only scores the cases not in
+    the output table (see run_pipeline_with_bigquery). Chunk loads count towards the table's
+    daily load-job quota, so chunk_rows should stay in the tens of thousands.
+    """
+
+    def __init__(
+        self,
+        table_id: Optional[str] = None,
+        chunk_rows: int = 50000,
+        max_in_flight: int = 2,
+        max_retries: int = 3
+    ):
+        self.table_id = table_id or config["bq"]["output_table"]
+        self.chunk_rows = max(1, chunk_rows)
+        self.max_retries = max_retries
+        self.dry_run = config["runtime"].get("dry_run", False)
+        # Commit status per chunk: chunk, rows, status (pending/committed/failed), attempts, job_id, receipt, error
+        self.chunks: List[Dict] = []
+        self._buffer: List[pd.DataFrame] = []
+        self._buffered_rows = 0
+        self._futures = []
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="bq-writer")
+        self._client = None if self.dry_run else bigquery_client()
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Add formatted predictions; a full chunk is handed to a background load."""
+        if len(df) == 0:
+            return
+        self._buffer.append(df)
+        self._buffered_rows += len(df)
+        if self._buffered_rows >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        chunk = pd.concat(self._buffer, ignore_index=True)
+        self._buffer, self._buffered_rows = [], 0
+        status = {"chunk": len(self.chunks), "rows": len(chunk), "status": "pending", "attempts": 0, "job_id": None}
+        self.chunks.append(status)
+        # The load runs in a copy of this context, so its job counts towards the run's query costs
+        self._futures.append(self._pool.submit(contextvars.copy_context().run, self._load, chunk, status))
+
+    def _load(self, df: pd.DataFrame, status: Dict) -> None:
+        if self.dry_run:
+            logger.info(f"[DRY RUN] Would write chunk {status['chunk']} ({len(df)} rows) to {self.table_id}")
+            status["status"] = "committed"
+            return
+        try:
+            validate_schema(df, schema_path="schemas/output_schema.json")
+        except Exception as e:
+            logger.error(f"Chunk {status['chunk']} failed schema validation: {e}")
+            status.update(status="failed", error=str(e))
+            return
+
+        for attempt in range(self.max_retries):
+            status["attempts"] = attempt + 1
+            try:
+                job = self._client.load_table_from_dataframe(df, self.table_id, job_config=_load_job_config())
+                job.result()
+                receipt = _write_receipt(job, self.table_id, df)
+                status.update(status="committed", job_id=receipt["job_id"], receipt=receipt)
+                logger.info(f"Committed chunk {status['chunk']} ({len(df)} rows) to {self.table_id}")
+                return
+            except Exception as e:
+                logger.error(f"Chunk {status['chunk']} attempt {attempt + 1} failed: {e}")
+                status["error"] = str(e)
+                if attempt < self.max_retries - 1:
+                    time.sleep(2 ** attempt)  # Exponential backoff
+        status["status"] = "failed"
+
+    def close(self) -> bool:
+        """
+        Flush the remaining rows and wait for every chunk.
+
+        Returns:
+            True if every chunk was committed
+        """
+        self._flush()
+        for future in self._futures:
+            future.result()
+        self._pool.shutdown(wait=True)
+        summary = self.summary()
+        log = logger.info if not summary["failed_chunks"] else logger.error
+        log(
+            f"Streaming write: {summary['committed_rows']} rows in {summary['committed']} chunks committed, "
+            f"{len(summary['failed_chunks'])} chunks failed"
+        )
+        return not summary["failed_chunks"]
+
+    def summary(self) -> Dict:
+        """Chunk commit status and the committed chunks' receipts, for the run's run_metrics."""
+        committed = [c for c in self.chunks if c["status"] == "committed"]
+        return {
+            "chunks": len(self.chunks),
+            "committed": len(committed),
+            "committed_rows": sum(c["rows"] for c in committed),
+            "failed_chunks": [c["chunk"] for c in self.chunks if c["status"] == "failed"],
+            "attempts": sum(c["attempts"] for c in self.chunks),
+            "receipts": [c["receipt"] for c in committed if "receipt" in c]
+        }
+
+
+def verify_write_receipts(receipts: List[Dict], expected_rows: int) -> bool:
+    """
+    Verify a write from its receipts alone, with no query against the table:
+    every load job must report as many output rows as were sent, and the
+    rows of all jobs must add up to the expected count.
+
+    Args:
+        receipts: Receipts of the run's load jobs (see write_to_bigquery)
+        expected_rows: Number of formatted predictions the run produced
+
+    Returns:
+        bool: True if verification successful
+    """
+    if config["runtime"].get("dry_run", False):
+        logger.info("[DRY RUN] Skipping BigQuery verification")
+        return True
+
+    unreported = [r["job_id"] for r in receipts if r.get("output_rows") is None]
+    if unreported:
+        logger.warning(f"Load jobs without output row counts: {unreported}")
+        return False
+    short = [r["job_id"] for r in receipts if r["output_rows"] != r["rows_sent"]]
+    if short:
+        logger.warning(f"Load jobs whose output rows differ from the rows sent: {short}")
+        return False
+
+    written = sum(r["output_rows"] for r in receipts)
+    if written != expected_rows:
+        logger.warning(f"Receipts account for {written} rows, expected {expected_rows}")
+        return False
+    partitions = sorted({p for r in receipts for p in r.get("partitions", [])})
+    logger.info(
+        f"BigQuery write verified from {len(receipts)} job receipts: {written} rows "
+        f"in partitions {', '.join(partitions) or 'n/a'}"
+    )
+    return True
 
 
 def verify_bigquery_write(df: pd.DataFrame, table_id: Optional[str] = None) -> bool:
     """
-    Verify that data was written to BigQuery by checking recent records.
-    
+    Deprecated: verify writes with verify_write_receipts, which needs no query.
+
+    Counts the table's records ingested in the last hour, which scans the
+    recent partitions and cannot tell this run's rows from another's.
+
     Args:
         df: Original DataFrame that was written
         table_id: BigQuery table ID (uses config if not provided)
-        
+
     Returns:
-        bool: True if verification successful
+        bool: True if any records were written in the last hour
     """
+    warnings.warn(
+        "verify_bigquery_write is deprecated, use verify_write_receipts with the write receipts",
+        DeprecationWarning, stacklevel=2
+    )
     if table_id is None:
         table_id = config["bq"]["output_table"]
-    
-    dry_run = config["runtime"].get("dry_run", False)
-    if dry_run:
+
+    if config["runtime"].get("dry_run", False):
         logger.info("[DRY RUN] Skipping BigQuery verification")
         return True
-    
+
     try:
-        client = bigquery.Client()
-        
-        # Query recent records to verify write
         query = f"""
         SELECT COUNT(*) as recent_count
         FROM `{table_id}`
-        WHERE ingestion_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 HOUR)
+        WHERE DATE(ingestion_time) >= DATE(TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 HOUR))
+        AND ingestion_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 HOUR)
         """
-        
-        result = client.query(query).result()
-        recent_count = next(result).recent_count
-        
+        recent_count = next(run_query(bigquery_client(), query, "verify_output").result()).recent_count
         logger.info(f"Found {recent_count} records written in the last hour")
-        
-        # Basic verification - we should have at least some recent records
-        if recent_count > 0:
-            logger.info("BigQuery write verification successful")
-            return True
-        else:
-            logger.warning("No recent records found in BigQuery table")
-            return False
-            
+        return recent_count > 0
     except Exception as e:
         logger.error(f"BigQuery verification failed: {e}")
         return False
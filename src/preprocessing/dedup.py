@@ -0,0 +1,112 @@
+# src/preprocessing/dedup.py
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+from utils.embedding_batch import EmbeddingBatch
+from utils.embedding_precision import QuantizedEmbeddings
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def _first_occurrences(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of the first occurrence of each distinct key, in input order,
+    and for every row the index of its key among them.
+    """
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()]
+
+
+def _row_keys(embeddings) -> np.ndarray:
+    """One fixed-size bytes key per matrix row, so rows compare byte-for-byte in one sort."""
+    matrix = embeddings.codes if isinstance(embeddings, QuantizedEmbeddings) else embeddings
+    matrix = np.ascontiguousarray(matrix)
+    return matrix.view(np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))).ravel()
+
+
+def deduplicate_cases(batch: EmbeddingBatch) -> EmbeddingBatch:
+    """Keep the first row of every case id; repeats are counted as duplicate_case drops."""
+    first, _ = _first_occurrences(batch.case_ids)
+    if len(first) == len(batch):
+        return batch
+    logger.info(f"Dropping {len(batch) - len(first)} duplicate case rows")
+    return batch.take(np.sort(first), reason="duplicate_case")
+
+
+def unique_embeddings(batch: EmbeddingBatch) -> Tuple[EmbeddingBatch, np.ndarray]:
+    """
+    Collapse byte-identical embedding rows.
+
+    Returns:
+        (batch with the first case of every distinct embedding,
+         index into that batch for every row of the input batch)
+    """
+    if len(batch) == 0:
+        return batch, np.zeros(0, dtype=np.intp)
+    first, inverse = _first_occurrences(_row_keys(batch.embeddings))
+    if len(first) == len(batch):
+        return batch, np.arange(len(batch))
+    logger.info(f"Scoring {len(first)} unique embeddings for {len(batch)} cases")
+    return batch.take(first), inverse
+
+
+def fan_out_predictions(
+    df_preds: pd.DataFrame,
+    unique: EmbeddingBatch,
+    batch: EmbeddingBatch,
+    inverse: np.ndarray,
+    rows: Optional[np.ndarray] = None
+) -> pd.DataFrame:
+    """
+    Copy predictions for unique embeddings back to every case that shares them,
+    in the order of the full batch. Works for one or several prediction rows
+    per case (e.g. shadow predictions); cases whose representative failed to
+    score are left out. With rows (batch row indices, see representative_rows),
+    only those cases are filled in, e.g. the cases of one scored chunk.
+    """
+    if unique is batch:
+        return df_preds
+
+    if rows is None:
+        rows = slice(None)
+    columns = list(df_preds.columns)
+    mapping = pd.DataFrame({
+        "_representative": unique.case_ids[inverse[rows]],
+        "case_id": batch.case_ids[rows]
+    })
+    if batch.timestamps is not None and "timestamp" in df_preds.columns:
+        mapping["timestamp"] = batch.timestamps[rows]
+        df_preds = df_preds.drop(columns="timestamp")
+
+    df_preds = df_preds.rename(columns={"case_id": "_representative"})
+    fanned = mapping.merge(df_preds, on="_representative", how="inner")
+    return fanned[columns].reset_index(drop=True)
+
+
+def representative_rows(inverse: np.ndarray, n_unique: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batch rows grouped by the unique row that represents them.
+
+    Returns:
+        (order, offsets): the cases represented by unique rows [start, end)
+        are the batch rows order[offsets[start]:offsets[end]]
+    """
+    order = np.argsort(inverse, kind="stable")
+    offsets = np.searchsorted(inverse[order], np.arange(n_unique + 1))
+    return order, offsets
+
+
+def dedup_metrics(batch: EmbeddingBatch, unique: EmbeddingBatch) -> dict:
+    """Dedup ratios for the run log, from the case-deduplicated batch and its unique embeddings."""
+    duplicate_cases = int(batch.drop_counts.get("duplicate_case", 0))
+    return {
+        "cases": int(len(batch) + duplicate_cases),
+        "duplicate_cases": duplicate_cases,
+        "unique_embeddings": int(len(unique)),
+        "embedding_dedup_ratio": round(1.0 - len(unique) / len(batch), 6) if len(batch) else 0.0
+    }
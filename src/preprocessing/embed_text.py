@@ -1,22 +1,35 @@
 # src/preprocessing/embed_text.py
 
+import numpy as np
 import pandas as pd
+from typing import Dict, Optional, Tuple, Union
+from utils.embedding_batch import DROP_REASONS, EmbeddingBatch, embedding_column, embedding_matrix, infer_embedding_dim
+from utils.embedding_precision import QuantizedEmbeddings
 from utils.logger import get_logger
+from .feature_projection import project_embeddings
 
 logger = get_logger()
 
 
 def truncate_embeddings_to_model_dimensions(
-    df: pd.DataFrame, 
+    data: Union[pd.DataFrame, EmbeddingBatch],
     target_dim: int = 584,  # Model expects 584 features
     debug: bool = False
-) -> pd.DataFrame:
+) -> Union[pd.DataFrame, EmbeddingBatch]:
     """
     Truncate embeddings to match the model's expected dimensions.
-    This is a quick fix for the feature mismatch issue.
+    This is a quick fix for the feature mismatch issue; the pipeline now uses
+    feature_projection.project_for_model, driven by model metadata.
+    An EmbeddingBatch is truncated as a view of its matrix, without copying.
     """
-    import numpy as np
-    
+    if isinstance(data, EmbeddingBatch):
+        if data.n_features < target_dim:
+            logger.warning(f"Embeddings too short ({data.n_features} < {target_dim}), dropping {len(data)} rows")
+            return data.take(np.zeros(len(data), dtype=bool), reason="bad_shape")
+        logger.info(f"Truncated {len(data)} embeddings from {data.n_features} to {target_dim} dimensions")
+        return project_embeddings(data, slice(0, target_dim))
+
+    df = data
     logger.info(f"Truncating embeddings from {len(df)} rows to {target_dim} dimensions")
     
     truncated_rows = []
@@ -42,44 +55,87 @@ def truncate_embeddings_to_model_dimensions(
     return pd.DataFrame(truncated_rows)
 
 
-def validate_embeddings(
-    df: pd.DataFrame, 
-    expected_dim: int = 588,  # Combined MiniLM + TF-IDF embeddings (updated to match current BigQuery output)
+def _log_drops(df: pd.DataFrame, valid: np.ndarray, dropped: Dict[str, np.ndarray], debug: bool) -> Dict[str, int]:
+    """Log validation results and return per-reason drop counts."""
+    drop_counts = {reason: int(dropped[reason].sum()) for reason in DROP_REASONS}
+    if debug:
+        for reason in DROP_REASONS:
+            if drop_counts[reason]:
+                logger.warning(f"Dropped ({reason}): rows {list(df.index[dropped[reason]][:20])}")
+    logger.info(
+        f"Embedding validation complete: {int(valid.sum())} valid, "
+        f"{len(valid) - int(valid.sum())} dropped {drop_counts}"
+    )
+    return drop_counts
+
+
+def validate_embedding_matrix(
+    df: pd.DataFrame,
+    expected_dim: Optional[int] = None,
+    dtype: type = np.float32,
     debug: bool = False
-) -> pd.DataFrame:
-    import numpy as np
-    valid_rows = []
-    dropped = 0
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+    """
+    Validate the embedding_vector column with array operations.
+    Rows are dropped if the embedding is not a list/array, does not have
+    expected_dim values, is not numeric, or contains NaN/inf.
 
-    for idx, row in df.iterrows():
-        vec = row.get("embedding_vector")
-        if debug:
-            print(
-                f"[{idx}] Type: {type(row.get('embedding_vector'))} → "
-                f"Value: {str(row.get('embedding_vector'))[:100]}"
-            )
-        if not isinstance(vec, (list, np.ndarray)):
-            if debug:
-                print(f"[{idx}] Dropped: not list or ndarray → {type(vec)}")
-            dropped += 1
-            continue
-        vec = np.asarray(vec)
-        if vec.shape != (expected_dim,):
-            if debug:
-                print(f"[{idx}] Dropped: bad shape {vec.shape}")
-            dropped += 1
-            continue
-        if np.isnan(vec).any():
-            if debug:
-                print(f"[{idx}] Dropped: contains NaNs")
-            dropped += 1
-            continue
-        valid_rows.append(row)
+    Args:
+        df: DataFrame with case_id and embedding_vector columns
+        expected_dim: Expected embedding dimension; defaults to the most common one
+        dtype: dtype of the returned matrix
+        debug: Log the indices of dropped rows
+
+    Returns:
+        (contiguous (n_valid, expected_dim) matrix, case ids of the valid rows,
+         number of dropped rows per reason)
+    """
+    vectors = embedding_column(df)
+    if expected_dim is None:
+        expected_dim = infer_embedding_dim(vectors)
+    matrix, valid, dropped = embedding_matrix(vectors, expected_dim, dtype)
+    drop_counts = _log_drops(df, valid, dropped, debug)
+    return matrix, df["case_id"].to_numpy()[valid], drop_counts
+
+
+def _validate_batch(batch: EmbeddingBatch, expected_dim: Optional[int]) -> EmbeddingBatch:
+    """Check an EmbeddingBatch against expected_dim and drop non-finite rows."""
+    if expected_dim is not None and batch.n_features != expected_dim:
+        logger.error(f"Embedding batch has {batch.n_features} dimensions, expected {expected_dim}")
+        return batch.take(np.zeros(len(batch), dtype=bool), reason="bad_shape")
 
+    # Quantized matrices are finite by construction; checking would dequantize them
+    if not isinstance(batch.embeddings, QuantizedEmbeddings):
+        finite = np.isfinite(batch.embeddings).all(axis=1)
+        if not finite.all():
+            batch = batch.take(finite, reason="non_finite")
     logger.info(
-        f"Embedding validation complete: {len(valid_rows)} valid, {dropped} dropped"
+        f"Embedding validation complete: {len(batch)} valid, "
+        f"{batch.total_cases - len(batch)} dropped {batch.drop_counts}"
     )
-    return pd.DataFrame(valid_rows)
+    return batch
+
+
+def validate_embeddings(
+    data: Union[pd.DataFrame, EmbeddingBatch],
+    expected_dim: Optional[int] = None,
+    debug: bool = False
+) -> Union[pd.DataFrame, EmbeddingBatch]:
+    """
+    Drop rows whose embedding fails validation (see validate_embedding_matrix).
+    A DataFrame comes back as its surviving rows, with their original index;
+    an EmbeddingBatch comes back as a batch with the drops added to drop_counts.
+    Without expected_dim, the most common embedding dimension is expected.
+    """
+    if isinstance(data, EmbeddingBatch):
+        return _validate_batch(data, expected_dim)
+
+    vectors = embedding_column(data)
+    if expected_dim is None:
+        expected_dim = infer_embedding_dim(vectors)
+    _, valid, dropped = embedding_matrix(vectors, expected_dim)
+    _log_drops(data, valid, dropped, debug)
+    return data[valid]
 
 
 def check_embedding_model_version(config: dict, actual_model: str):
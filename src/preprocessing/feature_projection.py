@@ -0,0 +1,92 @@
+# src/preprocessing/feature_projection.py
+
+import numpy as np
+from typing import Optional, Sequence, Union
+from utils.embedding_batch import EmbeddingBatch
+from utils.logger import get_logger
+
+logger = get_logger()
+
+FeatureSelection = Union[slice, np.ndarray]
+
+
+def _as_selection(indices: Sequence[int]) -> FeatureSelection:
+    """Index list as a slice when it is a contiguous run, so projection stays a view."""
+    indices = np.asarray(indices, dtype=np.intp)
+    if len(indices) > 0 and (np.diff(indices) == 1).all():
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+
+def _selection_width(selection: FeatureSelection, input_dim: int) -> int:
+    if isinstance(selection, slice):
+        return len(range(*selection.indices(input_dim)))
+    return len(selection)
+
+
+def resolve_feature_selection(
+    metadata: dict,
+    n_model_features: Optional[int],
+    input_dim: int
+) -> FeatureSelection:
+    """
+    Work out which input embedding columns the model was trained on.
+
+    Uses, in order: an explicit `feature_indices` list in the model metadata,
+    the feature count from its `train_shape`, then the model's own feature
+    count. The last two select a prefix of the input columns.
+
+    Args:
+        metadata: Model metadata (metadata.json)
+        n_model_features: Number of features the loaded model expects, if known
+        input_dim: Embedding dimension of the incoming data
+
+    Returns:
+        slice or index array over the input columns
+
+    Raises:
+        ValueError: If the selection does not fit the input or disagrees with the model
+    """
+    if metadata.get("feature_indices") is not None:
+        selection = _as_selection(metadata["feature_indices"])
+        source = "metadata feature_indices"
+        if not isinstance(selection, slice) and len(selection) and (selection.min() < 0 or selection.max() >= input_dim):
+            raise ValueError(f"Feature indices out of range for {input_dim}-dimensional embeddings")
+    elif metadata.get("train_shape"):
+        selection = slice(0, int(metadata["train_shape"][-1]))
+        source = "metadata train_shape"
+    elif n_model_features is not None:
+        selection = slice(0, int(n_model_features))
+        source = "model feature count"
+        if n_model_features != input_dim:
+            logger.warning(
+                f"No feature map in model metadata, using the first {n_model_features} "
+                f"of {input_dim} embedding dimensions"
+            )
+    else:
+        raise ValueError("Cannot resolve feature selection: no feature map, train_shape or model feature count")
+
+    width = _selection_width(selection, input_dim)
+    if isinstance(selection, slice) and selection.stop > input_dim:
+        raise ValueError(f"Model expects {selection.stop} features from {source}, embeddings have {input_dim}")
+    if n_model_features is not None and width != n_model_features:
+        raise ValueError(f"{source} selects {width} features, model expects {n_model_features}")
+
+    logger.info(f"Feature selection from {source}: {width} of {input_dim} embedding dimensions")
+    return selection
+
+
+def project_embeddings(batch: EmbeddingBatch, selection: FeatureSelection) -> EmbeddingBatch:
+    """
+    Apply a feature selection to the embedding matrix.
+    A slice is applied as a view; an index array as a single fancy-index.
+    """
+    if isinstance(selection, slice) and selection.indices(batch.n_features) == (0, batch.n_features, 1):
+        return batch
+    return batch.with_embeddings(batch.embeddings[:, selection])
+
+
+def project_for_model(batch: EmbeddingBatch, model) -> EmbeddingBatch:
+    """Project a batch onto the features a loaded model (ModelHandle) was trained on."""
+    selection = resolve_feature_selection(model.metadata, model.n_features, batch.n_features)
+    return project_embeddings(batch, selection)
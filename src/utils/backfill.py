@@ -0,0 +1,130 @@
+# src/utils/backfill.py
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def partition_dates(start: str, end: str) -> List[str]:
+    """Every partition date from start to end inclusive (YYYYMMDD)."""
+    first = datetime.strptime(start, "%Y%m%d").date()
+    last = datetime.strptime(end, "%Y%m%d").date()
+    if last < first:
+        raise ValueError(f"Backfill end {end} is before start {start}")
+    return [(first + timedelta(days=i)).strftime("%Y%m%d") for i in range((last - first).days + 1)]
+
+
+class BackfillCheckpoint:
+    """
+    Per-partition completion record of a backfill, kept in a JSON file.
+    Rewritten atomically after every partition, so an interrupted backfill
+    resumes with the partitions that did not complete.
+    """
+
+    def __init__(self, path: str, model_version: str):
+        self.path = path
+        self.model_version = model_version
+        self.completed: Dict[str, dict] = {}
+        self.failed: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("model_version") == model_version:
+                self.completed = data.get("completed", {})
+                self.failed = data.get("failed", {})
+            else:
+                logger.warning(
+                    f"Checkpoint {path} is for model {data.get('model_version')}, "
+                    f"not {model_version}; starting over"
+                )
+
+    def pending(self, dates: List[str]) -> List[str]:
+        return [d for d in dates if d not in self.completed]
+
+    def mark(self, partition_date: str, succeeded: bool, **info) -> None:
+        """Record the outcome of one partition and persist the checkpoint."""
+        record = {"finished_at": datetime.now().isoformat(), **info}
+        with self._lock:
+            if succeeded:
+                self.completed[partition_date] = record
+                self.failed.pop(partition_date, None)
+            else:
+                self.failed[partition_date] = record
+            self._save()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "model_version": self.model_version,
+                "completed": self.completed,
+                "failed": self.failed
+            }, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def run_backfill(
+    dates: List[str],
+    run_partition: Callable[[str], Optional[int]],
+    checkpoint: BackfillCheckpoint,
+    max_parallel: int = 1
+) -> Dict[str, List[str]]:
+    """
+    Run run_partition for every date not yet completed in the checkpoint,
+    up to max_parallel partitions at a time. A failing partition is recorded
+    and the others carry on.
+
+    Args:
+        dates: Partition dates (YYYYMMDD)
+        run_partition: Processes one partition; returns its output case count
+        checkpoint: Completion record, updated as partitions finish
+        max_parallel: Partitions processed concurrently
+
+    Returns:
+        Dates by outcome: completed, failed and skipped (completed earlier)
+    """
+    todo = checkpoint.pending(dates)
+    skipped = [d for d in dates if d not in todo]
+    if skipped:
+        logger.info(f"Backfill resuming: {len(skipped)} partitions already completed, {len(todo)} to go")
+
+    def _run(partition_date: str) -> Optional[int]:
+        start = time.perf_counter()
+        try:
+            cases = run_partition(partition_date)
+        except Exception as e:
+            checkpoint.mark(partition_date, False, error=str(e), seconds=round(time.perf_counter() - start, 2))
+            raise
+        checkpoint.mark(partition_date, True, cases=cases, seconds=round(time.perf_counter() - start, 2))
+        return cases
+
+    outcome = {"completed": [], "failed": [], "skipped": skipped}
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = {pool.submit(_run, d): d for d in todo}
+        for future in as_completed(futures):
+            partition_date = futures[future]
+            try:
+                cases = future.result()
+                outcome["completed"].append(partition_date)
+                logger.info(f"Backfill partition {partition_date} completed ({cases} cases)")
+            except Exception as e:
+                outcome["failed"].append(partition_date)
+                logger.error(f"Backfill partition {partition_date} failed: {e}")
+
+    outcome["completed"].sort()
+    outcome["failed"].sort()
+    logger.info(
+        f"Backfill finished: {len(outcome['completed'])} completed, {len(outcome['failed'])} failed, "
+        f"{len(skipped)} skipped"
+    )
+    return outcome
@@ -0,0 +1,97 @@
+# src/utils/batch_store.py
+
+import json
+import os
+import numpy as np
+from typing import Optional
+from utils.embedding_batch import EmbeddingBatch
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# A stored batch is a directory of .npy files, one per column, so every column
+# can be memory-mapped: the (n, d) embedding matrix, fixed-width case ids and
+# (optionally) datetime64 timestamps. Drop counts, if any, go in a JSON file.
+EMBEDDINGS_FILE = "embeddings.npy"
+CASE_IDS_FILE = "case_ids.npy"
+TIMESTAMPS_FILE = "timestamps.npy"
+DROP_COUNTS_FILE = "drop_counts.json"
+
+
+def is_batch_store(path: str) -> bool:
+    """True if path is a directory written by save_batch."""
+    return all(os.path.isfile(os.path.join(path, name)) for name in (EMBEDDINGS_FILE, CASE_IDS_FILE))
+
+
+def create_embeddings_file(path: str, n_rows: int, n_features: int, dtype: type = np.float32) -> np.memmap:
+    """
+    Create the embedding matrix of a store as a writable memmap, so large
+    datasets can be filled chunk by chunk. Call save_cases afterwards.
+    """
+    os.makedirs(path, exist_ok=True)
+    return np.lib.format.open_memmap(
+        os.path.join(path, EMBEDDINGS_FILE), mode="w+", dtype=dtype, shape=(n_rows, n_features)
+    )
+
+
+def save_cases(path: str, case_ids: np.ndarray, timestamps: Optional[np.ndarray] = None) -> None:
+    """Write the per-case columns of a store."""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, CASE_IDS_FILE), np.asarray(case_ids).astype(str))
+    timestamps_path = os.path.join(path, TIMESTAMPS_FILE)
+    if timestamps is not None:
+        np.save(timestamps_path, np.asarray(timestamps, dtype="datetime64[ns]"))
+    elif os.path.exists(timestamps_path):
+        os.remove(timestamps_path)
+
+
+def save_batch(batch: EmbeddingBatch, path: str) -> None:
+    """Write a batch to path in the store format."""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, EMBEDDINGS_FILE), np.ascontiguousarray(np.asarray(batch.embeddings)))
+    save_cases(path, batch.case_ids, batch.timestamps)
+    drop_counts_path = os.path.join(path, DROP_COUNTS_FILE)
+    if batch.drop_counts:
+        with open(drop_counts_path, "w") as f:
+            json.dump(batch.drop_counts, f, sort_keys=True)
+    elif os.path.exists(drop_counts_path):
+        os.remove(drop_counts_path)
+    logger.info(f"Saved {len(batch)} cases ({batch.nbytes / 1e6:.1f} MB of embeddings) to {path}")
+
+
+def load_batch(path: str, mmap: bool = True) -> EmbeddingBatch:
+    """
+    Load a batch written by save_batch.
+
+    Args:
+        path: Store directory
+        mmap: Memory-map the columns read-only instead of reading them;
+            rows are paged in as the pipeline touches them
+
+    Returns:
+        EmbeddingBatch over the stored cases
+
+    Raises:
+        ValueError: If the store does not hold a 2D float matrix with a case id per row
+    """
+    mmap_mode = "r" if mmap else None
+    embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+    case_ids = np.load(os.path.join(path, CASE_IDS_FILE), mmap_mode=mmap_mode)
+    timestamps_path = os.path.join(path, TIMESTAMPS_FILE)
+    timestamps = np.load(timestamps_path, mmap_mode=mmap_mode) if os.path.exists(timestamps_path) else None
+
+    if embeddings.ndim != 2 or not np.issubdtype(embeddings.dtype, np.floating):
+        raise ValueError(f"Expected a 2D float embedding matrix in {path}, got {embeddings.dtype} {embeddings.shape}")
+    if case_ids.dtype.kind not in "US":
+        raise TypeError("Column 'case_id' is not string")
+    if timestamps is not None and not np.issubdtype(timestamps.dtype, np.datetime64):
+        raise TypeError("Column 'timestamp' is not timestamp")
+
+    drop_counts = None
+    drop_counts_path = os.path.join(path, DROP_COUNTS_FILE)
+    if os.path.exists(drop_counts_path):
+        with open(drop_counts_path, "r") as f:
+            drop_counts = json.load(f)
+
+    logger.info(f"Loaded {len(case_ids)} cases with {embeddings.shape[1]}-dimensional embeddings from {path}")
+    return EmbeddingBatch(case_ids, embeddings, timestamps, drop_counts=drop_counts)
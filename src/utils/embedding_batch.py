@@ -0,0 +1,413 @@
+# src/utils/embedding_batch.py
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+from utils.embedding_precision import EmbeddingMatrix, QuantizedEmbeddings, to_precision
+
+# Reasons a row can fail embedding validation, in the order they are checked
+DROP_REASONS = ("not_array", "bad_shape", "non_numeric", "non_finite")
+
+# Element type of packed embeddings: each row is one BYTES value of little-endian float32s
+PACKED_DTYPE = np.dtype("<f4")
+
+
+def embedding_matrix(
+    vectors: pd.Series,
+    expected_dim: int,
+    dtype: type = np.float32
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Convert an embedding column into one contiguous (n_valid, expected_dim) matrix.
+
+    Returns:
+        (matrix of the valid rows, boolean mask of valid rows,
+         boolean mask of dropped rows per reason in DROP_REASONS)
+    """
+    values = vectors.to_numpy(dtype=object)
+    n_rows = len(values)
+
+    # Type and shape are known from the containers without converting them
+    is_array = np.fromiter(
+        (isinstance(v, (list, np.ndarray)) for v in values), dtype=bool, count=n_rows
+    )
+    shape_ok = np.fromiter(
+        (
+            v.shape == (expected_dim,) if isinstance(v, np.ndarray)
+            else isinstance(v, list) and len(v) == expected_dim
+            for v in values
+        ),
+        dtype=bool, count=n_rows
+    )
+
+    # One C-level conversion for every well-shaped row
+    candidates = values[shape_ok].tolist()
+    numeric_ok = np.ones(len(candidates), dtype=bool)
+    try:
+        matrix = np.array(candidates, dtype=dtype).reshape(len(candidates), expected_dim)
+    except (TypeError, ValueError):
+        # Slow path, only taken when some row holds non-numeric values
+        rows = []
+        for i, v in enumerate(candidates):
+            try:
+                rows.append(np.asarray(v, dtype=dtype))
+            except (TypeError, ValueError):
+                numeric_ok[i] = False
+        matrix = np.array(rows, dtype=dtype).reshape(len(rows), expected_dim)
+
+    matrix, finite = _finite_rows(matrix)
+    valid, dropped = _drop_masks(n_rows, is_array, shape_ok, finite, numeric_ok)
+    return matrix, valid, dropped
+
+
+def _drop_masks(
+    n_rows: int,
+    is_array: np.ndarray,
+    shape_ok: np.ndarray,
+    finite: np.ndarray,
+    numeric_ok: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Valid-row mask and per-reason drop masks from the checks of one conversion.
+
+    Args:
+        n_rows: Rows in the input column
+        is_array: Per row, whether it holds an embedding container at all
+        shape_ok: Per row, whether the container has the expected dimension
+        finite: Per numeric well-shaped row, whether all its values are finite
+        numeric_ok: Per well-shaped row, whether it converted to numbers (all, if None)
+    """
+    shaped_rows = np.flatnonzero(shape_ok)
+    if numeric_ok is None:
+        numeric_ok = np.ones(len(shaped_rows), dtype=bool)
+    numeric_rows = shaped_rows[numeric_ok]
+    valid = np.zeros(n_rows, dtype=bool)
+    valid[numeric_rows[finite]] = True
+    dropped = {
+        "not_array": ~is_array,
+        "bad_shape": is_array & ~shape_ok,
+        "non_numeric": np.zeros(n_rows, dtype=bool),
+        "non_finite": np.zeros(n_rows, dtype=bool)
+    }
+    dropped["non_numeric"][shaped_rows[~numeric_ok]] = True
+    dropped["non_finite"][numeric_rows[~finite]] = True
+    return valid, dropped
+
+
+def _finite_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    finite = np.isfinite(matrix).all(axis=1)
+    if not finite.all():
+        matrix = matrix[finite]
+    return matrix, finite
+
+
+def is_packed(vectors: pd.Series) -> bool:
+    """Whether an embedding column holds packed float32 BYTES rather than lists."""
+    first = next((v for v in vectors if v is not None), None)
+    return isinstance(first, (bytes, bytearray))
+
+
+def packed_embedding_matrix(
+    vectors: pd.Series,
+    expected_dim: int,
+    dtype: type = np.float32
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Same as embedding_matrix for a column of packed float32 BYTES. The
+    well-shaped rows are joined once and viewed as the matrix with
+    np.frombuffer; no per-element conversion happens.
+    """
+    values = vectors.to_numpy(dtype=object)
+    n_rows = len(values)
+    row_bytes = expected_dim * PACKED_DTYPE.itemsize
+
+    is_array = np.fromiter((isinstance(v, (bytes, bytearray)) for v in values), dtype=bool, count=n_rows)
+    shape_ok = np.fromiter(
+        (isinstance(v, (bytes, bytearray)) and len(v) == row_bytes for v in values),
+        dtype=bool, count=n_rows
+    )
+    matrix = np.frombuffer(b"".join(values[shape_ok]), dtype=PACKED_DTYPE).reshape(-1, expected_dim)
+    matrix, finite = _finite_rows(matrix.astype(dtype, copy=False))
+    valid, dropped = _drop_masks(n_rows, is_array, shape_ok, finite)
+    return matrix, valid, dropped
+
+
+def _arrow_packed_matrix(
+    column,
+    expected_dim: int,
+    dtype: type
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """packed_embedding_matrix for an Arrow binary column, viewing its value buffer in place."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    n_rows = len(column)
+    row_bytes = expected_dim * PACKED_DTYPE.itemsize
+    is_array = ~column.is_null().to_numpy(zero_copy_only=False)
+    lengths = pc.fill_null(pc.binary_length(column), 0).to_numpy(zero_copy_only=False)
+    shape_ok = is_array & (lengths == row_bytes)
+
+    packed = column if shape_ok.all() else column.filter(pa.array(shape_ok))
+    n_ok = len(packed)
+    # Well-shaped rows are contiguous in the value buffer, starting at the first row's offset
+    data, start = b"", 0
+    if n_ok:
+        data = packed.buffers()[-1]
+        if pa.types.is_fixed_size_binary(packed.type):
+            start = packed.offset * packed.type.byte_width
+        else:
+            offsets = np.frombuffer(
+                packed.buffers()[1], dtype=np.int64 if pa.types.is_large_binary(packed.type) else np.int32
+            )
+            start = int(offsets[packed.offset])
+    matrix = np.frombuffer(data, dtype=PACKED_DTYPE, count=n_ok * expected_dim, offset=start)
+    matrix = matrix.reshape(n_ok, expected_dim)
+    matrix, finite = _finite_rows(matrix.astype(dtype, copy=False))
+    valid, dropped = _drop_masks(n_rows, is_array, shape_ok, finite)
+    return matrix, valid, dropped
+
+
+def arrow_embedding_matrix(
+    column,
+    expected_dim: int,
+    dtype: type = np.float32
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Same as embedding_matrix for an Arrow list column (e.g. one record batch
+    from the BigQuery Storage Read API). Works on the list offsets and the
+    flat value buffer, so no per-row Python objects are created.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    n_rows = len(column)
+    list_type = column.type
+    if pa.types.is_binary(list_type) or pa.types.is_large_binary(list_type) or pa.types.is_fixed_size_binary(list_type):
+        return _arrow_packed_matrix(column, expected_dim, dtype)
+
+    is_list = pa.types.is_list(list_type) or pa.types.is_large_list(list_type) or pa.types.is_fixed_size_list(list_type)
+    if is_list:
+        is_array = ~column.is_null().to_numpy(zero_copy_only=False)
+        lengths = pc.fill_null(pc.list_value_length(column), 0).to_numpy(zero_copy_only=False)
+        shape_ok = is_array & (lengths == expected_dim)
+    else:
+        is_array = np.zeros(n_rows, dtype=bool)
+        shape_ok = is_array.copy()
+
+    n_ok = int(shape_ok.sum())
+    numeric_ok = np.ones(n_ok, dtype=bool)
+    if n_ok:
+        values = column.filter(pa.array(shape_ok)).flatten()
+        if pa.types.is_floating(values.type) or pa.types.is_integer(values.type):
+            if values.null_count:
+                numeric_ok = ~values.is_null().to_numpy(zero_copy_only=False).reshape(n_ok, expected_dim).any(axis=1)
+            matrix = values.to_numpy(zero_copy_only=False).astype(dtype, copy=False).reshape(n_ok, expected_dim)
+        else:
+            numeric_ok[:] = False
+            matrix = np.empty((n_ok, expected_dim), dtype=dtype)
+        if not numeric_ok.all():
+            matrix = matrix[numeric_ok]
+    else:
+        matrix = np.empty((0, expected_dim), dtype=dtype)
+
+    matrix, finite = _finite_rows(matrix)
+    valid, dropped = _drop_masks(n_rows, is_array, shape_ok, finite, numeric_ok)
+    return np.ascontiguousarray(matrix), valid, dropped
+
+
+def infer_arrow_embedding_dim(column) -> int:
+    """Most common embedding length in an Arrow list column (0 if it holds none)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_fixed_size_list(column.type):
+        return column.type.list_size
+    if pa.types.is_binary(column.type) or pa.types.is_large_binary(column.type) or pa.types.is_fixed_size_binary(column.type):
+        lengths = pc.drop_null(pc.binary_length(column)).to_numpy(zero_copy_only=False) // PACKED_DTYPE.itemsize
+        return int(np.bincount(lengths).argmax()) if len(lengths) else 0
+    lengths = pc.drop_null(pc.list_value_length(column)).to_numpy(zero_copy_only=False)
+    return int(np.bincount(lengths).argmax()) if len(lengths) else 0
+
+
+def embedding_column(df: pd.DataFrame) -> pd.Series:
+    """The embedding_vector column, or all-missing if the frame has none."""
+    if "embedding_vector" in df.columns:
+        return df["embedding_vector"]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def infer_embedding_dim(vectors: pd.Series) -> int:
+    """Most common embedding length in a column (0 if it holds no embeddings)."""
+    lengths = [
+        len(v) // PACKED_DTYPE.itemsize if isinstance(v, (bytes, bytearray)) else len(v)
+        for v in vectors if isinstance(v, (list, np.ndarray, bytes, bytearray))
+    ]
+    return int(np.bincount(lengths).argmax()) if lengths else 0
+
+
+class EmbeddingBatch:
+    """
+    Columnar batch of cases: case ids, timestamps and one 2D embedding matrix.
+    Replaces the object column of per-row lists, so every stage works on the
+    whole matrix at once and the floats are stored exactly once.
+    """
+
+    def __init__(
+        self,
+        case_ids: np.ndarray,
+        embeddings: EmbeddingMatrix,
+        timestamps: Optional[np.ndarray] = None,
+        drop_counts: Optional[Dict[str, int]] = None
+    ):
+        self.case_ids = np.asarray(case_ids)
+        # Quantized matrices stay quantized; they dequantize per chunk when scored
+        self.embeddings = embeddings if isinstance(embeddings, QuantizedEmbeddings) else np.asarray(embeddings)
+        self.timestamps = np.asarray(timestamps) if timestamps is not None else None
+        # Rows dropped on the way to this batch, per reason in DROP_REASONS
+        self.drop_counts = dict(drop_counts or {})
+
+        if self.embeddings.ndim != 2:
+            raise ValueError(f"Expected a 2D embedding matrix, got shape {self.embeddings.shape}")
+        if len(self.case_ids) != len(self.embeddings):
+            raise ValueError(f"Got {len(self.case_ids)} case ids for {len(self.embeddings)} embeddings")
+        if self.timestamps is not None and len(self.timestamps) != len(self.embeddings):
+            raise ValueError(f"Got {len(self.timestamps)} timestamps for {len(self.embeddings)} embeddings")
+
+    def __len__(self) -> int:
+        return len(self.case_ids)
+
+    @property
+    def n_features(self) -> int:
+        return self.embeddings.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the embedding matrix."""
+        return self.embeddings.nbytes
+
+    @property
+    def total_cases(self) -> int:
+        """Cases in the batch plus every case dropped on the way to it."""
+        return len(self) + sum(self.drop_counts.values())
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        expected_dim: Optional[int] = None,
+        dtype: type = np.float32
+    ) -> "EmbeddingBatch":
+        """
+        Build a batch from a frame with case_id, embedding_vector (lists, or
+        packed float32 BYTES) and (optionally) timestamp columns. Rows whose embedding cannot be part of
+        the matrix are dropped and counted in drop_counts.
+
+        Args:
+            df: Input rows, e.g. a BigQuery query result
+            expected_dim: Embedding dimension; defaults to the most common one
+            dtype: dtype of the embedding matrix
+        """
+        vectors = embedding_column(df)
+        if expected_dim is None:
+            expected_dim = infer_embedding_dim(vectors)
+
+        if is_packed(vectors):
+            matrix, valid, dropped = packed_embedding_matrix(vectors, expected_dim, dtype)
+        else:
+            matrix, valid, dropped = embedding_matrix(vectors, expected_dim, dtype)
+        timestamps = df["timestamp"].to_numpy()[valid] if "timestamp" in df.columns else None
+        return cls(
+            df["case_id"].to_numpy()[valid],
+            matrix,
+            timestamps,
+            drop_counts={reason: int(dropped[reason].sum()) for reason in DROP_REASONS}
+        )
+
+    @classmethod
+    def from_arrow(
+        cls,
+        record_batch,
+        expected_dim: Optional[int] = None,
+        dtype: type = np.float32
+    ) -> "EmbeddingBatch":
+        """
+        Build a batch from an Arrow record batch with case_id, embedding_vector
+        and (optionally) timestamp columns; see from_frame. Timestamps become
+        datetime64[ns] (UTC).
+        """
+        import pyarrow as pa
+
+        names = record_batch.schema.names
+        if "embedding_vector" in names:
+            vectors = record_batch.column(names.index("embedding_vector"))
+        else:
+            vectors = pa.nulls(record_batch.num_rows)
+        if expected_dim is None:
+            expected_dim = infer_arrow_embedding_dim(vectors) if record_batch.num_rows else 0
+
+        matrix, valid, dropped = arrow_embedding_matrix(vectors, expected_dim, dtype)
+        case_ids = record_batch.column(names.index("case_id")).to_numpy(zero_copy_only=False)
+        timestamps = None
+        if "timestamp" in names:
+            timestamps = record_batch.column(names.index("timestamp")).to_numpy(zero_copy_only=False)
+            timestamps = timestamps.astype("datetime64[ns]")[valid]
+        return cls(
+            case_ids[valid],
+            matrix,
+            timestamps,
+            drop_counts={reason: int(dropped[reason].sum()) for reason in DROP_REASONS}
+        )
+
+    @classmethod
+    def concat(cls, batches) -> "EmbeddingBatch":
+        """One batch from several with the same embedding dimension; drop counts are summed."""
+        batches = list(batches)
+        if not batches:
+            raise ValueError("Cannot concatenate an empty sequence of batches")
+        # Empty batches only contribute drop counts (their dimension may be unknown)
+        drop_counts = {}
+        for batch in batches:
+            for reason, count in batch.drop_counts.items():
+                drop_counts[reason] = drop_counts.get(reason, 0) + count
+        batches = [batch for batch in batches if len(batch)] or batches[:1]
+        if len(batches) == 1:
+            return cls(batches[0].case_ids, batches[0].embeddings, batches[0].timestamps, drop_counts)
+        with_timestamps = all(batch.timestamps is not None for batch in batches)
+        return cls(
+            np.concatenate([batch.case_ids for batch in batches]),
+            np.concatenate([np.asarray(batch.embeddings) for batch in batches]),
+            np.concatenate([batch.timestamps for batch in batches]) if with_timestamps else None,
+            drop_counts=drop_counts
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Row-oriented view with an embedding_vector column of row arrays."""
+        df = pd.DataFrame({"case_id": self.case_ids, "embedding_vector": list(np.asarray(self.embeddings))})
+        if self.timestamps is not None:
+            df["timestamp"] = self.timestamps
+        return df
+
+    def take(self, rows: np.ndarray, reason: Optional[str] = None) -> "EmbeddingBatch":
+        """
+        Keep the rows selected by a boolean mask or index array.
+        With a reason, the rows left out are added to drop_counts under it.
+        """
+        kept = EmbeddingBatch(
+            self.case_ids[rows],
+            self.embeddings[rows],
+            self.timestamps[rows] if self.timestamps is not None else None,
+            drop_counts=self.drop_counts
+        )
+        if reason is not None:
+            kept.drop_counts[reason] = kept.drop_counts.get(reason, 0) + len(self) - len(kept)
+        return kept
+
+    def with_embeddings(self, embeddings: EmbeddingMatrix) -> "EmbeddingBatch":
+        """Same cases with a replacement matrix, e.g. a column projection."""
+        return EmbeddingBatch(self.case_ids, embeddings, self.timestamps, drop_counts=self.drop_counts)
+
+    def with_precision(self, precision: str) -> "EmbeddingBatch":
+        """Same cases with the matrix stored as float64, float32, float16 or int8."""
+        return self.with_embeddings(to_precision(np.asarray(self.embeddings), precision))
@@ -0,0 +1,84 @@
+# src/utils/embedding_precision.py
+
+import numpy as np
+from typing import Union
+
+PRECISION_MODES = ("float64", "float32", "float16", "int8")
+
+INT8_LEVELS = 127
+
+
+class QuantizedEmbeddings:
+    """
+    int8 embedding matrix with one float32 scale per dimension (symmetric).
+    Stores a quarter of the float32 bytes. Row slices stay quantized; numpy
+    conversion (np.asarray) dequantizes, so scorers upcast one chunk at a time.
+    """
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray):
+        self.codes = np.asarray(codes, dtype=np.int8)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        if self.codes.ndim != 2 or self.scale.shape != (self.codes.shape[1],):
+            raise ValueError(f"Expected (n, d) codes with d scales, got {self.codes.shape} and {self.scale.shape}")
+
+    @classmethod
+    def from_float(cls, matrix: np.ndarray) -> "QuantizedEmbeddings":
+        """Quantize each dimension to [-127, 127] using its largest magnitude."""
+        matrix = np.asarray(matrix)
+        max_abs = np.abs(matrix).max(axis=0) if len(matrix) else np.zeros(matrix.shape[1])
+        scale = np.where(max_abs > 0, max_abs / INT8_LEVELS, 1.0).astype(np.float32)
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        np.rint(matrix / scale, out=codes, casting="unsafe")
+        return cls(codes, scale)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.codes.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scale.nbytes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, key) -> "QuantizedEmbeddings":
+        if isinstance(key, tuple):
+            rows, columns = key
+            return QuantizedEmbeddings(self.codes[rows, columns], self.scale[columns])
+        return QuantizedEmbeddings(self.codes[key], self.scale)
+
+    def dequantize(self, dtype: type = np.float32) -> np.ndarray:
+        matrix = self.codes.astype(dtype)
+        matrix *= self.scale.astype(dtype)
+        return matrix
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return self.dequantize(dtype or np.float32)
+
+
+EmbeddingMatrix = Union[np.ndarray, QuantizedEmbeddings]
+
+
+def to_precision(matrix: np.ndarray, precision: str) -> EmbeddingMatrix:
+    """
+    Store an embedding matrix at the given precision: float64, float32,
+    float16 (values outside the float16 range are clipped), or int8 with a
+    per-dimension scale.
+    """
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISION_MODES}")
+    if precision == "int8":
+        return QuantizedEmbeddings.from_float(matrix)
+    if precision == "float16":
+        limit = np.finfo(np.float16).max
+        return np.clip(matrix, -limit, limit).astype(np.float16)
+    return np.asarray(matrix, dtype=precision)
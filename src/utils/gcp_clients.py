@@ -0,0 +1,128 @@
+# src/utils/gcp_clients.py
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from config.config import load_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+# Process-wide clients by kind, created on first use
+_clients: Dict[str, Any] = {}
+_session = None
+_lock = threading.RLock()
+
+
+def _gcp_settings() -> dict:
+    return load_config().get("gcp", {})
+
+
+def _authorized_session():
+    """
+    One authorized HTTP session for every client: credentials are discovered
+    once and connections to each API host are pooled and kept alive.
+    """
+    global _session
+    if _session is None:
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        from requests.adapters import HTTPAdapter
+
+        pool_size = int(_gcp_settings().get("http_pool_size", 32))
+        credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+        session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+def _create_bigquery():
+    from google.cloud import bigquery
+    settings = _gcp_settings()
+    session = _authorized_session()
+    return bigquery.Client(
+        project=settings.get("project"),
+        location=settings.get("location"),
+        credentials=session.credentials,
+        _http=session
+    )
+
+
+def _create_storage():
+    from google.cloud import storage
+    session = _authorized_session()
+    return storage.Client(project=_gcp_settings().get("project"), credentials=session.credentials, _http=session)
+
+
+def _create_bigquery_read():
+    from google.cloud import bigquery_storage
+    return bigquery_storage.BigQueryReadClient(credentials=_authorized_session().credentials)
+
+
+_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "bigquery": _create_bigquery,
+    "storage": _create_storage,
+    "bigquery_read": _create_bigquery_read,
+}
+
+
+def get_client(kind: str) -> Any:
+    """
+    Shared client of the given kind (bigquery, storage or bigquery_read),
+    created on first use with the configured gcp.project and gcp.location.
+    """
+    if kind not in _FACTORIES:
+        raise ValueError(f"Unknown client kind {kind!r}, expected one of {sorted(_FACTORIES)}")
+    client = _clients.get(kind)
+    if client is None:
+        with _lock:
+            client = _clients.get(kind)
+            if client is None:
+                client = _FACTORIES[kind]()
+                _clients[kind] = client
+                logger.info(f"Created shared {kind} client")
+    return client
+
+
+def bigquery_client():
+    return get_client("bigquery")
+
+
+def storage_client():
+    return get_client("storage")
+
+
+def bigquery_read_client():
+    return get_client("bigquery_read")
+
+
+def set_client(kind: str, client: Optional[Any]) -> None:
+    """Install a client (e.g. a local stand-in in tests) for a kind; None removes it."""
+    if kind not in _FACTORIES:
+        raise ValueError(f"Unknown client kind {kind!r}, expected one of {sorted(_FACTORIES)}")
+    with _lock:
+        if client is None:
+            _clients.pop(kind, None)
+        else:
+            _clients[kind] = client
+
+
+def reset_clients() -> None:
+    """Drop every shared client and the HTTP session; the next use creates new ones."""
+    global _session
+    with _lock:
+        _clients.clear()
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def parse_gcs_path(path: str) -> Tuple[str, str]:
+    """Split a gs://bucket/object path into (bucket, object)."""
+    bucket, _, blob = path[len("gs://"):].partition("/")
+    if not bucket or not blob:
+        raise ValueError(f"Invalid GCS path {path!r}, expected gs://bucket/object")
+    return bucket, blob
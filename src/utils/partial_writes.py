@@ -0,0 +1,68 @@
+# src/utils/partial_writes.py
+
+import json
+import os
+from datetime import datetime, timezone
+from typing import Optional
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+class PartialWrites:
+    """
+    Markers for runs that failed after some of their streamed chunks were
+    committed to the output table, one small JSON file per partition (or
+    micro-batch window) in a local directory or under a gs:// prefix. A retry
+    that finds a marker scores only the cases not in the output table yet, so
+    the committed chunks are not appended a second time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path.rstrip("/")
+
+    @property
+    def is_gcs(self) -> bool:
+        return self.path.startswith("gs://")
+
+    def _blob(self, key: str):
+        from utils.gcp_clients import parse_gcs_path, storage_client
+        bucket, name = parse_gcs_path(f"{self.path}/{key}.json")
+        return storage_client().bucket(bucket).blob(name)
+
+    def get(self, key: str) -> Optional[dict]:
+        """The marker left by a partially committed run, or None."""
+        if self.is_gcs:
+            blob = self._blob(key)
+            return json.loads(blob.download_as_bytes()) if blob.exists() else None
+        path = os.path.join(self.path, f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def record(self, key: str, **info) -> None:
+        """Leave a marker for a run whose write was only partly committed."""
+        payload = json.dumps({
+            "key": key,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            **info
+        }, indent=2, sort_keys=True)
+        if self.is_gcs:
+            self._blob(key).upload_from_string(payload, content_type="application/json")
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, f"{key}.json"), "w") as f:
+                f.write(payload)
+        logger.warning(f"Recorded partial write {key} in {self.path}")
+
+    def clear(self, key: str) -> None:
+        """Remove the marker once a retry has written the rest."""
+        if self.is_gcs:
+            blob = self._blob(key)
+            if blob.exists():
+                blob.delete()
+        else:
+            path = os.path.join(self.path, f"{key}.json")
+            if os.path.exists(path):
+                os.remove(path)
@@ -32,3 +32,41 @@ def validate_schema(df: pd.DataFrame, schema_path: str) -> None:
             raise TypeError(f"Column '{col}' is not timestamp")
 
     logger.info(f"Schema validated successfully against {schema_path}")
+
+
+def validate_arrow_schema(schema, schema_path: str, packed_columns: tuple = ()) -> None:
+    """
+    Validates an Arrow schema (e.g. of a Storage Read API record batch)
+    against the same expected schema as validate_schema, before decoding:
+    - Required columns exist
+    - Field types are compatible; "list[float]" columns must be lists of
+      floating point values, or binary for the packed_columns
+    """
+    import pyarrow as pa
+
+    with open(schema_path, "r") as f:
+        expected = json.load(f)
+
+    missing_columns = [col for col in expected if col not in schema.names]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    for col, dtype in expected.items():
+        field_type = schema.field(col).type
+        if dtype == "string" and not (pa.types.is_string(field_type) or pa.types.is_large_string(field_type)):
+            raise TypeError(f"Column '{col}' is not string")
+        if dtype == "float" and not pa.types.is_floating(field_type):
+            raise TypeError(f"Column '{col}' is not float")
+        if dtype == "timestamp" and not pa.types.is_timestamp(field_type):
+            raise TypeError(f"Column '{col}' is not timestamp")
+        if dtype == "list[float]":
+            if col in packed_columns:
+                if not (pa.types.is_binary(field_type) or pa.types.is_large_binary(field_type)):
+                    raise TypeError(f"Column '{col}' is not packed binary")
+            elif not (
+                (pa.types.is_list(field_type) or pa.types.is_large_list(field_type))
+                and pa.types.is_floating(field_type.value_type)
+            ):
+                raise TypeError(f"Column '{col}' is not a list of floats")
+
+    logger.info(f"Arrow schema validated successfully against {schema_path}")
@@ -0,0 +1,115 @@
+# src/utils/watermark.py
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+class Watermark:
+    """
+    High-watermark of request_time up to which cases have been scored and
+    written, kept in a small JSON file on local disk or in GCS (gs:// path).
+    It only moves forward, and in GCS the update is conditional on the
+    object generation read, so a concurrent run cannot overwrite a newer value.
+
+    The watermark is on request_time, not on when a row landed in the source
+    tables. A case whose case or embedding row lands after the window covering
+    its request_time was processed is never read by a later micro-batch; see
+    count_late_arrivals in ingestion.load_from_bq.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.value: Optional[datetime] = None
+        self._generation = 0
+        self.load()
+
+    @property
+    def is_gcs(self) -> bool:
+        return self.path.startswith("gs://")
+
+    def load(self) -> Optional[datetime]:
+        """Read the stored watermark (None if there is none yet)."""
+        data = None
+        if self.is_gcs:
+            from utils.gcp_clients import parse_gcs_path, storage_client
+            bucket, name = parse_gcs_path(self.path)
+            blob = storage_client().bucket(bucket).get_blob(name)
+            if blob is not None:
+                data = json.loads(blob.download_as_bytes())
+                self._generation = blob.generation
+        elif os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        self.value = datetime.fromisoformat(data["watermark"]) if data else None
+        return self.value
+
+    def advance(self, to: datetime, **info) -> bool:
+        """
+        Move the watermark forward to `to` and persist it.
+
+        Returns:
+            False if `to` is not past the current value or another run
+            updated the watermark first; True otherwise
+        """
+        if self.value is not None and to <= self.value:
+            logger.warning(f"Watermark {self.value.isoformat()} is already at or past {to.isoformat()}, not moved")
+            return False
+        payload = json.dumps({
+            "watermark": to.isoformat(),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            **info
+        }, indent=2, sort_keys=True)
+
+        if self.is_gcs:
+            from google.api_core.exceptions import PreconditionFailed
+            from utils.gcp_clients import parse_gcs_path, storage_client
+            bucket, name = parse_gcs_path(self.path)
+            blob = storage_client().bucket(bucket).blob(name)
+            try:
+                blob.upload_from_string(payload, content_type="application/json", if_generation_match=self._generation)
+            except PreconditionFailed:
+                logger.warning(f"Watermark {self.path} was updated by another run, not moved")
+                self.load()
+                return False
+            self._generation = blob.generation
+        else:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+
+        logger.info(f"Watermark advanced to {to.isoformat()}")
+        self.value = to
+        return True
+
+
+def next_window(
+    watermark: Optional[datetime],
+    now: datetime,
+    lateness: timedelta,
+    max_window: timedelta,
+    initial_lookback: timedelta
+) -> Optional[Tuple[datetime, datetime]]:
+    """
+    The (start, end] request_time window of the next micro-batch.
+
+    The end stays `lateness` behind now so rows still being written to the
+    source tables are picked up by a later window, and a run that fell behind
+    catches up at most max_window at a time. Rows that land more than
+    `lateness` after their request_time are behind the watermark by then and
+    are left to the daily run.
+
+    Returns:
+        (start, end), or None when there is nothing new to process yet
+    """
+    start = watermark if watermark is not None else now - initial_lookback
+    end = min(now - lateness, start + max_window)
+    if end <= start:
+        return None
+    return start, end
@@ -0,0 +1,50 @@
+"""
+Tests for the multi-day backfill runner
+"""
+
+import pytest
+import json
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.backfill import BackfillCheckpoint, partition_dates, run_backfill
+
+
+def test_partition_dates_inclusive_range():
+    """Test the date range covers both ends and crosses month boundaries"""
+    assert partition_dates("20250130", "20250202") == ["20250130", "20250131", "20250201", "20250202"]
+    assert partition_dates("20250101", "20250101") == ["20250101"]
+    with pytest.raises(ValueError):
+        partition_dates("20250102", "20250101")
+
+
+def test_backfill_resumes_from_checkpoint(tmp_path):
+    """Test failed partitions are recorded and only they are rerun on resume"""
+    path = str(tmp_path / "checkpoint.json")
+    dates = partition_dates("20250101", "20250106")
+    calls = []
+
+    def flaky(partition_date):
+        calls.append(partition_date)
+        if partition_date == "20250103":
+            raise RuntimeError("query failed")
+        return 10
+
+    outcome = run_backfill(dates, flaky, BackfillCheckpoint(path, "v1"), max_parallel=3)
+    assert outcome["failed"] == ["20250103"]
+    assert len(outcome["completed"]) == 5
+    with open(path) as f:
+        saved = json.load(f)
+    assert "20250103" in saved["failed"] and "20250103" not in saved["completed"]
+
+    calls.clear()
+    outcome = run_backfill(dates, lambda d: calls.append(d) or 10, BackfillCheckpoint(path, "v1"), max_parallel=3)
+    assert calls == ["20250103"]
+    assert outcome["skipped"] == [d for d in dates if d != "20250103"]
+    assert BackfillCheckpoint(path, "v1").pending(dates) == []
+
+    # A checkpoint from another model version does not apply
+    assert BackfillCheckpoint(path, "v2").pending(dates) == dates
@@ -0,0 +1,82 @@
+"""
+Tests for drift detection
+"""
+
+import pytest
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from monitoring.drift_detector import DriftState, check_drift, compare_to_reference, profile_run
+
+
+def test_drift_state_merge_matches_single_pass():
+    """Test chunked states merge to the same statistics as one pass"""
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(1000, 6))
+    whole = DriftState.with_quantile_edges(matrix).update(matrix)
+
+    merged = DriftState(whole.edges)
+    for chunk in np.array_split(matrix, 7):
+        merged.merge(DriftState(whole.edges).update(chunk))
+
+    assert merged.count == 1000
+    np.testing.assert_allclose(merged.mean, matrix.mean(axis=0))
+    np.testing.assert_allclose(merged.variance, matrix.var(axis=0))
+    np.testing.assert_array_equal(merged.histogram, whole.histogram)
+    assert (whole.histogram.sum(axis=1) == 1000).all()
+
+
+def test_psi_flags_shifted_dimensions():
+    """Test PSI stays near zero for the same distribution and flags a shifted dimension"""
+    rng = np.random.default_rng(0)
+    reference = profile_run(rng.normal(size=(5000, 4)), confidence=rng.uniform(0.5, 1.0, 5000))
+
+    same = profile_run(rng.normal(size=(5000, 4)), reference=reference)
+    assert compare_to_reference(same, reference)["psi_max"] < 0.05
+
+    shifted_matrix = rng.normal(size=(5000, 4))
+    shifted_matrix[:, 2] += 1.5
+    summary = compare_to_reference(
+        profile_run(shifted_matrix, confidence=rng.uniform(0.0, 0.5, 5000), reference=reference),
+        reference
+    )
+    assert summary["dims_shifted"] == 1
+    assert list(summary["top_dims"])[0] == 2
+    assert summary["confidence_psi"] > 1.0
+
+
+def test_check_drift_bootstraps_reference(tmp_path):
+    """Test a run only becomes the reference when asked to, and later runs are compared to it"""
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "drift_reference.json")
+    matrix = rng.normal(size=(500, 3))
+    confidence = rng.uniform(size=500)
+    labels = rng.choice(["a", "b"], size=500)
+
+    assert check_drift(matrix, confidence, labels, path)["status"] == "skipped"
+    assert check_drift(matrix, confidence, labels, path, save_reference_if_missing=True)["status"] == "reference_created"
+    summary = check_drift(matrix, confidence, labels, path, save_reference_if_missing=True)
+    assert summary["status"] == "compared"
+    assert summary["psi_max"] == pytest.approx(0.0, abs=1e-9)
+    assert summary["label_psi"] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_save_reference_profile_does_not_replace_existing(tmp_path):
+    """Test saving without overwrite keeps the first reference and leaves no temporary files"""
+    from monitoring.drift_detector import load_reference_profile, save_reference_profile
+
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "drift_reference.json")
+    first = profile_run(rng.normal(size=(200, 3)))
+    second = profile_run(rng.normal(loc=5.0, size=(300, 3)))
+
+    assert save_reference_profile(first, path, overwrite=False)
+    assert not save_reference_profile(second, path, overwrite=False)
+    assert load_reference_profile(path).count == 200
+    assert save_reference_profile(second, path)
+    assert load_reference_profile(path).count == 300
+    assert os.listdir(tmp_path) == ["drift_reference.json"]
@@ -0,0 +1,49 @@
+"""
+Tests for the shared Google Cloud client provider
+"""
+
+import pytest
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import utils.gcp_clients as gcp_clients
+
+
+@pytest.fixture(autouse=True)
+def clean_clients():
+    gcp_clients.reset_clients()
+    yield
+    gcp_clients.reset_clients()
+
+
+def test_client_created_once_and_shared(monkeypatch):
+    """Test concurrent callers share one lazily created client per kind"""
+    factory = Mock(side_effect=lambda: object())
+    monkeypatch.setitem(gcp_clients._FACTORIES, "bigquery", factory)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: gcp_clients.bigquery_client(), range(32)))
+
+    assert factory.call_count == 1
+    assert all(c is clients[0] for c in clients)
+
+    gcp_clients.reset_clients()
+    assert gcp_clients.bigquery_client() is not clients[0]
+    assert factory.call_count == 2
+
+
+def test_set_client_installs_stand_in():
+    """Test an installed client is returned without creating one, and None removes it"""
+    stand_in = Mock()
+    gcp_clients.set_client("storage", stand_in)
+    assert gcp_clients.storage_client() is stand_in
+
+    gcp_clients.set_client("storage", None)
+    assert "storage" not in gcp_clients._clients
+    with pytest.raises(ValueError):
+        gcp_clients.get_client("spanner")
@@ -0,0 +1,333 @@
+"""
+Tests for the inference layer
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from inference.classifier_interface import predict, predict_many
+from inference.predict_intent import predict_batch
+
+
+def test_predict_many_matches_predict(sample_embeddings):
+    """Test batch scoring agrees with single-row predict"""
+    case_ids = [f"CASE_{i:06d}" for i in range(len(sample_embeddings))]
+    df_preds = predict_many(sample_embeddings, case_ids)
+
+    assert len(df_preds) == len(sample_embeddings)
+    assert list(df_preds["case_id"]) == case_ids
+    for i, embedding in enumerate(sample_embeddings):
+        single = predict(embedding)
+        assert df_preds["predicted_label"].iloc[i] == single["predicted_label"]
+        assert df_preds["confidence"].iloc[i] == pytest.approx(single["confidence"], rel=1e-5)
+
+
+def test_predict_many_rejects_mismatched_ids(sample_embeddings):
+    """Test batch scoring requires one case id per row"""
+    with pytest.raises(ValueError):
+        predict_many(sample_embeddings, ["CASE_000001"])
+
+
+def test_predict_batch_preserves_order(sample_data):
+    """Test chunked batch prediction keeps input order"""
+    df_preds = predict_batch(sample_data, chunk_size=7)
+
+    assert len(df_preds) == len(sample_data)
+    assert list(df_preds["case_id"]) == list(sample_data["case_id"])
+    assert (df_preds["timestamp"].to_numpy() == sample_data["timestamp"].to_numpy()).all()
+
+
+@pytest.mark.parametrize("model_path", ["src/models/model.joblib", "src/models/pcc_v0.1.1.pkl"])
+def test_linear_kernel_matches_sklearn(model_path, sample_embeddings):
+    """Test NumPy kernel probabilities agree with sklearn for shipped models"""
+    import joblib
+    from inference.linear_kernel import LinearKernel
+
+    classifier = joblib.load(model_path)
+    kernel = LinearKernel.from_estimator(classifier)
+    assert kernel is not None
+
+    expected = classifier.predict_proba(sample_embeddings)
+    actual = kernel.predict_proba(sample_embeddings)
+    np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-5)
+    assert (kernel.classes_[actual.argmax(axis=1)] == classifier.predict(sample_embeddings)).all()
+
+
+def test_linear_kernel_matches_sklearn_multinomial():
+    """Test NumPy kernel softmax path agrees with sklearn"""
+    from sklearn.linear_model import LogisticRegression
+    from inference.linear_kernel import LinearKernel
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 16))
+    y = rng.choice(["a", "b", "c"], size=200)
+    classifier = LogisticRegression(max_iter=500).fit(X, y)
+
+    kernel = LinearKernel.from_estimator(classifier)
+    assert kernel.multinomial
+    np.testing.assert_allclose(
+        kernel.predict_proba(X), classifier.predict_proba(X), rtol=1e-4, atol=1e-5
+    )
+
+
+def test_linear_kernel_falls_back_for_non_linear():
+    """Test non-linear classifiers are not compiled"""
+    from sklearn.tree import DecisionTreeClassifier
+    from inference.linear_kernel import LinearKernel
+
+    classifier = DecisionTreeClassifier().fit(np.eye(3), ["a", "b", "c"])
+    assert LinearKernel.from_estimator(classifier) is None
+
+
+def test_linear_kernel_rejects_wrong_dimensions():
+    """Test NumPy kernel validates the feature count"""
+    import joblib
+    from inference.linear_kernel import LinearKernel
+
+    kernel = LinearKernel.from_estimator(joblib.load("src/models/model.joblib"))
+    with pytest.raises(ValueError):
+        kernel.predict_proba(np.zeros((2, 10)))
+
+
+def test_predict_batch_parallel_matches_sequential(sample_data):
+    """Test sharded multi-process prediction matches the single-process result"""
+    sequential = predict_batch(sample_data, chunk_size=16)
+    parallel = predict_batch(sample_data, chunk_size=16, workers=2)
+
+    assert list(parallel["case_id"]) == list(sequential["case_id"])
+    assert list(parallel["predicted_label"]) == list(sequential["predicted_label"])
+    np.testing.assert_allclose(parallel["confidence"], sequential["confidence"])
+
+
+def test_predict_batch_reports_failed_shards(sample_data):
+    """Test a failing shard is dropped without losing the others"""
+    from unittest.mock import patch
+    import inference.predict_intent as predict_intent
+
+    def flaky_predict_many(matrix, case_ids, model=None):
+        if "CASE_000000" in list(case_ids):
+            raise RuntimeError("boom")
+        return predict_many(matrix, case_ids, model=model)
+
+    with patch.object(predict_intent, "predict_many", side_effect=flaky_predict_many):
+        df_preds = predict_batch(sample_data, chunk_size=10, workers=2)
+
+    assert len(df_preds) == len(sample_data) - 10
+    assert list(df_preds["case_id"]) == list(sample_data["case_id"].iloc[10:])
+
+
+def test_concurrent_predict_batch_calls_keep_their_batches(sample_data):
+    """Test predict_batch calls on concurrent threads each score only their own cases"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    batches = []
+    for prefix in ("A", "B", "C"):
+        df = pd.concat([sample_data] * 20, ignore_index=True)
+        df["case_id"] = [f"{prefix}_{i:06d}" for i in range(len(df))]
+        batches.append(df)
+    expected = predict_batch(sample_data, chunk_size=50)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(
+            lambda args: predict_batch(args[0], chunk_size=50, workers=args[1]),
+            zip(batches, (1, 2, 1))
+        ))
+
+    for df, df_preds in zip(batches, results):
+        assert list(df_preds["case_id"]) == list(df["case_id"])
+        assert list(df_preds["predicted_label"]) == list(expected["predicted_label"]) * 20
+
+
+def test_model_swap_mid_batch_does_not_split_the_batch(sample_data):
+    """Test a model activated while a batch scores only applies to later batches"""
+    from inference.classifier_interface import ensure_model_loaded, get_registry
+
+    registry = get_registry()
+    champion = ensure_model_loaded()
+    registry.load({"classifier_path": "src/models/model.joblib", "model_version": "v_swapped", "metadata_path": None})
+
+    def swap(start, end, preds):
+        registry.activate("v_swapped")
+
+    try:
+        df_preds = predict_batch(sample_data, chunk_size=10, on_chunk=swap)
+        assert set(df_preds["model_version"]) == {champion.version}
+        assert predict_batch(sample_data.iloc[:5])["model_version"].iloc[0] == "v_swapped"
+    finally:
+        registry.activate(champion.version)
+
+
+def test_linear_kernel_mmap_roundtrip(tmp_path, sample_embeddings):
+    """Test the exported kernel memory-maps and scores like the original"""
+    import joblib
+    from inference.linear_kernel import LinearKernel
+
+    model_path = "src/models/model.joblib"
+    kernel = LinearKernel.from_estimator(joblib.load(model_path))
+    kernel_dir = str(tmp_path / "model_kernel")
+    kernel.save(kernel_dir, source_path=model_path)
+
+    loaded = LinearKernel.load(kernel_dir, mmap_mode="r")
+    # Weights are a view onto the mapped file, not an in-memory copy
+    assert not loaded.weights.flags.owndata
+    assert loaded.is_exported_from(model_path)
+    assert list(loaded.classes_) == list(kernel.classes_)
+    np.testing.assert_array_equal(
+        loaded.predict_proba(sample_embeddings), kernel.predict_proba(sample_embeddings)
+    )
+
+
+def test_linear_kernel_detects_stale_export(tmp_path):
+    """Test a kernel is not reused once its source model changes"""
+    import joblib
+    from inference.linear_kernel import LinearKernel
+
+    model_path = str(tmp_path / "model.joblib")
+    joblib.dump(joblib.load("src/models/pcc_v0.1.1.pkl"), model_path)
+    kernel = LinearKernel.from_estimator(joblib.load(model_path))
+    kernel.save(str(tmp_path / "model_kernel"), source_path=model_path)
+
+    with open(model_path, "ab") as f:
+        f.write(b"\0")
+    loaded = LinearKernel.load(str(tmp_path / "model_kernel"))
+    assert not loaded.is_exported_from(model_path)
+
+
+def test_stacked_predict_proba_matches_individual_kernels(sample_embeddings):
+    """Test one stacked matmul scores each kernel like scoring it alone"""
+    import joblib
+    from inference.linear_kernel import LinearKernel, stacked_predict_proba
+
+    champion = LinearKernel.from_estimator(joblib.load("src/models/model.joblib"))
+    rng = np.random.default_rng(0)
+    challenger = LinearKernel(
+        rng.normal(scale=0.05, size=(champion.n_features, 1)), [0.1], ["no", "yes"], multinomial=True
+    )
+
+    stacked = stacked_predict_proba([champion, challenger], sample_embeddings)
+    np.testing.assert_allclose(stacked[0], champion.predict_proba(sample_embeddings), rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(stacked[1], challenger.predict_proba(sample_embeddings), rtol=1e-4, atol=1e-6)
+
+
+def test_predict_batch_shadow_scores_challengers(sample_data):
+    """Test shadow scoring leaves champion output unchanged and compares challengers"""
+    from inference.classifier_interface import load_challengers
+    from inference.predict_intent import predict_batch_shadow, summarize_challengers
+
+    challengers = load_challengers([
+        {"classifier_path": "src/models/model.joblib", "model_version": "challenger-test"}
+    ])
+    assert [c.version for c in challengers] == ["challenger-test"]
+
+    champion, shadow = predict_batch_shadow(sample_data, challengers, chunk_size=16, workers=2)
+    expected = predict_batch(sample_data, chunk_size=16)
+    assert list(champion["predicted_label"]) == list(expected["predicted_label"])
+    assert len(shadow) == len(sample_data)
+    assert list(shadow["case_id"]) == list(sample_data["case_id"])
+
+    summary = summarize_challengers(shadow)["challenger-test"]
+    assert summary["cases"] == len(sample_data)
+    assert summary["label_agreement"] == 1.0
+    assert summary["mean_abs_confidence_delta"] < 1e-4
+
+
+def test_challenger_failure_keeps_champion_predictions(sample_data):
+    """Test a challenger that cannot be scored only loses its shadow rows"""
+    from inference.classifier_interface import ensure_model_loaded
+    from inference.linear_kernel import LinearKernel
+    from inference.model_registry import ModelHandle
+    from inference.predict_intent import predict_batch_shadow
+
+    champion = ensure_model_loaded()
+    n_classes = len(champion.scorer.classes_)
+    broken = ModelHandle(
+        "challenger-broken", champion.embedding_model,
+        kernel=LinearKernel(np.zeros((3, n_classes)), np.zeros(n_classes), champion.scorer.classes_)
+    )
+
+    preds, shadow = predict_batch_shadow(sample_data, [broken], chunk_size=16)
+    expected = predict_batch(sample_data, chunk_size=16)
+    assert list(preds["case_id"]) == list(expected["case_id"])
+    assert list(preds["predicted_label"]) == list(expected["predicted_label"])
+    assert len(shadow) == 0
+
+
+def test_load_challengers_checks_compatibility(tmp_path):
+    """Test challengers with other features are skipped and kernels take the champion's dtype"""
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from inference.classifier_interface import _compatible_challenger, ensure_model_loaded, load_challengers
+    from inference.linear_kernel import LinearKernel
+    from inference.model_registry import ModelHandle
+
+    champion = ensure_model_loaded()
+    X = np.random.default_rng(0).normal(size=(40, 5))
+    narrow = LogisticRegression().fit(X, np.array(champion.scorer.classes_)[np.arange(40) % 2])
+    joblib.dump(narrow, tmp_path / "narrow.joblib")
+    assert load_challengers([
+        {"classifier_path": str(tmp_path / "narrow.joblib"), "model_version": "challenger-narrow"}
+    ]) == []
+
+    classifier = joblib.load("src/models/model.joblib")
+    float64_champion = ModelHandle("champion", "m", classifier, LinearKernel.from_estimator(classifier, dtype=np.float64))
+    float32_challenger = ModelHandle("challenger", "m", classifier, LinearKernel.from_estimator(classifier))
+    compatible = _compatible_challenger(float64_champion, float32_challenger)
+    assert compatible.kernel.dtype == np.float64
+    assert compatible.version == "challenger"
+
+
+def test_predict_batch_accepts_embedding_batch(sample_data):
+    """Test an EmbeddingBatch scores like the equivalent DataFrame"""
+    from utils.embedding_batch import EmbeddingBatch
+
+    expected = predict_batch(sample_data, chunk_size=16)
+    actual = predict_batch(EmbeddingBatch.from_frame(sample_data), chunk_size=16, workers=2)
+
+    assert list(actual["case_id"]) == list(expected["case_id"])
+    assert list(actual["predicted_label"]) == list(expected["predicted_label"])
+    assert (actual["timestamp"].to_numpy() == expected["timestamp"].to_numpy()).all()
+
+
+def test_reduced_precision_scoring_parity(sample_data):
+    """Test reduced-precision batches score in parity with float64"""
+    from utils.embedding_batch import EmbeddingBatch
+    from inference.classifier_interface import precision_parity_report
+
+    batch = EmbeddingBatch.from_frame(sample_data, dtype=np.float64)
+    report = precision_parity_report(batch.embeddings)
+    for precision in ("float32", "float16", "int8"):
+        assert report["precisions"][precision]["label_agreement"] >= 0.98
+    assert report["precisions"]["int8"]["bytes_per_case"] < report["precisions"]["float32"]["bytes_per_case"] / 3
+
+    expected = predict_batch(batch, chunk_size=16)
+    quantized = predict_batch(batch.with_precision("int8"), chunk_size=16, workers=2)
+    assert list(quantized["case_id"]) == list(expected["case_id"])
+    assert (quantized["predicted_label"] == expected["predicted_label"]).mean() >= 0.98
+
+
+
+def test_challenger_cannot_take_the_champion_version(tmp_path, monkeypatch):
+    """Test a challenger keeps its configured version and never replaces the champion's registry entry"""
+    import json
+    import inference.model_registry as model_registry
+    from inference.classifier_interface import ensure_model_loaded, get_registry, load_challengers
+
+    champion = ensure_model_loaded()
+    metadata_path = tmp_path / "metadata.json"
+    metadata_path.write_text(json.dumps({"model_version": champion.version}))
+    monkeypatch.setattr(model_registry, "DEFAULT_METADATA_PATH", str(metadata_path))
+    handles = load_challengers([
+        {"classifier_path": "src/models/model.joblib", "model_version": "challenger-v2"},
+        {"classifier_path": "src/models/model.joblib", "model_version": champion.version},
+        {"classifier_path": "src/models/model.joblib"}
+    ])
+
+    assert [handle.version for handle in handles] == ["challenger-v2"]
+    assert get_registry().get(champion.version) is champion
+    assert get_registry().active() is champion
@@ -0,0 +1,183 @@
+"""
+Tests for BigQuery partition loading
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+import re
+import sys
+import os
+from unittest.mock import Mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ingestion.load_from_bq import partition_query, read_partition_batch
+
+
+def test_partition_query_shards_by_case_number():
+    """Test shard queries filter on a hash of case_number and keep the day filter"""
+    query = partition_query("p.d.cases", "p.d.embeddings", "20250101", shard=(2, 4))
+    assert 'DATE(c.core.request_time) = "2025-01-01"' in query
+    assert "ABS(MOD(FARM_FINGERPRINT(CAST(c.core.case_number AS STRING)), 4)) = 2" in query
+    assert "LIMIT" not in query
+    assert "FARM_FINGERPRINT" not in partition_query("p.d.cases", "p.d.embeddings", "20250101", limit=10)
+
+
+def test_sharded_read_reassembles_in_case_order(sample_data, monkeypatch):
+    """Test shards are read concurrently and reassembled in a deterministic order"""
+    import ingestion.load_from_bq as load_from_bq
+    import monitoring.query_costs as query_costs
+    monkeypatch.setitem(load_from_bq.config["bq"], "source_table", "p.d.cases")
+    monkeypatch.setitem(load_from_bq.config["bq"], "embedding_table", "p.d.embeddings")
+    monkeypatch.setitem(query_costs.config, "query_budget", {"enabled": False})
+
+    shuffled = sample_data.sample(frac=1, random_state=0)
+    shard_of = {case_id: i % 3 for i, case_id in enumerate(sample_data["case_id"])}
+
+    def query(sql, **kwargs):
+        count, index = map(int, re.search(r", (\d+)\)\) = (\d+)", sql).groups())
+        result = Mock()
+        result.to_dataframe.return_value = shuffled[[shard_of[c] == index for c in shuffled["case_id"]]]
+        return result
+
+    client = Mock()
+    client.query.side_effect = query
+    batch = read_partition_batch("20250101", expected_dim=584, client=client, storage_read=False, n_shards=3)
+
+    assert client.query.call_count == 3
+    # Shard by shard, each in case id order
+    assert list(batch.case_ids) == sorted(sample_data["case_id"], key=lambda c: (shard_of[c], c))
+    expected = np.array(sample_data.set_index("case_id").loc[batch.case_ids, "embedding_vector"].tolist())
+    assert np.allclose(batch.embeddings, expected, atol=1e-6)
+
+
+def test_incremental_load_anti_joins_scored_cases(sample_data, monkeypatch):
+    """Test incremental loads push an anti-join on the output table into the query"""
+    import ingestion.load_from_bq as load_from_bq
+    from ingestion.load_from_bq import load_partitioned_data
+    monkeypatch.setitem(load_from_bq.config["bq"], "source_table", "p.d.cases")
+    monkeypatch.setitem(load_from_bq.config["bq"], "embedding_table", "p.d.embeddings")
+    monkeypatch.setitem(load_from_bq.config["bq"], "output_table", "p.d.output")
+    monkeypatch.setitem(load_from_bq.config["bq"], "read_shards", 1)
+    monkeypatch.setitem(load_from_bq.config["bq"], "storage_read_api", False)
+
+    client = Mock()
+    client.query.return_value.to_dataframe.return_value = sample_data.iloc[:5]
+    monkeypatch.setattr(load_from_bq, "bigquery_client", Mock(return_value=client))
+    batch = load_partitioned_data(
+        "20250101", as_batch=True, expected_dim=584, use_cache=False, skip_scored_version="v2"
+    )
+
+    sql = client.query.call_args[0][0]
+    assert "NOT EXISTS" in sql
+    assert "FROM `p.d.output` AS o" in sql
+    assert 'o.model_version = "v2"' in sql
+    assert 'DATE(o.ingestion_time) >= "2025-01-01"' in sql
+    assert len(batch) == 5
+
+
+def test_packed_query_selects_float32_bytes():
+    """Test packed queries declare the packing UDF and select BYTES embeddings"""
+    query = partition_query("p.d.cases", "p.d.embeddings", "20250101", shard=(0, 2), packed=True)
+    assert query.lstrip().startswith("CREATE TEMP FUNCTION pack_float32(v ARRAY<FLOAT64>)")
+    assert (
+        "IF(e.embeddings_allminilm IS NULL, NULL, pack_float32(e.embeddings_allminilm)) AS embedding_vector"
+        in query
+    )
+    assert "FARM_FINGERPRINT" in query
+    assert "pack_float32" not in partition_query("p.d.cases", "p.d.embeddings", "20250101")
+
+
+def test_window_query_filters_request_time():
+    """Test micro-batch windows replace the day filter with a request_time range"""
+    from datetime import datetime, timezone
+    window = (datetime(2025, 1, 1, 23, tzinfo=timezone.utc), datetime(2025, 1, 2, 1, tzinfo=timezone.utc))
+    query = partition_query("p.d.cases", "p.d.embeddings", "20250102", window=window, exclude_scored=("p.d.output", "v2"))
+    assert 'DATE(c.core.request_time) BETWEEN "2025-01-01" AND "2025-01-02"' in query
+    assert 'c.core.request_time > TIMESTAMP("2025-01-01 23:00:00.000000+00")' in query
+    assert 'c.core.request_time <= TIMESTAMP("2025-01-02 01:00:00.000000+00")' in query
+    assert 'DATE(o.ingestion_time) >= "2025-01-01"' in query
+    assert 'DATE(c.core.request_time) = ' not in query
+
+
+def test_storage_read_is_capped_per_shard(monkeypatch):
+    """Test the Storage Read API row cap is split over the shard queries"""
+    import ingestion.load_from_bq as load_from_bq
+    import monitoring.query_costs as query_costs
+    monkeypatch.setitem(load_from_bq.config["bq"], "source_table", "p.d.cases")
+    monkeypatch.setitem(load_from_bq.config["bq"], "embedding_table", "p.d.embeddings")
+    monkeypatch.setitem(query_costs.config, "query_budget", {"enabled": False})
+    monkeypatch.setattr(load_from_bq, "_storage_read_client", lambda: None)
+
+    client = Mock()
+    client.query.return_value.result.return_value.to_arrow_iterable.side_effect = lambda **kwargs: iter([])
+    batch = read_partition_batch(
+        "20250101", expected_dim=584, client=client, storage_read=True, n_shards=2, max_rows=1001
+    )
+
+    assert len(batch) == 0
+    assert client.query.call_count == 2
+    # One row past each shard's share, to tell a shard at the cap from a truncated one
+    assert all("LIMIT 502" in call[0][0] for call in client.query.call_args_list)
+
+
+def test_storage_read_over_the_cap_raises(monkeypatch):
+    """Test a partition over the Storage Read API row cap fails instead of being truncated"""
+    import ingestion.load_from_bq as load_from_bq
+    from utils.embedding_batch import EmbeddingBatch
+    monkeypatch.setattr(load_from_bq, "stream_partitioned_data", lambda *args, **kwargs: iter([
+        EmbeddingBatch(np.array([f"c{i}" for i in range(11)]), np.zeros((11, 4), dtype=np.float32))
+    ]))
+
+    with pytest.raises(RuntimeError, match="more than 10 rows"):
+        read_partition_batch("20250101", expected_dim=4, client=Mock(), storage_read=True, max_rows=10)
+    assert len(read_partition_batch("20250101", expected_dim=4, client=Mock(), storage_read=True, max_rows=11)) == 11
+
+
+def test_arrow_schema_is_validated_before_decoding():
+    """Test Storage Read API record batches are checked against the input schema"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pytest.skip("pyarrow is not available")
+    from utils.schema_validator import validate_arrow_schema
+
+    fields = {"case_id": pa.string(), "embedding_vector": pa.list_(pa.float64()), "timestamp": pa.timestamp("us", tz="UTC")}
+    validate_arrow_schema(pa.schema(fields), "schemas/input_schema.json")
+    validate_arrow_schema(
+        pa.schema({**fields, "embedding_vector": pa.binary()}), "schemas/input_schema.json",
+        packed_columns=("embedding_vector",)
+    )
+
+    with pytest.raises(ValueError):
+        validate_arrow_schema(pa.schema({"case_id": pa.string()}), "schemas/input_schema.json")
+    with pytest.raises(TypeError):
+        validate_arrow_schema(pa.schema({**fields, "embedding_vector": pa.list_(pa.string())}), "schemas/input_schema.json")
+    with pytest.raises(TypeError):
+        validate_arrow_schema(pa.schema({**fields, "embedding_vector": pa.binary()}), "schemas/input_schema.json")
+    with pytest.raises(TypeError):
+        validate_arrow_schema(pa.schema({**fields, "case_id": pa.int64()}), "schemas/input_schema.json")
+
+
+def test_late_arrivals_count_unscored_cases_behind_the_watermark(monkeypatch):
+    """Test the late-arrival count anti-joins the window on the output table under any model version"""
+    from datetime import datetime, timezone
+    from types import SimpleNamespace
+    import ingestion.load_from_bq as load_from_bq
+    import monitoring.query_costs as query_costs
+    monkeypatch.setitem(load_from_bq.config["bq"], "source_table", "p.d.cases")
+    monkeypatch.setitem(load_from_bq.config["bq"], "embedding_table", "p.d.embeddings")
+    monkeypatch.setitem(load_from_bq.config["bq"], "output_table", "p.d.output")
+    monkeypatch.setitem(query_costs.config, "query_budget", {"enabled": False})
+
+    client = Mock()
+    client.query.return_value.result.return_value = iter([SimpleNamespace(late_rows=4)])
+    window = (datetime(2025, 1, 1, 12, tzinfo=timezone.utc), datetime(2025, 1, 2, 12, tzinfo=timezone.utc))
+    assert load_from_bq.count_late_arrivals(window, client=client) == 4
+
+    sql = client.query.call_args[0][0]
+    assert 'c.core.request_time <= TIMESTAMP("2025-01-02 12:00:00.000000+00")' in sql
+    assert "FROM `p.d.output` AS o" in sql
+    assert "model_version" not in sql
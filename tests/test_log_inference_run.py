@@ -0,0 +1,55 @@
+"""
+Tests for the monitoring log writer
+"""
+
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import monitoring.log_inference_run as log_inference_run
+from utils.gcp_clients import reset_clients, set_client
+
+
+@pytest.fixture
+def bq_client(monkeypatch):
+    monkeypatch.setitem(log_inference_run.config["runtime"], "dry_run", False)
+    monkeypatch.setattr(log_inference_run, "_table_columns", {})
+    client = Mock()
+    client.insert_rows_json.return_value = []
+    set_client("bigquery", client)
+    yield client
+    reset_clients()
+
+
+def _schema(*names):
+    return SimpleNamespace(schema=[SimpleNamespace(name=name) for name in names])
+
+
+def _log_run():
+    return log_inference_run.log_inference_run(
+        "2025-01-01", "v1", "all-MiniLM-L6-v2", 10, 10, 0,
+        table="p.d.monitoring", run_metrics={"write": {"verified": True}}
+    )
+
+
+def test_run_metrics_is_omitted_before_the_migration(bq_client):
+    """Test a monitoring table without run_metrics still gets the run logged"""
+    bq_client.get_table.return_value = _schema("run_id", "status")
+    assert _log_run()
+    assert _log_run()
+    row = bq_client.insert_rows_json.call_args.args[1][0]
+    assert "run_metrics" not in row
+    assert bq_client.get_table.call_count == 1
+
+
+def test_run_metrics_is_sent_after_the_migration(bq_client):
+    """Test run_metrics is inserted as JSON once the table has the column"""
+    bq_client.get_table.return_value = _schema("run_id", "status", "run_metrics")
+    assert _log_run()
+    row = bq_client.insert_rows_json.call_args.args[1][0]
+    assert row["run_metrics"] == '{"write": {"verified": true}}'
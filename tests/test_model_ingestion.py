@@ -16,6 +16,7 @@ from ingestion.load_model_from_gcs import (
     get_latest_model_folder,
     check_today_model_exists,
     download_model_from_gcs,
+    export_model_kernel,
     update_config_with_model_info
 )
 
@@ -34,7 +35,7 @@ class TestModelIngestion:
     @pytest.fixture
     def mock_storage_client(self):
         """Mock Google Cloud Storage client."""
-        with patch('ingestion.load_model_from_gcs.storage.Client') as mock_client:
+        with patch('ingestion.load_model_from_gcs.storage_client') as mock_client:
             # Mock bucket and blob operations
             mock_bucket = Mock()
             mock_client.return_value.bucket.return_value = mock_bucket
@@ -222,6 +223,25 @@ class TestModelIngestion:
         assert success is False
         assert model_path == ""
 
+    def test_export_model_kernel(self, temp_models_dir):
+        """Test linear models are exported as a memory-mappable kernel."""
+        import joblib
+        from inference.linear_kernel import LinearKernel, KERNEL_METADATA_FILE
+        
+        source_path = "src/models/model.joblib"
+        kernel_dir = os.path.join(temp_models_dir, "model_kernel")
+        
+        assert export_model_kernel(joblib.load(source_path), source_path, kernel_dir) is True
+        assert os.path.exists(os.path.join(kernel_dir, KERNEL_METADATA_FILE))
+        assert LinearKernel.load(kernel_dir).is_exported_from(source_path)
+    
+    def test_export_model_kernel_skips_non_linear(self, temp_models_dir):
+        """Test non-linear models are not exported."""
+        kernel_dir = os.path.join(temp_models_dir, "model_kernel")
+        
+        assert export_model_kernel(Mock(), "model.joblib", kernel_dir) is False
+        assert not os.path.exists(kernel_dir)
+
 
 def test_model_ingestion_integration():
     """
@@ -250,7 +270,7 @@ def test_model_ingestion_integration():
     
     try:
         # Mock Google Cloud Storage
-        with patch('ingestion.load_model_from_gcs.storage.Client') as mock_client:
+        with patch('ingestion.load_model_from_gcs.storage_client') as mock_client:
             # Setup mock storage
             mock_bucket = Mock()
             mock_client.return_value.bucket.return_value = mock_bucket
@@ -0,0 +1,73 @@
+"""
+Tests for the model registry
+"""
+
+import json
+import threading
+import pytest
+import numpy as np
+import sys
+import os
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import joblib
+from inference.model_registry import ModelRegistry
+
+
+def _models_config(tmp_path, version, model_path="src/models/model.joblib"):
+    """Write a metadata file for `version` and return a models config section."""
+    metadata_path = tmp_path / f"metadata_{version}.json"
+    metadata_path.write_text(json.dumps({"model_version": version, "classifier": "LogisticRegression"}))
+    return {
+        "classifier_path": model_path,
+        "metadata_path": str(metadata_path),
+        "embedding_model": "all-MiniLM-L6-v2"
+    }
+
+
+def test_concurrent_callers_load_once(tmp_path):
+    """Test concurrent first calls trigger a single load"""
+    registry = ModelRegistry()
+    registry._models_config = _models_config(tmp_path, "v1")
+
+    with patch("inference.model_registry.joblib.load", wraps=joblib.load) as mock_load:
+        threads = [threading.Thread(target=registry.ensure_active) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert mock_load.call_count == 1
+    assert registry.active_version == "v1"
+
+
+def test_background_swap_keeps_in_flight_model(tmp_path):
+    """Test a background load swaps atomically while holders keep the old version"""
+    registry = ModelRegistry()
+    registry._models_config = _models_config(tmp_path, "v1")
+    in_flight = registry.ensure_active()
+
+    future = registry.load_async(_models_config(tmp_path, "v2", "src/models/pcc_v0.1.1.pkl"))
+    handle = future.result(timeout=30)
+
+    assert handle.version == "v2"
+    assert registry.active_version == "v2"
+    assert registry.versions() == ["v1", "v2"]
+    # A batch that took the old handle still scores on it
+    assert in_flight.version == "v1"
+    assert len(in_flight.scorer.predict_proba(np.zeros((1, 584)))[0]) == 4
+
+
+def test_registry_evicts_oldest_inactive_version(tmp_path):
+    """Test the registry holds at most max_versions models"""
+    registry = ModelRegistry(max_versions=2)
+    for version in ["v1", "v2", "v3"]:
+        registry.activate(registry.load(_models_config(tmp_path, version)).version)
+
+    assert registry.versions() == ["v2", "v3"]
+    assert registry.active_version == "v3"
+    with pytest.raises(KeyError):
+        registry.activate("v1")
@@ -0,0 +1,74 @@
+"""
+Tests for the local BigQuery partition cache
+"""
+
+import pytest
+import numpy as np
+import os
+import sys
+import time
+from datetime import datetime
+from unittest.mock import Mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ingestion.partition_cache import PartitionCache, _dir_size, cache_key, table_versions
+from utils.embedding_batch import EmbeddingBatch
+
+
+def _batch(n_rows, n_features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return EmbeddingBatch(
+        np.array([f"CASE_{i:06d}" for i in range(n_rows)]),
+        rng.normal(size=(n_rows, n_features)).astype(np.float32),
+        np.arange(n_rows).astype("datetime64[h]").astype("datetime64[ns]"),
+        drop_counts={"not_array": 2}
+    )
+
+
+def test_cache_key_tracks_query_and_table_versions():
+    """Test the key changes when the query or a source table changes"""
+    client = Mock()
+    client.get_table.return_value.modified = datetime(2025, 1, 1)
+    versions = table_versions(client, ["p.d.cases", "p.d.embeddings"])
+    key = cache_key("SELECT 1", versions, expected_dim=584)
+
+    assert cache_key("SELECT 1", dict(versions), expected_dim=584) == key
+    assert cache_key("SELECT 2", versions, expected_dim=584) != key
+    assert cache_key("SELECT 1", versions, expected_dim=588) != key
+    client.get_table.return_value.modified = datetime(2025, 1, 2)
+    assert cache_key("SELECT 1", table_versions(client, ["p.d.cases", "p.d.embeddings"]), expected_dim=584) != key
+
+
+def test_cache_round_trip_is_memory_mapped(tmp_path):
+    """Test a cached batch comes back unchanged, memory-mapped, with its drop counts"""
+    cache = PartitionCache(str(tmp_path), max_bytes=10 * 2**20)
+    batch = _batch(50)
+    assert cache.get("missing") is None
+
+    cache.put("k1", batch, partition_date="20250101")
+    cached = cache.get("k1")
+    assert isinstance(cached.embeddings.base, np.memmap)
+    assert (cached.embeddings == batch.embeddings).all()
+    assert (cached.case_ids == batch.case_ids).all()
+    assert (cached.timestamps == batch.timestamps).all()
+    assert cached.drop_counts == {"not_array": 2}
+    assert cached.total_cases == 52
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test entries past the size bound are evicted least recently used first"""
+    cache = PartitionCache(str(tmp_path), max_bytes=2**30)
+    cache.put("old", _batch(200, seed=1))
+    cache.put("used", _batch(200, seed=2))
+    cache.max_bytes = int(2.5 * _dir_size(os.path.join(str(tmp_path), "old")))
+    past = time.time() - 60
+    os.utime(os.path.join(str(tmp_path), "old", "entry.json"), (past, past))
+    os.utime(os.path.join(str(tmp_path), "used", "entry.json"), (past, past))
+    assert cache.get("used") is not None
+
+    cache.put("new", _batch(200, seed=3))
+    assert cache.get("old") is None
+    assert cache.get("used") is not None
+    assert cache.get("new") is not None
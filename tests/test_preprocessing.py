@@ -0,0 +1,315 @@
+"""
+Tests for the preprocessing layer
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from preprocessing.embed_text import validate_embedding_matrix, validate_embeddings
+
+
+@pytest.fixture
+def mixed_embeddings():
+    """One valid row per dtype plus one row per drop reason"""
+    return pd.DataFrame({
+        "case_id": ["ok_list", "ok_array", "none", "short", "strings", "nan", "inf"],
+        "embedding_vector": [
+            [0.1, 0.2, 0.3],
+            np.array([0.4, 0.5, 0.6]),
+            None,
+            [0.1, 0.2],
+            ["a", "b", "c"],
+            [0.1, np.nan, 0.3],
+            [0.1, np.inf, 0.3]
+        ]
+    })
+
+
+def test_validate_embedding_matrix_drop_reasons(mixed_embeddings):
+    """Test the matrix holds only valid rows and drops are counted per reason"""
+    matrix, case_ids, drop_counts = validate_embedding_matrix(mixed_embeddings, expected_dim=3)
+
+    assert matrix.dtype == np.float32
+    assert matrix.flags.c_contiguous
+    assert matrix.shape == (2, 3)
+    assert list(case_ids) == ["ok_list", "ok_array"]
+    np.testing.assert_allclose(matrix, [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]], rtol=1e-6)
+    assert drop_counts == {"not_array": 1, "bad_shape": 1, "non_numeric": 1, "non_finite": 2}
+
+
+def test_validate_embeddings_keeps_rows_and_index(mixed_embeddings):
+    """Test the DataFrame validator keeps the surviving rows unchanged"""
+    df_valid = validate_embeddings(mixed_embeddings, expected_dim=3)
+
+    assert list(df_valid["case_id"]) == ["ok_list", "ok_array"]
+    assert list(df_valid.index) == [0, 1]
+
+
+def test_validate_embedding_matrix_empty():
+    """Test an empty frame yields an empty matrix"""
+    matrix, case_ids, drop_counts = validate_embedding_matrix(
+        pd.DataFrame({"case_id": [], "embedding_vector": []}), expected_dim=3
+    )
+    assert matrix.shape == (0, 3)
+    assert len(case_ids) == 0
+    assert sum(drop_counts.values()) == 0
+
+
+def test_embedding_batch_from_frame(mixed_embeddings):
+    """Test a batch holds one matrix row per valid case and counts the rest"""
+    from utils.embedding_batch import EmbeddingBatch
+
+    batch = EmbeddingBatch.from_frame(mixed_embeddings)
+
+    assert batch.n_features == 3
+    assert list(batch.case_ids) == ["ok_list", "ok_array"]
+    assert batch.timestamps is None
+    assert batch.total_cases == len(mixed_embeddings)
+    assert batch.drop_counts["non_finite"] == 2
+
+
+def test_embedding_batch_validate_and_truncate(sample_data):
+    """Test batch preprocessing keeps timestamps aligned and truncates as a view"""
+    from utils.embedding_batch import EmbeddingBatch
+    from preprocessing.embed_text import truncate_embeddings_to_model_dimensions
+
+    batch = validate_embeddings(EmbeddingBatch.from_frame(sample_data), expected_dim=584)
+    assert len(batch) == len(sample_data)
+    assert (batch.timestamps == sample_data["timestamp"].to_numpy()).all()
+
+    truncated = truncate_embeddings_to_model_dimensions(batch, target_dim=500)
+    assert truncated.n_features == 500
+    assert np.shares_memory(truncated.embeddings, batch.embeddings)
+
+    rejected = validate_embeddings(batch, expected_dim=588)
+    assert len(rejected) == 0
+    assert rejected.drop_counts["bad_shape"] == len(sample_data)
+
+
+def test_feature_selection_from_metadata():
+    """Test the feature selection follows model metadata"""
+    from preprocessing.feature_projection import resolve_feature_selection
+
+    assert resolve_feature_selection({"train_shape": [100, 584]}, 584, 588) == slice(0, 584)
+    assert resolve_feature_selection({"feature_indices": [2, 3, 4]}, 3, 588) == slice(2, 5)
+    np.testing.assert_array_equal(
+        resolve_feature_selection({"feature_indices": [5, 1, 7]}, 3, 10), [5, 1, 7]
+    )
+    assert resolve_feature_selection({}, 584, 588) == slice(0, 584)
+
+    with pytest.raises(ValueError):
+        resolve_feature_selection({"train_shape": [100, 584]}, 500, 588)
+    with pytest.raises(ValueError):
+        resolve_feature_selection({}, 600, 588)
+    with pytest.raises(ValueError):
+        resolve_feature_selection({"feature_indices": [0, 12]}, 2, 10)
+
+
+def test_project_embeddings_without_row_copies():
+    """Test a prefix projects as a view and an index list as one fancy-index"""
+    from utils.embedding_batch import EmbeddingBatch
+    from preprocessing.feature_projection import project_embeddings
+
+    embeddings = np.arange(20, dtype=np.float32).reshape(4, 5)
+    batch = EmbeddingBatch(np.array(["a", "b", "c", "d"]), embeddings)
+
+    prefix = project_embeddings(batch, slice(0, 3))
+    assert np.shares_memory(prefix.embeddings, embeddings)
+    np.testing.assert_array_equal(prefix.embeddings, embeddings[:, :3])
+
+    picked = project_embeddings(batch, np.array([4, 0]))
+    np.testing.assert_array_equal(picked.embeddings, embeddings[:, [4, 0]])
+    assert list(picked.case_ids) == ["a", "b", "c", "d"]
+
+    assert project_embeddings(batch, slice(0, 5)) is batch
+
+
+def test_int8_embeddings_roundtrip():
+    """Test int8 storage quantizes per dimension and slices without dequantizing"""
+    from utils.embedding_batch import EmbeddingBatch
+    from utils.embedding_precision import QuantizedEmbeddings
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(50, 8)).astype(np.float32) * np.arange(1, 9, dtype=np.float32)
+    batch = EmbeddingBatch(np.arange(50).astype(str), embeddings).with_precision("int8")
+
+    assert isinstance(batch.embeddings, QuantizedEmbeddings)
+    assert batch.nbytes < embeddings.nbytes / 3
+    # Error is at most half a quantization step in every dimension
+    step = np.abs(embeddings).max(axis=0) / 127
+    assert (np.abs(np.asarray(batch.embeddings) - embeddings) <= step / 2 + 1e-6).all()
+
+    shard = batch.embeddings[10:20, :4]
+    assert isinstance(shard, QuantizedEmbeddings)
+    np.testing.assert_allclose(np.asarray(shard), np.asarray(batch.embeddings)[10:20, :4])
+
+
+def test_float16_embeddings_clip_to_range():
+    """Test float16 storage clips instead of overflowing to inf"""
+    from utils.embedding_precision import to_precision
+
+    stored = to_precision(np.array([[1e6, -1e6, 0.5]]), "float16")
+    assert stored.dtype == np.float16
+    assert np.isfinite(stored).all()
+
+
+def test_dedup_scores_unique_embeddings_once(sample_data):
+    """Test duplicate cases are dropped and identical embeddings share one prediction"""
+    from utils.embedding_batch import EmbeddingBatch
+    from preprocessing.dedup import deduplicate_cases, unique_embeddings, fan_out_predictions, dedup_metrics
+    from inference.predict_intent import predict_batch
+
+    # Repeat a case id and give another case a copy of the first case's embedding
+    df = pd.concat([sample_data, sample_data.iloc[[5]]], ignore_index=True)
+    df.at[1, "embedding_vector"] = df.at[0, "embedding_vector"]
+
+    batch = deduplicate_cases(EmbeddingBatch.from_frame(df))
+    assert len(batch) == len(sample_data)
+    assert batch.drop_counts["duplicate_case"] == 1
+
+    unique, inverse = unique_embeddings(batch)
+    assert len(unique) == len(sample_data) - 1
+    assert (unique.case_ids[inverse][:2] == ["CASE_000000", "CASE_000000"]).all()
+
+    df_preds = fan_out_predictions(predict_batch(unique, chunk_size=16), unique, batch, inverse)
+    expected = predict_batch(batch, chunk_size=16)
+    assert list(df_preds["case_id"]) == list(expected["case_id"])
+    assert list(df_preds["predicted_label"]) == list(expected["predicted_label"])
+    assert (df_preds["timestamp"].to_numpy() == expected["timestamp"].to_numpy()).all()
+
+    metrics = dedup_metrics(batch, unique)
+    assert metrics["duplicate_cases"] == 1
+    assert metrics["unique_embeddings"] == len(sample_data) - 1
+
+
+def test_chunked_fan_out_matches_full_fan_out(sample_data):
+    """Test predictions fanned out chunk by chunk as they are scored cover every case once"""
+    from utils.embedding_batch import EmbeddingBatch
+    from preprocessing.dedup import unique_embeddings, fan_out_predictions, representative_rows
+    from inference.predict_intent import predict_batch
+
+    df = sample_data.copy()
+    for i in (1, 40, 77):
+        df.at[i, "embedding_vector"] = df.at[0, "embedding_vector"]
+    batch = EmbeddingBatch.from_frame(df)
+    unique, inverse = unique_embeddings(batch)
+    order, offsets = representative_rows(inverse, len(unique))
+
+    chunks = []
+    df_preds = predict_batch(
+        unique, chunk_size=16,
+        on_chunk=lambda start, end, preds: chunks.append(
+            fan_out_predictions(preds, unique, batch, inverse, rows=order[offsets[start]:offsets[end]])
+        )
+    )
+    assert len(chunks) == -(-len(unique) // 16)
+    streamed = pd.concat(chunks).sort_values("case_id").reset_index(drop=True)
+    expected = fan_out_predictions(df_preds, unique, batch, inverse).sort_values("case_id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(streamed, expected)
+
+
+def test_unique_embeddings_without_duplicates_is_a_no_op(sample_data):
+    """Test a batch with no repeated embeddings is scored as is"""
+    from utils.embedding_batch import EmbeddingBatch
+    from preprocessing.dedup import unique_embeddings
+
+    batch = EmbeddingBatch.from_frame(sample_data)
+    unique, inverse = unique_embeddings(batch)
+    assert unique is batch
+    assert (inverse == np.arange(len(batch))).all()
+
+
+def test_batch_store_round_trip(sample_data, tmp_path):
+    """Test a batch saved in the binary store loads back memory-mapped and unchanged"""
+    from utils.embedding_batch import EmbeddingBatch
+    from utils.batch_store import save_batch, load_batch, is_batch_store
+
+    batch = EmbeddingBatch.from_frame(sample_data)
+    path = str(tmp_path / "sample_data")
+    save_batch(batch, path)
+    assert is_batch_store(path)
+
+    loaded = load_batch(path)
+    assert isinstance(loaded.embeddings.base, np.memmap) or isinstance(loaded.embeddings, np.memmap)
+    assert (loaded.embeddings == batch.embeddings).all()
+    assert (loaded.case_ids == batch.case_ids).all()
+    assert (loaded.timestamps == batch.timestamps).all()
+
+
+def test_sample_store_fixture_matches_json(sample_data):
+    """Test the binary sample fixture holds the same cases as the JSON fixture"""
+    from utils.batch_store import load_batch
+
+    batch = load_batch("tests/fixtures/sample_data")
+    assert list(batch.case_ids) == list(sample_data["case_id"])
+    assert (batch.timestamps == sample_data["timestamp"].to_numpy()).all()
+    assert np.allclose(batch.embeddings, np.array(sample_data["embedding_vector"].tolist()), atol=1e-6)
+
+
+def test_embedding_batch_from_arrow_matches_from_frame(sample_data):
+    """Test Arrow record batches convert to the same batch as the frame path"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pytest.skip("pyarrow is not available")
+    from utils.embedding_batch import EmbeddingBatch
+
+    vectors = list(sample_data["embedding_vector"])
+    vectors[1] = None
+    vectors[2] = vectors[2][:10]
+    vectors[4] = [float("nan")] + vectors[4][1:]
+    table = pa.table({
+        "case_id": sample_data["case_id"],
+        "embedding_vector": pa.array(vectors, type=pa.list_(pa.float64())),
+        "timestamp": sample_data["timestamp"]
+    })
+
+    expected = EmbeddingBatch.from_frame(sample_data.assign(embedding_vector=vectors))
+    batch = EmbeddingBatch.concat(
+        EmbeddingBatch.from_arrow(record_batch, expected_dim=584)
+        for record_batch in table.to_batches(max_chunksize=32)
+    )
+    assert batch.drop_counts == expected.drop_counts
+    assert (batch.case_ids == expected.case_ids).all()
+    assert np.array_equal(batch.embeddings, expected.embeddings)
+    assert (batch.timestamps == expected.timestamps).all()
+
+
+def test_packed_embeddings_decode_like_lists(sample_data):
+    """Test packed float32 BYTES rows decode to the same batch as FLOAT64 lists"""
+    from utils.embedding_batch import EmbeddingBatch
+
+    vectors = list(sample_data["embedding_vector"])
+    vectors[1] = None
+    vectors[2] = vectors[2][:10]
+    vectors[4] = [float("nan")] + vectors[4][1:]
+    packed = [None if v is None else np.asarray(v, dtype="<f4").tobytes() for v in vectors]
+
+    expected = EmbeddingBatch.from_frame(sample_data.assign(embedding_vector=vectors))
+    batch = EmbeddingBatch.from_frame(sample_data.assign(embedding_vector=packed))
+    assert batch.drop_counts == expected.drop_counts
+    assert (batch.case_ids == expected.case_ids).all()
+    assert batch.embeddings.dtype == np.float32
+    assert np.array_equal(batch.embeddings, expected.embeddings)
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return
+    table = pa.table({
+        "case_id": sample_data["case_id"],
+        "embedding_vector": pa.array(packed, type=pa.binary()),
+        "timestamp": sample_data["timestamp"]
+    })
+    # Inferred dimension; slices exercise non-zero value offsets
+    arrow_batch = EmbeddingBatch.concat(
+        EmbeddingBatch.from_arrow(record_batch) for record_batch in table.to_batches(max_chunksize=32)
+    )
+    assert arrow_batch.drop_counts == expected.drop_counts
+    assert np.array_equal(arrow_batch.embeddings, expected.embeddings)
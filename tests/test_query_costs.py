@@ -0,0 +1,74 @@
+"""
+Tests for BigQuery job cost accounting and the query budget
+"""
+
+import pytest
+import contextvars
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import monitoring.query_costs as query_costs
+from monitoring.query_costs import record_job, run_query, track_query_costs
+
+
+def _job(job_id, processed=0, billed=0, slot_ms=0, cache_hit=False):
+    return SimpleNamespace(
+        job_id=job_id, total_bytes_processed=processed, total_bytes_billed=billed,
+        slot_millis=slot_ms, cache_hit=cache_hit, result=lambda: None
+    )
+
+
+def test_costs_summed_per_label_across_threads():
+    """Test jobs recorded from threads with a copy of the run's context count towards the run"""
+    costs = track_query_costs()
+    jobs = [_job(f"shard_{i}", processed=100, billed=10 * 2**20, slot_ms=50) for i in range(4)]
+    contexts = [contextvars.copy_context() for _ in jobs]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda context, job: context.run(record_job, job, "load_partition"), contexts, jobs))
+    record_job(_job("verify", cache_hit=True), "verify_output")
+    # Load jobs report slot time in the raw statistics only
+    record_job(SimpleNamespace(job_id="load", output_rows=7, output_bytes=700,
+                               _properties={"statistics": {"totalSlotMs": "25"}}), "write_output")
+
+    summary = costs.summary()
+    assert summary["jobs"] == 6
+    assert summary["cache_hits"] == 1
+    assert summary["bytes_billed"] == 40 * 2**20
+    assert summary["slot_ms"] == 225
+    assert summary["by_label"]["load_partition"]["bytes_processed"] == 400
+    assert summary["by_label"]["write_output"] == {
+        "jobs": 1, "cache_hits": 0, "bytes_processed": 0, "bytes_billed": 0, "slot_ms": 25,
+        "output_bytes": 700, "output_rows": 7
+    }
+
+
+def test_query_budget_warns_or_refuses(monkeypatch):
+    """Test the dry-run estimate blocks over-budget queries only when the action is refuse"""
+    client = Mock()
+
+    def query(sql, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return _job(None, processed=3 * 10**9)
+        return _job("run", processed=3 * 10**9, billed=3 * 10**9)
+    client.query.side_effect = query
+
+    monkeypatch.setitem(query_costs.config, "query_budget", {"enabled": True, "max_bytes_gb": 2, "action": "refuse"})
+    with pytest.raises(RuntimeError, match="over the 2.00 GB budget"):
+        run_query(client, "SELECT 1", "load_partition")
+    assert client.query.call_count == 1
+
+    monkeypatch.setitem(query_costs.config, "query_budget", {"enabled": True, "max_bytes_gb": 5, "action": "refuse"})
+    costs = track_query_costs()
+    run_query(client, "SELECT 1", "load_partition")
+    assert client.query.call_args.kwargs["job_config"].maximum_bytes_billed == 5 * 10**9
+    assert costs.summary()["bytes_billed"] == 3 * 10**9
+
+    monkeypatch.setitem(query_costs.config, "query_budget", {"enabled": True, "max_bytes_gb": 2, "action": "warn"})
+    run_query(client, "SELECT 1", "load_partition")
+    assert costs.summary()["jobs"] == 2
@@ -0,0 +1,102 @@
+"""
+Tests for the online scoring service
+"""
+
+import asyncio
+import json
+import pytest
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from inference.classifier_interface import predict_many
+from inference.scoring_service import MicroBatcher, ScoringService
+
+
+def test_micro_batcher_groups_concurrent_requests(sample_embeddings):
+    """Test concurrent submissions are scored together and match batch mode"""
+    case_ids = [f"CASE_{i:06d}" for i in range(len(sample_embeddings))]
+    expected = predict_many(sample_embeddings, case_ids)
+
+    async def run():
+        batcher = MicroBatcher(max_batch_size=64, max_wait_ms=50)
+        await batcher.start()
+        try:
+            results = await asyncio.gather(*(
+                batcher.submit(case_id, embedding)
+                for case_id, embedding in zip(case_ids, sample_embeddings)
+            ))
+        finally:
+            await batcher.stop()
+        return results, batcher.stats.snapshot()
+
+    results, stats = asyncio.run(run())
+
+    assert [r["case_id"] for r in results] == case_ids
+    assert [r["predicted_label"] for r in results] == list(expected["predicted_label"])
+    assert stats["requests"] == len(case_ids)
+    assert stats["batches"] < len(case_ids)
+    assert stats["latency_ms"]["p99"] is not None
+
+
+def test_micro_batcher_isolates_bad_inputs(sample_embeddings):
+    """Test a malformed embedding fails alone without failing its batch"""
+    async def run():
+        batcher = MicroBatcher(max_batch_size=8, max_wait_ms=50)
+        await batcher.start()
+        try:
+            return await asyncio.gather(
+                batcher.submit("GOOD", sample_embeddings[0]),
+                batcher.submit("BAD", sample_embeddings[1][:10]),
+                return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+
+    good, bad = asyncio.run(run())
+    assert good["case_id"] == "GOOD"
+    assert isinstance(bad, ValueError)
+
+
+def test_scoring_service_http_roundtrip(sample_embeddings):
+    """Test predict, stats and error responses over HTTP"""
+    async def request(port, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, data = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(data)
+
+    async def run():
+        service = ScoringService(host="127.0.0.1", port=0, max_wait_ms=5)
+        await service.start()
+        try:
+            single = await request(service.port, "POST", "/predict", {
+                "case_id": "CASE_000001",
+                "embedding_vector": sample_embeddings[0].tolist()
+            })
+            many = await request(service.port, "POST", "/predict", {"instances": [
+                {"case_id": f"CASE_{i}", "embedding_vector": e.tolist()}
+                for i, e in enumerate(sample_embeddings[:3])
+            ]})
+            invalid = await request(service.port, "POST", "/predict", {"case_id": "X"})
+            stats = await request(service.port, "GET", "/stats")
+        finally:
+            await service.stop()
+        return single, many, invalid, stats
+
+    single, many, invalid, stats = asyncio.run(run())
+
+    assert single[0] == 200 and single[1]["case_id"] == "CASE_000001"
+    assert many[0] == 200 and len(many[1]["predictions"]) == 3
+    assert invalid[0] == 400
+    assert stats[0] == 200 and stats[1]["requests"] == 4
@@ -0,0 +1,46 @@
+"""
+Tests for the micro-batch request_time watermark
+"""
+
+import pytest
+import json
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.watermark import Watermark, next_window
+
+NOW = datetime(2025, 1, 2, 12, 0, tzinfo=timezone.utc)
+
+
+def test_next_window_bounds():
+    """Test windows start at the watermark, stay behind now and are capped in length"""
+    window = lambda watermark: next_window(
+        watermark, NOW, lateness=timedelta(minutes=10), max_window=timedelta(hours=6),
+        initial_lookback=timedelta(hours=24)
+    )
+    assert window(NOW - timedelta(hours=1)) == (NOW - timedelta(hours=1), NOW - timedelta(minutes=10))
+    # Catching up after an outage
+    assert window(NOW - timedelta(days=2)) == (NOW - timedelta(days=2), NOW - timedelta(days=2) + timedelta(hours=6))
+    # First run
+    assert window(None) == (NOW - timedelta(hours=24), NOW - timedelta(hours=18))
+    # Nothing new yet
+    assert window(NOW - timedelta(minutes=5)) is None
+
+
+def test_watermark_only_moves_forward(tmp_path):
+    """Test the watermark persists across instances and never moves backwards"""
+    path = str(tmp_path / "watermark" / "request_time.json")
+    watermark = Watermark(path)
+    assert watermark.value is None
+
+    assert watermark.advance(NOW, cases=12)
+    assert Watermark(path).value == NOW
+    with open(path) as f:
+        assert json.load(f)["cases"] == 12
+
+    assert not watermark.advance(NOW - timedelta(hours=1))
+    assert Watermark(path).value == NOW
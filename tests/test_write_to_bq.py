@@ -0,0 +1,162 @@
+"""
+Tests for writing predictions to BigQuery
+"""
+
+import pytest
+import pandas as pd
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import output.write_to_bq as write_to_bq
+from utils.gcp_clients import reset_clients, set_client
+
+
+def _formatted(start, n):
+    now = pd.Timestamp.now()
+    return pd.DataFrame({
+        "case_id": pd.array([f"CASE_{i:06d}" for i in range(start, start + n)], dtype="string"),
+        "predicted_label": pd.array(["PC"] * n, dtype="string"),
+        "subtype_label": [None] * n,
+        "confidence": [0.9] * n,
+        "model_version": pd.array(["v1"] * n, dtype="string"),
+        "embedding_model": pd.array(["all-MiniLM-L6-v2"] * n, dtype="string"),
+        "inference_timestamp": [now] * n,
+        "prediction_notes": [None] * n,
+        "ingestion_time": [now] * n
+    })
+
+
+@pytest.fixture
+def bq_client(monkeypatch):
+    monkeypatch.setitem(write_to_bq.config["runtime"], "dry_run", False)
+    monkeypatch.setattr(write_to_bq.time, "sleep", lambda seconds: None)
+    client = Mock()
+    set_client("bigquery", client)
+    yield client
+    reset_clients()
+
+
+def test_streaming_writer_retries_only_failed_chunks(bq_client):
+    """Test rows are loaded in fixed-size chunks and a failed load retries that chunk alone"""
+    loads = []
+
+    def load(df, table_id, job_config=None):
+        loads.append(df["case_id"].iloc[0])
+        # The second chunk fails on its first attempt
+        if df["case_id"].iloc[0] == "CASE_000010" and loads.count("CASE_000010") == 1:
+            raise RuntimeError("backend error")
+        return SimpleNamespace(job_id=f"job_{len(loads)}", result=lambda: None, output_rows=len(df))
+    bq_client.load_table_from_dataframe.side_effect = load
+
+    writer = write_to_bq.StreamingWriter(table_id="p.d.output", chunk_rows=10, max_in_flight=2)
+    for start in range(0, 25, 5):
+        writer.write(_formatted(start, 5))
+    assert writer.close()
+
+    assert sorted(loads) == ["CASE_000000", "CASE_000010", "CASE_000010", "CASE_000020"]
+    assert [c["rows"] for c in writer.chunks] == [10, 10, 5]
+    assert [c["attempts"] for c in writer.chunks] == [1, 2, 1]
+    summary = writer.summary()
+    receipts = summary.pop("receipts")
+    assert summary == {
+        "chunks": 3, "committed": 3, "committed_rows": 25, "failed_chunks": [], "attempts": 4
+    }
+    assert [r["output_rows"] for r in receipts] == [10, 10, 5]
+    assert write_to_bq.verify_write_receipts(receipts, 25)
+
+
+def test_streaming_writer_reports_failed_chunks(bq_client):
+    """Test a chunk that fails every attempt is reported without failing the others"""
+    def load(df, table_id, job_config=None):
+        if df["case_id"].iloc[0] == "CASE_000000":
+            raise RuntimeError("quota exceeded")
+        return SimpleNamespace(job_id="job", result=lambda: None)
+    bq_client.load_table_from_dataframe.side_effect = load
+
+    writer = write_to_bq.StreamingWriter(table_id="p.d.output", chunk_rows=10, max_retries=2)
+    writer.write(_formatted(0, 10))
+    writer.write(_formatted(10, 10))
+    assert not writer.close()
+    assert writer.summary()["failed_chunks"] == [0]
+    assert writer.summary()["committed_rows"] == 10
+    assert writer.chunks[0]["error"] == "quota exceeded"
+
+
+def test_write_receipt_from_load_job(bq_client):
+    """Test a write returns a receipt built from the load job's statistics"""
+    df = _formatted(0, 8)
+    bq_client.load_table_from_dataframe.return_value = SimpleNamespace(
+        job_id="job_1", result=lambda: None, output_rows=8, output_bytes=1024
+    )
+
+    receipt = write_to_bq.write_to_bigquery(df)
+
+    assert receipt == {
+        "job_id": "job_1",
+        "table": write_to_bq.config["bq"]["output_table"],
+        "partitions": [df["ingestion_time"].iloc[0].strftime("%Y%m%d")],
+        "rows_sent": 8,
+        "output_rows": 8,
+        "output_bytes": 1024
+    }
+    # Neither the write nor its verification queries the table
+    assert write_to_bq.verify_write_receipts([receipt], 8)
+    bq_client.query.assert_not_called()
+    bq_client.get_table.assert_not_called()
+
+
+def test_verify_write_receipts_rejects_mismatches(bq_client):
+    """Test verification fails on missing, short or unexpected row counts"""
+    receipt = {"job_id": "j", "table": "p.d.output", "partitions": [], "rows_sent": 10, "output_rows": 10}
+    assert write_to_bq.verify_write_receipts([receipt], 10)
+    assert not write_to_bq.verify_write_receipts([receipt], 12)
+    assert not write_to_bq.verify_write_receipts([{**receipt, "output_rows": 9}], 9)
+    assert not write_to_bq.verify_write_receipts([{**receipt, "output_rows": None}], 10)
+
+
+def test_verify_bigquery_write_is_deprecated(bq_client):
+    """Test the read-back check still works but warns callers to use write receipts"""
+    bq_client.query.return_value.result.return_value = iter([SimpleNamespace(recent_count=3)])
+    with pytest.warns(DeprecationWarning):
+        assert write_to_bq.verify_bigquery_write(_formatted(0, 3), "p.d.output")
+
+
+def test_shadow_predictions_upload_to_gcs():
+    """Test shadow predictions under a gs:// prefix are uploaded as one Parquet object per run"""
+    try:
+        import pyarrow
+    except ImportError:
+        pytest.skip("pyarrow is not available")
+    from output.write_shadow_output import write_shadow_predictions
+    storage = Mock()
+    set_client("storage", storage)
+    try:
+        df = pd.DataFrame({"case_id": ["a", "b"], "model_version": ["v2", "v2"]})
+        path = write_shadow_predictions(df, "20250101", "gs://bucket/pcc/shadow/")
+    finally:
+        reset_clients()
+
+    assert path.startswith("gs://bucket/pcc/shadow/shadow_predictions_20250101_")
+    storage.bucket.assert_called_once_with("bucket")
+    name = storage.bucket.return_value.blob.call_args[0][0]
+    assert path.endswith(name) and name.endswith(".parquet")
+    storage.bucket.return_value.blob.return_value.upload_from_string.assert_called_once()
+
+
+def test_partial_write_marker_roundtrip(tmp_path):
+    """Test a partial write is recorded until its retry clears it"""
+    from utils.partial_writes import PartialWrites
+    markers = PartialWrites(str(tmp_path / "partial_writes"))
+    assert markers.get("20250101") is None
+
+    markers.record("20250101", committed_chunks=2, committed_rows=64)
+    assert markers.get("20250101")["committed_rows"] == 64
+    assert markers.get("20250102") is None
+
+    markers.clear("20250101")
+    assert markers.get("20250101") is None